@@ -0,0 +1,243 @@
+from __future__ import annotations
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field, asdict
+from typing import Any, Deque, Dict, Iterator, Optional
+
+from agents import Agent, RunContextWrapper, RunHooks, Runner, Tool
+
+from .config import settings
+from .observability import request_id_var
+from .simulate import SimulatedRunner
+
+# =====================================================
+# Per-request ledger: wall time / turns / tokens / tool calls per stage.
+# Stage names: "agent:<Agent.name>", "tool:<function_tool name>", "stage:<pipeline step>"
+# =====================================================
+
+@dataclass
+class StageStats:
+    calls: int = 0
+    errors: int = 0
+    wall_ms: float = 0.0
+    turns: int = 0          # LLM requests
+    input_tokens: int = 0
+    output_tokens: int = 0
+    total_tokens: int = 0
+    tool_calls: int = 0     # tools invoked by this agent
+    memo_hits: int = 0      # tool calls answered from the run-scoped memo
+
+    def merge(self, other: "StageStats") -> None:
+        for k, v in asdict(other).items():
+            setattr(self, k, getattr(self, k) + v)
+
+@dataclass
+class RequestLedger:
+    request_id: str
+    route: str
+    started: float = field(default_factory=time.time)
+    wall_ms: float = 0.0
+    stages: Dict[str, StageStats] = field(default_factory=dict)
+
+    def stage(self, name: str) -> StageStats:
+        st = self.stages.get(name)
+        if st is None:
+            st = self.stages[name] = StageStats()
+        return st
+
+    def totals(self) -> StageStats:
+        out = StageStats()
+        for name, st in self.stages.items():
+            if name.startswith("agent:") or name.startswith("llm:"):
+                out.merge(st)
+        return out
+
+    def to_dict(self) -> dict:
+        tot = self.totals()
+        return {
+            "request_id": self.request_id,
+            "route": self.route,
+            "started": self.started,
+            "wall_ms": round(self.wall_ms, 1),
+            "tokens": {"input": tot.input_tokens, "output": tot.output_tokens, "total": tot.total_tokens},
+            "cost_usd": estimate_cost(tot.input_tokens, tot.output_tokens),
+            "stages": {k: asdict(v) for k, v in self.stages.items()},
+        }
+
+_ledger: ContextVar[Optional[RequestLedger]] = ContextVar("accounting_ledger", default=None)
+
+def estimate_cost(input_tokens: int, output_tokens: int) -> float:
+    return round(
+        input_tokens / 1e6 * settings.LLM_COST_INPUT_PER_1M
+        + output_tokens / 1e6 * settings.LLM_COST_OUTPUT_PER_1M,
+        6,
+    )
+
+def current_ledger() -> Optional[RequestLedger]:
+    return _ledger.get()
+
+# =====================================================
+# Cross-request aggregates (per-process)
+# =====================================================
+
+class AccountingRegistry:
+    def __init__(self, keep_requests: int = 200, keep_samples: int = 500):
+        self._requests: "OrderedDict[str, RequestLedger]" = OrderedDict()
+        self._keep_requests = keep_requests
+        self._totals: Dict[str, StageStats] = {}
+        self._samples: Dict[str, Deque[float]] = {}
+        self._keep_samples = keep_samples
+        self.requests_seen = 0
+
+    def record(self, ledger: RequestLedger) -> None:
+        self.requests_seen += 1
+        self._requests[ledger.request_id] = ledger
+        self._requests.move_to_end(ledger.request_id)
+        while len(self._requests) > self._keep_requests:
+            self._requests.popitem(last=False)
+        for name, st in ledger.stages.items():
+            self._totals.setdefault(name, StageStats()).merge(st)
+            self._samples.setdefault(name, deque(maxlen=self._keep_samples)).append(st.wall_ms)
+
+    def get(self, request_id: str) -> Optional[RequestLedger]:
+        return self._requests.get(request_id)
+
+    def aggregates(self) -> dict:
+        stages = {}
+        for name, st in self._totals.items():
+            samples = sorted(self._samples.get(name) or [])
+            stages[name] = {
+                **asdict(st),
+                "avg_wall_ms": round(st.wall_ms / st.calls, 1) if st.calls else 0.0,
+                "p50_wall_ms": round(_pct(samples, 0.50), 1),
+                "p95_wall_ms": round(_pct(samples, 0.95), 1),
+            }
+        tot = StageStats()
+        for name, st in self._totals.items():
+            if name.startswith("agent:") or name.startswith("llm:"):
+                tot.merge(st)
+        return {
+            "requests": self.requests_seen,
+            "tokens_total": tot.total_tokens,
+            "cost_usd_total": estimate_cost(tot.input_tokens, tot.output_tokens),
+            "stages": stages,
+        }
+
+def _pct(sorted_vals: list[float], q: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    idx = min(len(sorted_vals) - 1, int(round(q * (len(sorted_vals) - 1))))
+    return sorted_vals[idx]
+
+registry = AccountingRegistry()
+
+# =====================================================
+# Recording helpers
+# =====================================================
+
+@contextmanager
+def track_request(route: str) -> Iterator[RequestLedger]:
+    """Open a ledger for the current request (keyed by X-Request-ID) and file it on exit."""
+    ledger = RequestLedger(request_id=request_id_var.get() or f"anon-{time.time_ns()}", route=route)
+    token = _ledger.set(ledger)
+    t0 = time.perf_counter()
+    try:
+        yield ledger
+    finally:
+        ledger.wall_ms = (time.perf_counter() - t0) * 1000
+        registry.record(ledger)
+        try:
+            _ledger.reset(token)
+        except ValueError:
+            pass  # closed from another context (e.g. streaming generator teardown)
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a pipeline step (no-op outside a tracked request)."""
+    ledger = _ledger.get()
+    if ledger is None:
+        yield
+        return
+    st = ledger.stage(f"stage:{name}")
+    t0 = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        st.errors += 1
+        raise
+    finally:
+        st.calls += 1
+        st.wall_ms += (time.perf_counter() - t0) * 1000
+
+def record_llm(name: str, wall_s: float, usage: Dict[str, int], ok: bool = True) -> None:
+    """Record a direct (non-agent) completion, e.g. from app/llm.py."""
+    ledger = _ledger.get()
+    if ledger is None:
+        return
+    st = ledger.stage(f"llm:{name}")
+    st.calls += 1
+    st.turns += 1
+    st.errors += 0 if ok else 1
+    st.wall_ms += wall_s * 1000
+    st.input_tokens += usage.get("prompt_tokens", 0)
+    st.output_tokens += usage.get("completion_tokens", 0)
+    st.total_tokens += usage.get("total_tokens", 0)
+
+def record_memo_hit(tool: str) -> None:
+    ledger = _ledger.get()
+    if ledger is not None:
+        ledger.stage(f"tool:{tool}").memo_hits += 1
+
+class AccountingHooks(RunHooks):
+    """Times function_tool calls and counts them against the calling agent."""
+    def __init__(self) -> None:
+        self._tool_started: Dict[str, float] = {}
+
+    @staticmethod
+    def _call_key(context: RunContextWrapper[Any], tool: Tool) -> str:
+        return getattr(context, "tool_call_id", None) or f"{tool.name}:{id(context)}"
+
+    async def on_tool_start(self, context: RunContextWrapper[Any], agent: Agent, tool: Tool) -> None:
+        self._tool_started[self._call_key(context, tool)] = time.perf_counter()
+
+    async def on_tool_end(self, context: RunContextWrapper[Any], agent: Agent, tool: Tool, result: object) -> None:
+        t0 = self._tool_started.pop(self._call_key(context, tool), None)
+        ledger = _ledger.get()
+        if ledger is None:
+            return
+        st = ledger.stage(f"tool:{tool.name}")
+        st.calls += 1
+        if t0 is not None:
+            st.wall_ms += (time.perf_counter() - t0) * 1000
+        ledger.stage(f"agent:{agent.name}").tool_calls += 1
+
+async def run_agent(agent: Agent, input: Any, **kwargs: Any):
+    """
+    Runner.run with accounting: wall time, LLM turns and token usage land on
+    the current request's "agent:<name>" stage, tool calls on "tool:<name>".
+    """
+    runner = SimulatedRunner if settings.SIMULATE_PROVIDERS else Runner
+    ledger = _ledger.get()
+    if ledger is None:
+        return await runner.run(agent, input, **kwargs)
+
+    kwargs.setdefault("hooks", AccountingHooks())
+    st = ledger.stage(f"agent:{agent.name}")
+    t0 = time.perf_counter()
+    try:
+        result = await runner.run(agent, input, **kwargs)
+    except BaseException:
+        st.errors += 1
+        raise
+    finally:
+        st.calls += 1
+        st.wall_ms += (time.perf_counter() - t0) * 1000
+
+    usage = result.context_wrapper.usage
+    st.turns += usage.requests
+    st.input_tokens += usage.input_tokens
+    st.output_tokens += usage.output_tokens
+    st.total_tokens += usage.total_tokens
+    return result
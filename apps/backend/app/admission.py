@@ -0,0 +1,148 @@
+from __future__ import annotations
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Optional
+
+from .config import settings
+
+# =====================================================
+# Admission control for LLM-bound generations (per-process).
+# At most ADMISSION_MAX_INFLIGHT runs execute; up to ADMISSION_MAX_QUEUED wait for
+# a slot. A request is shed up front when the queue is full or the estimated wait
+# (queue depth x recent run latency / slots) exceeds ADMISSION_MAX_QUEUE_WAIT_S,
+# rather than admitting work that would only time out.
+# =====================================================
+
+class Overloaded(Exception):
+    """Raised when a generation is shed; retry_after is a hint in seconds."""
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+class AdmissionController:
+    def __init__(self, max_inflight: int, max_queued: int, max_wait_s: float, alpha: float = 0.2):
+        self.max_inflight = max(1, max_inflight)
+        self.max_queued = max(0, max_queued)
+        self.max_wait_s = max_wait_s
+        self._sem = asyncio.Semaphore(self.max_inflight)
+        self._alpha = alpha
+        self._latency_ewma: Optional[float] = None   # seconds per admitted run
+        self._waits: Deque[float] = deque(maxlen=500)
+        self.inflight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.queued = 0     # admitted after waiting for a slot
+        self.shed = 0
+        self.degraded = 0   # shed requests answered with a cached/degraded plan
+
+    # ---------- estimates ----------
+
+    def latency_s(self) -> float:
+        """Recent run latency (EWMA); 0 until the first run completes."""
+        return self._latency_ewma or 0.0
+
+    def estimated_wait(self) -> float:
+        """
+        Expected wait for a newcomer: everyone queued ahead drains at max_inflight per run.
+        Without samples this is 0, so the queue-wait timeout is the only bound.
+        """
+        if self.inflight < self.max_inflight and self.waiting == 0:
+            return 0.0
+        return (self.waiting + 1) * self.latency_s() / self.max_inflight
+
+    def _observe(self, run_s: float) -> None:
+        a = self._alpha
+        self._latency_ewma = run_s if self._latency_ewma is None else (1 - a) * self._latency_ewma + a * run_s
+
+    def _reject(self, reason: str) -> Overloaded:
+        self.shed += 1
+        hint = self.estimated_wait() or self.max_wait_s
+        return Overloaded(reason, retry_after=max(1.0, min(60.0, hint)))
+
+    # ---------- slots ----------
+
+    async def acquire(self, shed: bool = True) -> float:
+        """
+        Take a run slot -> seconds waited. With shed=False (background jobs) wait as long
+        as it takes; otherwise raise Overloaded instead of queueing hopeless work.
+        """
+        t0 = time.monotonic()
+        if not self._sem.locked():
+            await self._sem.acquire()  # free slot: returns without suspending
+        else:
+            if shed and self.waiting >= self.max_queued:
+                raise self._reject("queue_full")
+            if shed and self.estimated_wait() > self.max_wait_s:
+                raise self._reject("queue_wait")
+            self.waiting += 1
+            try:
+                if shed:
+                    await asyncio.wait_for(self._sem.acquire(), timeout=self.max_wait_s)
+                else:
+                    await self._sem.acquire()
+            except asyncio.TimeoutError:
+                raise self._reject("queue_timeout")
+            finally:
+                self.waiting -= 1
+        waited = time.monotonic() - t0
+        self.inflight += 1
+        self.admitted += 1
+        if waited > 0.001:
+            self.queued += 1
+        self._waits.append(waited)
+        return waited
+
+    def release(self, run_s: Optional[float] = None) -> None:
+        """Free a slot; pass the run's duration when it completed normally."""
+        self.inflight -= 1
+        self._sem.release()
+        if run_s is not None:
+            self._observe(run_s)
+
+    @asynccontextmanager
+    async def admit(self, shed: bool = True) -> AsyncIterator[float]:
+        waited = await self.acquire(shed=shed)
+        started = time.monotonic()
+        ok = False
+        try:
+            yield waited
+            ok = True
+        finally:
+            self.release(time.monotonic() - started if ok else None)
+
+    # ---------- metrics ----------
+
+    def stats(self) -> dict:
+        waits = sorted(self._waits)
+        def pct(q: float) -> float:
+            return waits[min(len(waits) - 1, int(round(q * (len(waits) - 1))))] if waits else 0.0
+        return {
+            "inflight": self.inflight,
+            "waiting": self.waiting,
+            "limits": {
+                "max_inflight": self.max_inflight,
+                "max_queued": self.max_queued,
+                "max_queue_wait_s": self.max_wait_s,
+            },
+            "latency_ewma_s": round(self.latency_s(), 2),
+            "estimated_wait_s": round(self.estimated_wait(), 2),
+            "queue_wait_p50_s": round(pct(0.50), 3),
+            "queue_wait_p95_s": round(pct(0.95), 3),
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "shed": self.shed,
+            "degraded": self.degraded,
+        }
+
+def retry_after_header(e: Overloaded) -> str:
+    return str(int(math.ceil(e.retry_after)))
+
+admission = AdmissionController(
+    max_inflight=settings.ADMISSION_MAX_INFLIGHT,
+    max_queued=settings.ADMISSION_MAX_QUEUED,
+    max_wait_s=settings.ADMISSION_MAX_QUEUE_WAIT_S,
+)
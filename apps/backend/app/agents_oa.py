@@ -190,12 +190,13 @@ from __future__ import annotations
 
 import asyncio
 import json
-from typing import List
+import re
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, List, Optional, Tuple
 
 from pydantic import BaseModel, constr
 from agents import (
     Agent,
-    Runner,
     function_tool,
     input_guardrail,
     output_guardrail,
@@ -206,7 +207,11 @@ from agents import (
 from agents import set_trace_processors  # LangSmith tracer hook for Agents SDK
 from langsmith.wrappers import OpenAIAgentsTracingProcessor
 
+from .accounting import record_memo_hit, run_agent
+from .config import settings
 from .schemas import GenerateScheduleIn, RoadmapOutput, ExerciseItem, DayThemesOut
+from .tools.memo import ToolMemo
+from .utils.brief_screen import VerdictCache, prescreen_brief
 
 # ---- LangSmith tracing for the OpenAI Agents SDK ----
 try:
@@ -216,39 +221,70 @@ except Exception as e:
     print(f"[LangSmith] Agents tracing NOT enabled: {e}")
 
 
+# ---------------- run context ----------------
+@dataclass
+class ManagerContext:
+    """Run-scoped state carried through Runner.run(manager, ...) into the tools."""
+    tool_memo: ToolMemo = field(default_factory=ToolMemo)
+
+
+async def _memoized(
+    ctx: RunContextWrapper[ManagerContext],
+    tool: str,
+    query: str,
+    max_results: int,
+    call: Callable[[], Awaitable[List[dict]]],
+) -> List[dict]:
+    memo: Optional[ToolMemo] = getattr(ctx.context, "tool_memo", None)
+    if memo is None:
+        return await call()
+    items, hit = await memo.get_or_call(tool, query, max_results, call)
+    if hit:
+        record_memo_hit(tool)
+    return items
+
+
 # ---------------- function tools ----------------
 @function_tool
-async def web_search(query: str, max_results: int = 8) -> str:
+async def web_search(ctx: RunContextWrapper[ManagerContext], query: str, max_results: int = 8) -> str:
     """
     Search the web and return JSON array of {title,url} items (short).
     Keep payload tiny; the agent will write 'why'.
     """
     try:
         from .tools.search import search_web
-        hits = await search_web(query, max_results=max_results)
-        out = [{"title": (h.get("title") or "")[:200], "url": h.get("url") or ""} for h in hits]
+
+        async def _call() -> List[dict]:
+            hits = await search_web(query, max_results=max_results)
+            return [{"title": (h.get("title") or "")[:200], "url": h.get("url") or ""} for h in hits]
+
+        out = await _memoized(ctx, "web_search", query, max_results, _call)
         return json.dumps(out, ensure_ascii=False)
     except Exception:
         return json.dumps([], ensure_ascii=False)
 
 
 @function_tool
-async def video_search(topic: str, max_results: int = 10) -> str:
+async def video_search(ctx: RunContextWrapper[ManagerContext], topic: str, max_results: int = 10) -> str:
     """
     Find videos across sites. Return JSON array of {title,url,source?,duration?}.
     """
     try:
         from .tools.search import search_videos
-        vids = await search_videos(topic, max_results=max_results)
-        out = [
-            {
-                "title": (v.get("title") or "")[:200],
-                "url": v.get("url") or "",
-                "source": v.get("source") or "",
-                "duration": v.get("duration"),
-            }
-            for v in vids
-        ]
+
+        async def _call() -> List[dict]:
+            vids = await search_videos(topic, max_results=max_results)
+            return [
+                {
+                    "title": (v.get("title") or "")[:200],
+                    "url": v.get("url") or "",
+                    "source": v.get("source") or "",
+                    "duration": v.get("duration"),
+                }
+                for v in vids
+            ]
+
+        out = await _memoized(ctx, "video_search", topic, max_results, _call)
         return json.dumps(out, ensure_ascii=False)
     except Exception:
         return json.dumps([], ensure_ascii=False)
@@ -292,14 +328,48 @@ brief_guardrail_agent = Agent(
 
 
 # ---------------- Input guardrail ----------------
-@input_guardrail
+_brief_verdicts = VerdictCache(ttl=float(settings.BRIEF_GUARDRAIL_CACHE_TTL))
+
+def _brief_goals_and_pace(
+    input: str | List[TResponseInputItem],
+) -> Tuple[Optional[str], List[str], Optional[int]]:
+    """Pull the brief, goals and daily minutes back out of the manager prompt (see run_manager)."""
+    if not isinstance(input, str):
+        return None, [], None
+    b = re.search(r"^Brief: (.*)$", input, re.MULTILINE)
+    g = re.search(r"^Goals: (.*)$", input, re.MULTILINE)
+    m = re.search(r"^Daily minutes: (\d+)", input, re.MULTILINE)
+    goals = [x for x in g.group(1).split(", ") if x] if g else []
+    return (b.group(1) if b else None), goals, (int(m.group(1)) if m else None)
+
+def screen_brief_local(brief: str, goals: List[str], daily_minutes: Optional[int]) -> Optional[BriefCheckOutput]:
+    """Prescreen + cached verdict over brief and goals; None when only the LLM guardrail can decide."""
+    verdict = prescreen_brief(brief, goals, daily_minutes)
+    if verdict is None:
+        verdict = _brief_verdicts.get(VerdictCache.key(brief, goals, daily_minutes))
+    if verdict is None:
+        return None
+    return BriefCheckOutput(allowed=verdict[0], reason=verdict[1])
+
+@input_guardrail(run_in_parallel=settings.BRIEF_GUARDRAIL_PARALLEL)
 async def brief_guardrail(
     ctx: RunContextWrapper[None],
     agent: Agent,
     input: str | List[TResponseInputItem],
 ) -> GuardrailFunctionOutput:
-    result = await Runner.run(brief_guardrail_agent, input, context=ctx.context, max_turns=1)
+    """
+    Tiered check: local prescreen -> verdict cache -> LLM agent (ambiguous briefs only).
+    """
+    brief, goals, mins = _brief_goals_and_pace(input)
+    if brief:
+        local = screen_brief_local(brief, goals, mins)
+        if local is not None:
+            return GuardrailFunctionOutput(output_info=local, tripwire_triggered=not local.allowed)
+
+    result = await run_agent(brief_guardrail_agent, input, context=ctx.context, max_turns=1)
     output: BriefCheckOutput = result.final_output  # type: ignore
+    if brief:
+        _brief_verdicts.set(VerdictCache.key(brief, goals, mins), (output.allowed, output.reason))
     return GuardrailFunctionOutput(output_info=output, tripwire_triggered=not output.allowed)
 
 
@@ -356,7 +426,7 @@ async def make_exercise_for_topic(topic: str, estimate_minutes: int) -> Exercise
         "Constraints: 3–6 short steps, concrete and measurable; no advanced tools; "
         "include file names or concrete artifacts when relevant."
     )
-    res = await Runner.run(exercise_coach, prompt, max_turns=3)
+    res = await run_agent(exercise_coach, prompt, max_turns=3)
     ex: ExerciseItem = res.final_output  # type: ignore
     if ex.estimate_minutes > estimate_minutes:  # extra safety clamp
         ex.estimate_minutes = estimate_minutes
@@ -391,7 +461,7 @@ async def run_day_themer(inp: GenerateScheduleIn) -> List[str]:
         days=n,
         mins=inp.daily_minutes,
     )
-    res = await Runner.run(themer, msg, max_turns=4)
+    res = await run_agent(themer, msg, max_turns=4)
     out: DayThemesOut = res.final_output  # type: ignore
     topics = [t.strip() for t in (out.topics or []) if t and t.strip()]
     return topics[:n]
@@ -413,12 +483,17 @@ manager = Agent(
 )
 
 # ---------------- Entry point used by routes ----------------
-async def run_manager(inp: GenerateScheduleIn) -> RoadmapOutput:
+def _one_line(text: str) -> str:
+    # the brief guardrail reads the prompt back line by line, so user text can't span lines
+    return " ".join(text.split())
+
+async def run_manager(inp: GenerateScheduleIn, timeout: float = 90) -> RoadmapOutput:
     """
     Ask the manager for enough items to cover all days:
       - 2 resources/day
       - 1 video/day
       - 1 exercise/day
+    `timeout` is the wall-clock cap (callers pass what's left of the request deadline).
     """
     days = min(max(1, inp.duration_days), 12)
     need_r = min(24, days * 2)
@@ -434,8 +509,8 @@ async def run_manager(inp: GenerateScheduleIn) -> RoadmapOutput:
         "Prefer short reads (3–5 min) and ≤10-min videos. Each item MUST include a crisp 'why' focusing on value.\n"
         "Constraints: favor beginner-friendly pacing unless goals indicate otherwise; avoid long playlists."
     ).format(
-        brief=inp.brief,
-        goals=", ".join(inp.goals),
+        brief=_one_line(inp.brief),
+        goals=", ".join(_one_line(g) for g in inp.goals),
         mins=inp.daily_minutes,
         tz=inp.timezone,
         need_r=need_r,
@@ -444,9 +519,9 @@ async def run_manager(inp: GenerateScheduleIn) -> RoadmapOutput:
     )
 
     try:
-        coro = Runner.run(manager, msg, max_turns=10)
-        result = await asyncio.wait_for(coro, timeout=90)
+        coro = run_agent(manager, msg, context=ManagerContext(), max_turns=10)
+        result = await asyncio.wait_for(coro, timeout=max(1.0, timeout))
     except asyncio.TimeoutError:
-        raise RuntimeError("Agent run timed out after 90s")
+        raise RuntimeError(f"Agent run timed out after {max(1.0, timeout):.0f}s")
 
     return result.final_output  # type: ignore
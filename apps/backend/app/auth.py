@@ -1,18 +1,22 @@
 from __future__ import annotations
+import threading
+import time
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Dict, Optional, Tuple
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, Header, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from passlib.context import CryptContext
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from .config import settings
-from .database import get_db
+from .database import AsyncSessionLocal
+from .hashing import pwd_context
 from .models import User
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")  # for tooling; our login is JSON, still fine
 
 ALGORITHM = "HS256"
@@ -23,13 +27,23 @@ def hash_password(password: str) -> str:
 def verify_password(password: str, password_hash: str) -> bool:
     return pwd_context.verify(password, password_hash)
 
-def create_access_token(sub: str, expires_minutes: int | None = None) -> str:
+def create_access_token(
+    sub: str,
+    expires_minutes: int | None = None,
+    version: int = 0,
+    claims: Optional[dict] = None,
+) -> str:
     expire = datetime.now(tz=timezone.utc) + timedelta(
         minutes=expires_minutes or settings.ACCESS_TOKEN_EXPIRE_MINUTES
     )
-    to_encode = {"sub": sub, "exp": expire}
+    to_encode = {**(claims or {}), "sub": sub, "ver": version, "exp": expire}
     return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=ALGORITHM)
 
+def token_for(u: User) -> str:
+    """Access token for u at its current token_version (+ public fields if AUTH_EMBED_USER_CLAIMS)."""
+    claims = {"name": u.name, "username": u.username, "email": u.email} if settings.AUTH_EMBED_USER_CLAIMS else None
+    return create_access_token(sub=str(u.id), version=u.token_version or 0, claims=claims)
+
 def decode_token(token: str) -> dict:
     return jwt.decode(token, settings.SECRET_KEY, algorithms=[ALGORITHM])
 
@@ -37,20 +51,141 @@ def get_user_by_username_or_email(db: Session, username_or_email: str) -> Option
     q = db.query(User).filter((User.username == username_or_email) | (User.email == username_or_email)).first()
     return q
 
-async def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)) -> User:
-    credentials_exception = HTTPException(
+# =====================================================
+# Auth fast path.
+# A verified caller is cached per process for AUTH_USER_CACHE_TTL_S, keyed by
+# (sub, token version), so most requests only decode the JWT. Bumping
+# users.token_version (revoke_tokens) invalidates every older token: immediately
+# in this process, within the TTL in others. The miss lookup uses the async engine.
+# =====================================================
+
+@dataclass(frozen=True)
+class AuthUser:
+    """The authenticated caller's public fields, detached from any DB session."""
+    id: int
+    name: str
+    username: str
+    email: str
+    token_version: int = 0
+
+CacheKey = Tuple[str, int]
+
+class UserCache:
+    """TTL cache of verified users; entries expire in insertion order (fixed TTL)."""
+    def __init__(self, ttl_s: float, max_entries: int):
+        self._data: Dict[CacheKey, Tuple[float, AuthUser]] = {}
+        self._ttl = ttl_s
+        self._max = max(1, max_entries)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: CacheKey) -> Optional[AuthUser]:
+        with self._lock:
+            hit = self._data.get(key)
+            if hit is not None and hit[0] > time.monotonic():
+                self.hits += 1
+                return hit[1]
+            if hit is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: CacheKey, user: AuthUser) -> None:
+        if self._ttl <= 0:
+            return
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (time.monotonic() + self._ttl, user)
+            while len(self._data) > self._max:
+                del self._data[next(iter(self._data))]
+
+    def invalidate(self, user_id: int) -> None:
+        sub = str(user_id)
+        with self._lock:
+            for key in [k for k in self._data if k[0] == sub]:
+                del self._data[key]
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._data),
+            "max_entries": self._max,
+            "ttl_s": self._ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+user_cache = UserCache(ttl_s=settings.AUTH_USER_CACHE_TTL_S, max_entries=settings.AUTH_USER_CACHE_MAX)
+
+async def revoke_tokens(db: AsyncSession, user_id: int) -> None:
+    """Invalidate every token issued to user_id so far (commits)."""
+    await db.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(token_version=func.coalesce(User.token_version, 0) + 1)
+    )
+    await db.commit()
+    user_cache.invalidate(user_id)
+
+async def _verify_user(user_id: int, version: int, claims: dict) -> Optional[AuthUser]:
+    """Cache-miss check. None if the user is gone or the token revoked."""
+    async with AsyncSessionLocal() as db:
+        if "username" in claims:
+            # public fields travel in the token; only the revocation check needs the DB
+            row = (await db.execute(select(User.token_version).where(User.id == user_id))).first()
+            if row is None or (row.token_version or 0) != version:
+                return None
+            return AuthUser(user_id, claims.get("name", ""), claims["username"], claims.get("email", ""), version)
+        row = (
+            await db.execute(
+                select(User.id, User.name, User.username, User.email, User.token_version).where(User.id == user_id)
+            )
+        ).first()
+        if row is None or (row.token_version or 0) != version:
+            return None
+        return AuthUser(row.id, row.name, row.username, row.email, version)
+
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+async def _resolve_token(token: str) -> AuthUser:
+    """Signature, expiry and token-version check (cached) -> the caller; 401 otherwise."""
     try:
         payload = decode_token(token)
-        sub = payload.get("sub")
-        if sub is None:
-            raise credentials_exception
     except JWTError:
-        raise credentials_exception
-    user = db.query(User).filter(User.id == int(sub)).first()
-    if not user:
-        raise credentials_exception
+        raise _credentials_exception()
+    sub = payload.get("sub")
+    if sub is None or not str(sub).isdigit():
+        raise _credentials_exception()
+    try:
+        version = int(payload.get("ver") or 0)  # tokens issued before versioning count as 0
+    except (TypeError, ValueError):
+        raise _credentials_exception()
+    key = (str(sub), version)
+    user = user_cache.get(key)
+    if user is None:
+        user = await _verify_user(int(sub), version, payload)
+        if user is None:
+            raise _credentials_exception()
+        user_cache.put(key, user)
     return user
+
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> AuthUser:
+    return await _resolve_token(token)
+
+async def get_optional_user(authorization: Optional[str] = Header(None)) -> Optional[AuthUser]:
+    """
+    For routes open to anonymous callers: None without an Authorization header; any
+    header present must be a valid, unrevoked bearer token (401 otherwise), so a revoked
+    token can't fall back to acting anonymously.
+    """
+    if authorization is None:
+        return None
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token.strip():
+        raise _credentials_exception()
+    return await _resolve_token(token.strip())
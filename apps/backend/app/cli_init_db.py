@@ -1,5 +1,9 @@
 from .database import engine
+from .migrations import add_missing_columns
 from .models import Base
 
 Base.metadata.create_all(bind=engine)
-print("Created tables (if missing).")
\ No newline at end of file
+added = add_missing_columns(engine, Base.metadata)
+print("Created tables (if missing).")
+if added:
+    print("Added columns: " + ", ".join(added))
\ No newline at end of file
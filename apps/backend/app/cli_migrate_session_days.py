@@ -0,0 +1,12 @@
+from .database import SessionLocal, engine
+from .models import Base
+from .session_store import backfill_all
+
+# Split legacy full-plan rows into session_days: python -m app.cli_migrate_session_days
+Base.metadata.create_all(bind=engine)
+db = SessionLocal()
+try:
+    n = backfill_all(db)
+finally:
+    db.close()
+print(f"Backfilled session_days for {n} session(s).")
@@ -0,0 +1,23 @@
+import argparse
+
+from .config import settings
+from .database import SessionLocal, engine
+from .models import Base
+from .plan_codec import CODECS
+from .session_store import reencode_days
+
+# Re-encode stored day payloads: python -m app.cli_reencode_plans [--codec zlib|json]
+# Safe to run while the app serves traffic: readers accept every codec, and a day the app
+# rewrites mid-run is skipped (compare-and-swap on the old payload), not overwritten.
+parser = argparse.ArgumentParser(description="Rewrite session_days payloads under a storage codec.")
+parser.add_argument("--codec", choices=CODECS, default=settings.PLAN_STORAGE_CODEC)
+parser.add_argument("--batch-size", type=int, default=500)
+args = parser.parse_args()
+
+Base.metadata.create_all(bind=engine)
+db = SessionLocal()
+try:
+    n = reencode_days(db, args.codec, batch_size=args.batch_size)
+finally:
+    db.close()
+print(f"Re-encoded {n} day payload(s) as {args.codec}.")
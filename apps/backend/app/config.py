@@ -16,11 +16,111 @@ class Settings(BaseSettings):
 
     APP_ENV: str = "dev"
     DATABASE_URL: str = "sqlite:///./app.db"
+
+    # SQLite profile (file databases): WAL so progress writes don't block readers
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000       # wait for the writer lock instead of "database is locked"
+    SQLITE_CACHE_SIZE_KB: int = 64 * 1024
+    SQLITE_MMAP_SIZE_MB: int = 256
+    SQLITE_POOL_SIZE: int = 10
+    SQLITE_MAX_OVERFLOW: int = 30            # FastAPI's threadpool runs up to 40 sync routes at once
+
+    # Postgres profile: pool per process; statement_timeout caps runaway queries (0 = server default)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_S: float = 30.0
+    DB_POOL_RECYCLE_S: int = 300
+    DB_STATEMENT_TIMEOUT_MS: int = 15000
+    DATABASE_ASYNC_DRIVER: str = "psycopg"   # async routes on Postgres: psycopg | asyncpg (SQLite uses aiosqlite)
     TZ: str = "Asia/Manila"
 
     SECRET_KEY: str = "dev-change-me"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7
 
+    # Auth fast path: per-process cache of verified users; revocation reaches other processes within the TTL
+    AUTH_USER_CACHE_TTL_S: float = 30.0
+    AUTH_USER_CACHE_MAX: int = 10_000
+    AUTH_EMBED_USER_CLAIMS: bool = False   # name/username/email in the token; a cache miss then only checks token_version
+
+    # Password hashing pool (bcrypt off the shared threadpool); beyond workers + queue, 503 + Retry-After
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_QUEUED: int = 32
+    PASSWORD_HASH_EXECUTOR: str = "thread"   # thread | process
+    PASSWORD_BCRYPT_ROUNDS: int = 12         # raising it re-hashes older passwords on their next login
+
+    # app/llm.py async client: pool size, concurrent calls, per-call deadline (s), retries
+    OPENAI_MAX_CONNECTIONS: int = 20
+    OPENAI_MAX_CONCURRENCY: int = 8
+    OPENAI_TIMEOUT: float = 60.0
+    OPENAI_MAX_RETRIES: int = 3
+
+    # Cost estimate for accounting (USD per 1M tokens)
+    LLM_COST_INPUT_PER_1M: float = 0.15
+    LLM_COST_OUTPUT_PER_1M: float = 0.60
+
+    # Wall-clock budget for one /generate-roadmap run; optional stages degrade as it runs out
+    GENERATION_BUDGET_S: float = 80.0
+
+    # Admission control for LLM-bound generations (per-process); beyond these, shed with 503 + Retry-After
+    ADMISSION_MAX_INFLIGHT: int = 8
+    ADMISSION_MAX_QUEUED: int = 16
+    ADMISSION_MAX_QUEUE_WAIT_S: float = 10.0
+    ADMISSION_DEGRADED_FALLBACK: bool = True   # shed requests get a library plan (local fill-ins) when one matches
+    ADMISSION_DEGRADED_BUDGET_S: float = 4.0
+
+    # SingleFlight lock backend: memory (per-process) | sqlite | postgres | auto (follow DATABASE_URL)
+    SINGLEFLIGHT_BACKEND: str = "memory"
+
+    # Request-rate limit on generation routes (GCRA, keyed by user or IP); backend: memory | db
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "memory"
+    RATE_LIMIT_GENERATE: str = "30/hour"
+    RATE_LIMIT_GENERATE_BURST: int = 5
+
+    # Distinct concurrent generations per user/IP (identical requests are coalesced, not counted)
+    GENERATION_MAX_PER_PRINCIPAL: int = 2
+
+    # Async generation jobs (/jobs/generate). JOBS_WORKERS=0 -> run workers elsewhere (`python -m app.jobs`)
+    JOBS_WORKERS: int = 2
+    JOBS_GENERATION_BUDGET_S: float = 180.0   # no proxy timeout to fit under
+    JOBS_MAX_PENDING_PER_PRINCIPAL: int = 5   # queued + running
+    JOBS_POLL_INTERVAL_S: float = 2.0
+    JOBS_HEARTBEAT_S: float = 5.0
+    JOBS_STALE_AFTER_S: float = 60.0          # running job without a heartbeat -> requeued
+    JOBS_MAX_ATTEMPTS: int = 2
+    JOBS_MAX_REQUEST_PRIORITY: int = 0        # client-requested priorities are clamped to this (anonymous: also to 0)
+
+    # Parsed-plan cache for session reads (approximate in-memory size)
+    PLAN_CACHE_MAX_MB: int = 64
+
+    # Storage codec for new day payloads: json | zlib (~3x smaller). Reads accept both; see app/plan_codec.py
+    PLAN_STORAGE_CODEC: str = "json"
+
+    # NDJSON export/import of a user's sessions: rows per fetch / per insert transaction
+    SESSION_EXPORT_BATCH: int = 200
+    SESSION_IMPORT_BATCH: int = 200
+    SESSION_IMPORT_MAX_LINE_KB: int = 4096
+
+    # Popular-topic plan library (reuse banked manager output instead of regenerating)
+    PLAN_LIBRARY_ENABLED: bool = True
+    PLAN_LIBRARY_MIN_SIMILARITY: float = 0.6
+    PLAN_LIBRARY_MAX_AGE_DAYS: int = 30
+
+    # Simulated providers: fake agent runner / completions / search / link checks (load tests)
+    SIMULATE_PROVIDERS: bool = False
+    SIM_SEED: int = 42
+    SIM_LATENCY_DIST: str = "lognormal"  # fixed | uniform | lognormal
+    SIM_LATENCY_SIGMA: float = 0.5       # lognormal spread
+    SIM_AGENT_LATENCY_MS: float = 1500.0
+    SIM_SEARCH_LATENCY_MS: float = 300.0
+    SIM_LINKCHECK_LATENCY_MS: float = 80.0
+    SIM_DEAD_LINK_RATE: float = 0.05
+
+    # Brief guardrail: local prescreen + verdict cache; LLM only for ambiguous briefs
+    BRIEF_GUARDRAIL_CACHE_TTL: int = 3600
+    BRIEF_GUARDRAIL_PARALLEL: bool = True  # run LLM check alongside the manager, cancel on trip
+
     model_config = SettingsConfigDict(env_file=str(ENV_PATH), extra="ignore")
 
 settings = Settings()
@@ -34,6 +34,7 @@ from __future__ import annotations
 
 import os
 from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from .config import settings  # still fine to use your settings wrapper
 
@@ -65,24 +66,86 @@ if not raw_url:
 url = _normalize_db_url(raw_url)
 
 is_sqlite = url.startswith("sqlite")
-connect_args = {"check_same_thread": False} if is_sqlite else {}
-
-# Pre-ping helps recycle dead connections, useful with serverless + pooling
-engine = create_engine(
-    url,
-    connect_args=connect_args,
-    pool_pre_ping=True,
-    pool_recycle=300,
+is_sqlite_memory = is_sqlite and (":memory:" in url or url.rstrip("/") in ("sqlite:", "sqlite+pysqlite:"))
+
+def _async_url(url: str) -> str:
+    """Async-driver URL for the same database: aiosqlite, or psycopg/asyncpg per DATABASE_ASYNC_DRIVER."""
+    scheme, sep, rest = url.partition("://")
+    if is_sqlite:
+        return f"sqlite+aiosqlite{sep}{rest}"
+    if settings.DATABASE_ASYNC_DRIVER == "asyncpg":
+        return f"postgresql+asyncpg{sep}{rest.replace('sslmode=', 'ssl=')}"
+    return f"postgresql+psycopg_async{sep}{rest}"
+
+def _engine_options(asyncpg: bool = False) -> dict:
+    """Pool / connect settings per backend (see the SQLITE_* and DB_* settings)."""
+    if is_sqlite:
+        opts = {"connect_args": {"check_same_thread": False}}
+        if not is_sqlite_memory:
+            # one connection per threadpool worker that touches the DB; WAL lets readers overlap the writer
+            opts.update(pool_size=settings.SQLITE_POOL_SIZE, max_overflow=settings.SQLITE_MAX_OVERFLOW)
+        return opts
+    connect_args = {}
+    if settings.DB_STATEMENT_TIMEOUT_MS > 0:
+        if asyncpg:
+            connect_args["server_settings"] = {"statement_timeout": str(settings.DB_STATEMENT_TIMEOUT_MS)}
+        else:
+            connect_args["options"] = f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}"
+    return {
+        "connect_args": connect_args,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_S,
+        "pool_recycle": settings.DB_POOL_RECYCLE_S,
+        # Pre-ping helps recycle dead connections, useful with serverless + pooling
+        "pool_pre_ping": True,
+    }
+
+engine = create_engine(url, **_engine_options())
+
+# Async engine on the same database for the async routes (sessions, auth). Same pool
+# settings, so each process holds up to two pools. An in-memory SQLite URL is not
+# shared between the two engines -- use a file.
+async_engine = create_async_engine(
+    _async_url(url), **_engine_options(asyncpg=settings.DATABASE_ASYNC_DRIVER == "asyncpg" and not is_sqlite)
 )
 
-# Ensure SQLite enforces ON DELETE CASCADE (no-op for Postgres)
+def _sqlite_pragmas() -> list[str]:
+    pragmas = [
+        "PRAGMA foreign_keys=ON",  # enforce ON DELETE CASCADE
+        f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}",
+        "PRAGMA temp_store=MEMORY",
+        f"PRAGMA cache_size=-{int(settings.SQLITE_CACHE_SIZE_KB)}",  # negative = KiB
+    ]
+    if not is_sqlite_memory:
+        pragmas += [
+            f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}",
+            f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}",  # NORMAL is durable enough under WAL
+            f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE_MB) * 1024 * 1024}",
+        ]
+    return pragmas
+
+# SQLite storage profile, applied to every new pooled connection (no-op for Postgres)
 if is_sqlite:
     @event.listens_for(engine, "connect")
+    @event.listens_for(async_engine.sync_engine, "connect")
     def _set_sqlite_pragma(dbapi_connection, connection_record):
         cursor = dbapi_connection.cursor()
-        cursor.execute("PRAGMA foreign_keys=ON")
+        for pragma in _sqlite_pragmas():
+            cursor.execute(pragma)
         cursor.close()
 
+def storage_profile() -> dict:
+    """Effective pool + pragma settings, for /debug/db."""
+    out = {"dialect": engine.dialect.name, "pool": engine.pool.status(), "async_pool": async_engine.pool.status()}
+    with engine.connect() as conn:
+        if is_sqlite:
+            for name in ("journal_mode", "synchronous", "busy_timeout", "cache_size", "mmap_size", "temp_store"):
+                out[name] = conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+        else:
+            out["statement_timeout"] = conn.exec_driver_sql("SHOW statement_timeout").scalar()
+    return out
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 # FastAPI dependency
@@ -92,3 +155,11 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# expire_on_commit=False: async code can't lazy-load expired attributes after a commit
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+# FastAPI dependency (async routes)
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
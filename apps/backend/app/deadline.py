@@ -0,0 +1,69 @@
+from __future__ import annotations
+import asyncio
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Dict, Iterator, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+class Deadline:
+    """
+    Request-scoped wall-clock budget. Stages ask how much is left, cap their own
+    timeouts with it, and note what optional work they dropped (degradations).
+    """
+    def __init__(self, budget_s: float):
+        self.budget_s = budget_s
+        self.started = time.monotonic()
+        self.end = self.started + budget_s
+        self._degraded: Dict[str, int] = {}
+
+    def remaining(self) -> float:
+        return max(0.0, self.end - time.monotonic())
+
+    def allows(self, needed_s: float, reserve_s: float = 0.0) -> bool:
+        """True when needed_s is left after keeping reserve_s (pass the reserve the stage's run() keeps)."""
+        return self.remaining() - reserve_s >= needed_s
+
+    def cap(self, timeout_s: float, reserve_s: float = 0.0) -> float:
+        """timeout_s clipped to what's left after keeping reserve_s for later stages."""
+        return max(0.0, min(timeout_s, self.remaining() - reserve_s))
+
+    def degrade(self, what: str) -> None:
+        self._degraded[what] = self._degraded.get(what, 0) + 1
+
+    @property
+    def degradations(self) -> List[str]:
+        return [k if n == 1 else f"{k}x{n}" for k, n in self._degraded.items()]
+
+    async def run(self, aw: Awaitable[T], timeout_s: Optional[float] = None, reserve_s: float = 0.0) -> T:
+        """Await aw under min(timeout_s, remaining - reserve_s); raises asyncio.TimeoutError."""
+        limit = self.cap(timeout_s if timeout_s is not None else self.remaining(), reserve_s)
+        if limit <= 0:
+            if asyncio.iscoroutine(aw):
+                aw.close()
+            elif asyncio.isfuture(aw):
+                aw.cancel()  # tasks / gather() already started; don't leave them running orphaned
+                aw.add_done_callback(lambda f: f.cancelled() or f.exception())  # nobody awaits it now
+            raise asyncio.TimeoutError()
+        if limit == float("inf"):
+            return await aw
+        return await asyncio.wait_for(aw, timeout=limit)
+
+_current: ContextVar[Optional[Deadline]] = ContextVar("request_deadline", default=None)
+
+def current_deadline() -> Deadline:
+    """The active request deadline (an effectively unlimited one outside a request scope)."""
+    return _current.get() or Deadline(budget_s=float("inf"))
+
+@contextmanager
+def deadline_scope(budget_s: float) -> Iterator[Deadline]:
+    dl = Deadline(budget_s)
+    token = _current.set(dl)
+    try:
+        yield dl
+    finally:
+        try:
+            _current.reset(token)
+        except ValueError:
+            pass  # closed from another context (streaming generator teardown)
@@ -0,0 +1,130 @@
+from __future__ import annotations
+import asyncio
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Deque, Optional, Tuple
+
+from passlib.context import CryptContext
+
+from .config import settings
+
+# =====================================================
+# Password hashing off the request threadpool.
+# bcrypt costs ~100-300ms of CPU per call; running it inline in register/login lets a
+# login burst occupy FastAPI's shared threadpool and stall every sync route. Hashes run
+# on a dedicated executor of PASSWORD_HASH_WORKERS; at most PASSWORD_HASH_MAX_QUEUED
+# more may wait, beyond that callers get HashPoolBusy (-> 503) straight away.
+# =====================================================
+
+# min_rounds == rounds: hashes below the configured cost are re-hashed on the next login
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=settings.PASSWORD_BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.PASSWORD_BCRYPT_ROUNDS,
+)
+
+class HashPoolBusy(Exception):
+    """Raised when the hashing queue is full; retry_after is a hint in seconds."""
+    def __init__(self, retry_after: float):
+        super().__init__("password hashing queue full")
+        self.retry_after = retry_after
+
+# Worker entry points: module-level so a process pool can pickle them.
+# Each returns (result, started, finished) in wall-clock time, comparable across processes.
+
+def _hash(password: str) -> Tuple[str, float, float]:
+    t0 = time.time()
+    out = pwd_context.hash(password)
+    return out, t0, time.time()
+
+def _verify_and_update(password: str, hashed: str) -> Tuple[Tuple[bool, Optional[str]], float, float]:
+    t0 = time.time()
+    out = pwd_context.verify_and_update(password, hashed)
+    return out, t0, time.time()
+
+class HashPool:
+    def __init__(self, workers: int, max_queued: int, kind: str = "thread"):
+        self.workers = max(1, workers)
+        self.max_queued = max(0, max_queued)
+        self.kind = kind
+        self._executor: Optional[Executor] = None
+        self._waits: Deque[float] = deque(maxlen=500)
+        self._runs: Deque[float] = deque(maxlen=500)
+        self.pending = 0     # running + queued (event-loop only)
+        self.completed = 0
+        self.rejected = 0
+        self.upgraded = 0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                # spawn: the app process has threads running, fork would copy their locks
+                ctx = multiprocessing.get_context("spawn")
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=ctx)
+            else:
+                # bcrypt releases the GIL while hashing, so threads already run in parallel
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="pwhash")
+        return self._executor
+
+    def _retry_after(self) -> float:
+        run = sum(self._runs) / len(self._runs) if self._runs else 0.25
+        return max(1.0, min(30.0, self.pending * run / self.workers))
+
+    async def _submit(self, fn, *args):
+        if self.pending >= self.workers + self.max_queued:
+            self.rejected += 1
+            raise HashPoolBusy(retry_after=self._retry_after())
+        self.pending += 1
+        submitted = time.time()
+        try:
+            out, started, finished = await asyncio.get_running_loop().run_in_executor(
+                self._get_executor(), fn, *args
+            )
+        finally:
+            self.pending -= 1
+        self._waits.append(max(0.0, started - submitted))
+        self._runs.append(finished - started)
+        self.completed += 1
+        return out
+
+    async def hash(self, password: str) -> str:
+        return await self._submit(_hash, password)
+
+    async def verify(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """(ok, new_hash): new_hash is set when the stored hash's parameters are out of date."""
+        ok, new_hash = await self._submit(_verify_and_update, password, hashed)
+        if new_hash:
+            self.upgraded += 1
+        return ok, new_hash
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        def pct(samples: Deque[float], q: float) -> float:
+            s = sorted(samples)
+            return s[min(len(s) - 1, int(round(q * (len(s) - 1))))] if s else 0.0
+        return {
+            "executor": self.kind,
+            "workers": self.workers,
+            "max_queued": self.max_queued,
+            "pending": self.pending,
+            "hash_p50_s": round(pct(self._runs, 0.50), 3),
+            "hash_p95_s": round(pct(self._runs, 0.95), 3),
+            "queue_wait_p50_s": round(pct(self._waits, 0.50), 3),
+            "queue_wait_p95_s": round(pct(self._waits, 0.95), 3),
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "upgraded": self.upgraded,
+        }
+
+hash_pool = HashPool(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_queued=settings.PASSWORD_HASH_MAX_QUEUED,
+    kind=settings.PASSWORD_HASH_EXECUTOR,
+)
@@ -0,0 +1,364 @@
+from __future__ import annotations
+import asyncio
+import json
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import func, or_, update
+from sqlalchemy.orm import Session
+
+from .admission import admission
+from .config import settings
+from .database import SessionLocal
+from .models import GenerationJob, SessionRecord, User
+from .observability import request_id_var
+from .routes import run_generation
+from .schemas import GenerateScheduleIn, ScheduleOutput
+from . import session_store
+
+# =====================================================
+# Generation jobs: DB-backed queue + bounded pool of async workers.
+# Status: queued -> running -> succeeded | failed
+# Claim order: priority desc, then the principal with the fewest running jobs
+# (fairness), then oldest. A claim is a conditional UPDATE, so several processes
+# can share one queue.
+# =====================================================
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+CLAIM_SCAN = 50   # queued candidates considered per claim
+REAP_EVERY_S = 15.0
+
+class QueueFull(Exception):
+    """Raised when a principal already has JOBS_MAX_PENDING_PER_PRINCIPAL jobs pending."""
+    pass
+
+# ---------- queue operations (sync; call via asyncio.to_thread from workers) ----------
+
+def enqueue(
+    db: Session,
+    body: GenerateScheduleIn,
+    principal: str,
+    user_id: Optional[int] = None,
+    priority: int = 0,
+    save_title: Optional[str] = None,
+) -> GenerationJob:
+    pending = (
+        db.query(func.count(GenerationJob.id))
+        .filter(GenerationJob.principal == principal, GenerationJob.status.in_((QUEUED, RUNNING)))
+        .scalar()
+    )
+    if pending >= settings.JOBS_MAX_PENDING_PER_PRINCIPAL:
+        raise QueueFull(principal)
+    job = GenerationJob(
+        id=uuid.uuid4().hex,
+        principal=principal,
+        user_id=user_id,
+        status=QUEUED,
+        priority=priority,
+        request_json=body.model_dump_json(),
+        save_title=save_title,
+        stage="queued",
+        progress=0,
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    pool.notify()
+    return job
+
+def queue_position(db: Session, job: GenerationJob) -> Optional[int]:
+    """Jobs ahead of this one by (priority, age); approximate, fairness can reorder."""
+    if job.status != QUEUED:
+        return None
+    return (
+        db.query(func.count(GenerationJob.id))
+        .filter(
+            GenerationJob.status == QUEUED,
+            or_(
+                GenerationJob.priority > job.priority,
+                (GenerationJob.priority == job.priority) & (GenerationJob.created_at < job.created_at),
+            ),
+        )
+        .scalar()
+    )
+
+def _reap_stale(db: Session) -> None:
+    """Requeue running jobs whose worker stopped heartbeating (or fail them after max attempts)."""
+    now = datetime.utcnow()
+    cutoff = now - timedelta(seconds=settings.JOBS_STALE_AFTER_S)
+    stale = (GenerationJob.status == RUNNING, GenerationJob.heartbeat_at < cutoff)
+    db.execute(
+        update(GenerationJob)
+        .where(*stale, GenerationJob.attempts < settings.JOBS_MAX_ATTEMPTS)
+        .values(status=QUEUED, worker=None, stage="requeued")
+    )
+    db.execute(
+        update(GenerationJob)
+        .where(*stale)
+        .values(status=FAILED, error="Worker lost while running this job.", finished_at=now)
+    )
+    db.commit()
+
+def _claim(worker: str, reap: bool) -> Optional[str]:
+    db = SessionLocal()
+    try:
+        if reap:
+            _reap_stale(db)
+        running: Dict[str, int] = dict(
+            db.query(GenerationJob.principal, func.count(GenerationJob.id))
+            .filter(GenerationJob.status == RUNNING)
+            .group_by(GenerationJob.principal)
+            .all()
+        )
+        cands = (
+            db.query(GenerationJob.id, GenerationJob.principal, GenerationJob.priority, GenerationJob.created_at)
+            .filter(GenerationJob.status == QUEUED)
+            .order_by(GenerationJob.priority.desc(), GenerationJob.created_at.asc())
+            .limit(CLAIM_SCAN)
+            .all()
+        )
+        cap = settings.GENERATION_MAX_PER_PRINCIPAL
+        cands = [c for c in cands if running.get(c.principal, 0) < cap]
+        cands.sort(key=lambda c: (-c.priority, running.get(c.principal, 0), c.created_at))
+        for c in cands:
+            now = datetime.utcnow()
+            claimed = db.execute(
+                update(GenerationJob)
+                .where(GenerationJob.id == c.id, GenerationJob.status == QUEUED)
+                .values(
+                    status=RUNNING, worker=worker, stage="starting", progress=0,
+                    started_at=now, heartbeat_at=now, attempts=GenerationJob.attempts + 1,
+                )
+            ).rowcount
+            db.commit()
+            if claimed == 1:
+                return c.id
+        return None
+    except Exception:
+        db.rollback()
+        return None
+    finally:
+        db.close()
+
+def _load_request(job_id: str) -> Optional[GenerateScheduleIn]:
+    db = SessionLocal()
+    try:
+        job = db.get(GenerationJob, job_id)
+        return GenerateScheduleIn.model_validate_json(job.request_json) if job else None
+    except ValueError:   # request_json no longer validates against the schema
+        return None
+    finally:
+        db.close()
+
+def _mine(job_id: str, worker: str) -> tuple:
+    # a job is this worker's only while it's running under its claim; once reaped
+    # (and maybe reclaimed elsewhere) every write below becomes a no-op
+    return (GenerationJob.id == job_id, GenerationJob.status == RUNNING, GenerationJob.worker == worker)
+
+def _touch(job_id: str, worker: str, stage: str, progress: int) -> None:
+    db = SessionLocal()
+    try:
+        db.execute(
+            update(GenerationJob)
+            .where(*_mine(job_id, worker))
+            .values(stage=stage, progress=progress, heartbeat_at=datetime.utcnow())
+        )
+        db.commit()
+    finally:
+        db.close()
+
+def _requeue(job_id: str, worker: str) -> None:
+    db = SessionLocal()
+    try:
+        db.execute(
+            update(GenerationJob)
+            .where(*_mine(job_id, worker))
+            .values(status=QUEUED, worker=None, stage="requeued")
+        )
+        db.commit()
+    finally:
+        db.close()
+
+def _save_session(db: Session, job: GenerationJob, body: GenerateScheduleIn, schedule: ScheduleOutput) -> int:
+    rec = SessionRecord(
+        user_id=job.user_id,
+        title=job.save_title,
+        brief=body.brief,
+        goals_json=json.dumps(body.goals, ensure_ascii=False),
+        daily_minutes=body.daily_minutes,
+        duration_days=body.duration_days,
+        preferred_time=body.preferred_time,
+        timezone=body.timezone,
+        meta_json=json.dumps({"days": len(schedule.data), "job_id": job.id}, ensure_ascii=False),
+    )
+    session_store.write_plan(db, rec, schedule)
+    return rec.id
+
+def _finish(
+    job_id: str,
+    worker: str,
+    body: Optional[GenerateScheduleIn],
+    result: Optional[Tuple[ScheduleOutput, Dict[str, str]]],
+    error: Optional[str],
+) -> None:
+    """
+    Record the outcome with one conditional UPDATE on (id, running, worker). The saved
+    session is written in the same transaction and rolled back with it if the job is
+    no longer ours, so a reaped-and-reclaimed job can't finish twice.
+    """
+    db = SessionLocal()
+    try:
+        job = db.get(GenerationJob, job_id)
+        if job is None:
+            return
+        values: Dict[str, object] = {"finished_at": datetime.utcnow()}
+        if result is not None:
+            schedule, headers = result
+            values.update(
+                status=SUCCEEDED, stage="done", progress=100,
+                result_json=schedule.model_dump_json(),
+                meta_json=json.dumps({
+                    "plan_source": headers.get("X-Plan-Source"),
+                    "degradations": [d for d in headers.get("X-Degradations", "").split(",") if d],
+                }),
+            )
+            if job.save_title:
+                # only save for the verified user who enqueued it, and only if they still exist
+                # (deleting the user nulls user_id)
+                if job.user_id is None or job.principal != f"user:{job.user_id}" or db.get(User, job.user_id) is None:
+                    result, error = None, "Session owner could not be verified; plan not saved."
+                else:
+                    values["session_id"] = _save_session(db, job, body, schedule)
+        if result is None:
+            values.update(status=FAILED, stage="failed", error=(error or "failed")[:1000])
+        finished = db.execute(update(GenerationJob).where(*_mine(job_id, worker)).values(**values)).rowcount
+        if finished == 1:
+            db.commit()
+        else:
+            db.rollback()
+    except Exception as e:
+        db.rollback()
+        _fail(job_id, worker, f"Could not store job result: {e}")
+    finally:
+        db.close()
+
+def _fail(job_id: str, worker: str, error: str) -> None:
+    db = SessionLocal()
+    try:
+        db.execute(
+            update(GenerationJob)
+            .where(*_mine(job_id, worker))
+            .values(status=FAILED, stage="failed", error=error[:1000], finished_at=datetime.utcnow())
+        )
+        db.commit()
+    finally:
+        db.close()
+
+# ---------- worker pool ----------
+
+class JobWorkerPool:
+    """
+    N asyncio workers in this process. Idle workers sleep until notify() (new job
+    enqueued here) or JOBS_POLL_INTERVAL_S (jobs enqueued by other processes).
+    """
+    def __init__(self) -> None:
+        self._tasks: List[asyncio.Task] = []
+        self._wake: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._id = f"{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self._last_reap = 0.0
+
+    def start(self, workers: Optional[int] = None) -> None:
+        n = settings.JOBS_WORKERS if workers is None else workers
+        if self._tasks or n <= 0:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker(f"{self._id}/{i}")) for i in range(n)]
+
+    async def stop(self) -> None:
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self) -> None:
+        """Wake idle workers; safe to call from the threadpool."""
+        if self._loop is not None and self._wake is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    async def _worker(self, name: str) -> None:
+        while True:
+            reap = time.monotonic() - self._last_reap >= REAP_EVERY_S
+            if reap:
+                self._last_reap = time.monotonic()
+            job_id = await asyncio.to_thread(_claim, name, reap)
+            if job_id is None:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=settings.JOBS_POLL_INTERVAL_S)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(job_id, name)
+
+    async def _run(self, job_id: str, worker: str) -> None:
+        body = await asyncio.to_thread(_load_request, job_id)
+        if body is None:
+            # otherwise it stays running under this claim and the reaper hands it back forever
+            await asyncio.to_thread(_finish, job_id, worker, None, None, "Job request could not be loaded.")
+            return
+        progress = {"stage": "starting", "progress": 0}
+
+        def _on_progress(stage: str, pct: int) -> None:
+            progress["stage"], progress["progress"] = stage, pct
+
+        async def _heartbeat() -> None:
+            while True:
+                try:
+                    await asyncio.to_thread(_touch, job_id, worker, progress["stage"], progress["progress"])
+                except Exception:
+                    pass  # a missed beat only matters after JOBS_STALE_AFTER_S
+                await asyncio.sleep(settings.JOBS_HEARTBEAT_S)
+
+        hb = asyncio.create_task(_heartbeat())
+        token = request_id_var.set(f"job-{job_id}")
+        result, error = None, None
+        try:
+            _on_progress("waiting_for_capacity", 0)
+            async with admission.admit(shed=False):  # queued already; share LLM capacity with interactive runs
+                result = await run_generation(
+                    body, budget_s=settings.JOBS_GENERATION_BUDGET_S, on_progress=_on_progress, route="jobs-generate",
+                )
+        except asyncio.CancelledError:
+            await asyncio.shield(asyncio.to_thread(_requeue, job_id, worker))  # shutting down: hand it back
+            raise
+        except HTTPException as e:
+            error = str(e.detail)
+        except Exception as e:
+            error = f"Failed to generate roadmap: {e}"
+        finally:
+            hb.cancel()
+            request_id_var.reset(token)
+        await asyncio.to_thread(_finish, job_id, worker, body, result, error)
+
+pool = JobWorkerPool()
+
+# Standalone workers (e.g. API on serverless, workers on a VM): python -m app.jobs
+async def _serve() -> None:
+    pool.start(max(1, settings.JOBS_WORKERS))
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await pool.stop()
+
+if __name__ == "__main__":
+    from .database import engine
+    from .models import Base
+
+    Base.metadata.create_all(bind=engine)
+    asyncio.run(_serve())
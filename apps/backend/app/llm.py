@@ -1,22 +1,145 @@
 from __future__ import annotations
+from dataclasses import dataclass, field
 from typing import Any, Dict, List, Optional
 import asyncio
 import os  # NEW
-from openai import OpenAI
+import random
+import time
+
+import httpx
+from openai import AsyncOpenAI, APIConnectionError, APIStatusError, APITimeoutError
+from .accounting import record_llm
 from .config import settings
+from . import simulate
 
 # prefer settings, else real environment var, else let SDK read env itself
 _api_key = settings.OPENAI_API_KEY or os.getenv("OPENAI_API_KEY")
 
-_client = OpenAI(api_key=_api_key) if _api_key else OpenAI()
-
-async def chat_json(system: str, user: str, model: str = "gpt-4o-mini", max_tokens: int = 800) -> str:
-    def _call():
-        resp = _client.chat.completions.create(
-            model=model,
-            messages=[{"role": "system", "content": system}, {"role": "user", "content": user}],
-            temperature=0.2,
-            max_tokens=max_tokens,
-        )
-        return resp.choices[0].message.content or ""
-    return await asyncio.to_thread(_call)
+# One pooled async client per process; retries are handled below (with jitter), not by the SDK.
+_http = httpx.AsyncClient(
+    limits=httpx.Limits(
+        max_connections=settings.OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.OPENAI_MAX_CONNECTIONS,
+    ),
+    timeout=httpx.Timeout(settings.OPENAI_TIMEOUT, connect=10.0),
+)
+if not _api_key and settings.SIMULATE_PROVIDERS:
+    _api_key = "sk-simulated"  # never used; completions are faked below
+_client = AsyncOpenAI(api_key=_api_key, http_client=_http, max_retries=0) if _api_key else AsyncOpenAI(http_client=_http, max_retries=0)
+
+# Caps concurrent completions so fan-out can't flood the pool / provider
+_limiter = asyncio.Semaphore(settings.OPENAI_MAX_CONCURRENCY)
+
+_RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+@dataclass
+class LLMResult:
+    content: str
+    usage: Dict[str, int] = field(default_factory=dict)  # prompt_tokens, completion_tokens, total_tokens
+    attempts: int = 1
+    latency_s: float = 0.0
+
+def _retryable(exc: Exception) -> bool:
+    if isinstance(exc, APIStatusError):
+        return exc.status_code in _RETRY_STATUS
+    return isinstance(exc, (APITimeoutError, APIConnectionError))
+
+def _backoff(attempt: int, base: float = 0.5, cap: float = 8.0) -> float:
+    """Full-jitter exponential backoff."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+async def chat_completion(
+    messages: List[Dict[str, Any]],
+    model: str = "gpt-4o-mini",
+    max_tokens: int = 800,
+    temperature: float = 0.2,
+    deadline_s: Optional[float] = None,
+    max_retries: Optional[int] = None,
+    **kwargs: Any,
+) -> LLMResult:
+    """
+    Async chat completion with a concurrency cap, per-call deadline (covers the wait
+    for a slot and retries), and jittered retry on 429/5xx/timeouts. Returns content
+    plus token usage.
+    """
+    deadline_s = deadline_s if deadline_s is not None else settings.OPENAI_TIMEOUT
+    retries = settings.OPENAI_MAX_RETRIES if max_retries is None else max_retries
+    started = time.monotonic()
+    end = started + deadline_s
+
+    if settings.SIMULATE_PROVIDERS:
+        content, usage = await simulate.chat_completion(messages)
+        record_llm(model, time.monotonic() - started, usage)
+        return LLMResult(content=content, usage=usage, latency_s=time.monotonic() - started)
+
+    attempt = 0
+    while True:
+        remaining = end - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError(f"LLM call exceeded deadline of {deadline_s:.0f}s")
+        try:
+            # waiting for a slot counts against the deadline too
+            await asyncio.wait_for(_limiter.acquire(), timeout=remaining)
+            try:
+                remaining = end - time.monotonic()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError
+                resp = await asyncio.wait_for(
+                    _client.chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        temperature=temperature,
+                        max_tokens=max_tokens,
+                        **kwargs,
+                    ),
+                    timeout=remaining,
+                )
+            finally:
+                _limiter.release()
+            break
+        except asyncio.TimeoutError:
+            record_llm(model, time.monotonic() - started, {}, ok=False)
+            raise TimeoutError(f"LLM call exceeded deadline of {deadline_s:.0f}s")
+        except Exception as e:
+            delay = _backoff(attempt)
+            if attempt >= retries or not _retryable(e) or time.monotonic() + delay >= end:
+                record_llm(model, time.monotonic() - started, {}, ok=False)
+                raise
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    usage = {}
+    if getattr(resp, "usage", None):
+        usage = {
+            "prompt_tokens": resp.usage.prompt_tokens or 0,
+            "completion_tokens": resp.usage.completion_tokens or 0,
+            "total_tokens": resp.usage.total_tokens or 0,
+        }
+    record_llm(model, time.monotonic() - started, usage)
+    return LLMResult(
+        content=resp.choices[0].message.content or "",
+        usage=usage,
+        attempts=attempt + 1,
+        latency_s=time.monotonic() - started,
+    )
+
+async def chat_json(
+    system: str,
+    user: str,
+    model: str = "gpt-4o-mini",
+    max_tokens: int = 800,
+    deadline_s: Optional[float] = None,
+) -> LLMResult:
+    """
+    System + user prompt -> LLMResult. Returns the full result (not just the text, as
+    before the pooled client) so callers get token usage; use .content for the string.
+    """
+    return await chat_completion(
+        [{"role": "system", "content": system}, {"role": "user", "content": user}],
+        model=model,
+        max_tokens=max_tokens,
+        deadline_s=deadline_s,
+    )
+
+async def aclose() -> None:
+    await _client.close()
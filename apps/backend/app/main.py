@@ -1,16 +1,29 @@
 from .config import settings
-from fastapi import FastAPI
+from fastapi import APIRouter, Depends, FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from .observability import RequestIdMiddleware, langsmith_status
+from .rate_limit import RateLimitMiddleware
+from .accounting import registry as accounting_registry
+from .admission import admission
+from .plan_cache import plan_cache
+from .auth import user_cache
+from .hashing import hash_pool
 from .tools.search import build_video_query
 from .routes import router as app_router
 from .routes_auth import router as auth_router
 from .routes_sessions import router as sessions_router
-from .database import engine
+from .routes_jobs import router as jobs_router
+from .database import SessionLocal, async_engine, engine, storage_profile
 from .models import Base
+from .migrations import add_missing_columns
+from . import jobs, llm, plan_library
 
 app = FastAPI(title="Tracktive AI", version="0.1.0")
 
+# added before CORS so 429s still carry CORS headers
+if settings.RATE_LIMIT_ENABLED:
+    app.add_middleware(RateLimitMiddleware)
+
 # CORS for frontend (dev + add prod later)
 ALLOWED_ORIGINS = [
     "http://localhost:5173",
@@ -24,6 +37,11 @@ app.add_middleware(
     allow_credentials=False,   # using Bearer tokens, not cookies
     allow_methods=["*"],       # lets OPTIONS pass
     allow_headers=["*"],       # Authorization, Content-Type, etc.
+    expose_headers=[
+        "X-Request-ID", "X-Plan-Source", "X-Degradations", "X-Load-Shed", "X-Coalesced",
+        "RateLimit-Limit", "RateLimit-Remaining", "RateLimit-Reset", "RateLimit-Policy", "Retry-After",
+        "X-Next-Cursor", "ETag",
+    ],
 )
 
 app.add_middleware(RequestIdMiddleware)
@@ -32,15 +50,41 @@ app.add_middleware(RequestIdMiddleware)
 @app.on_event("startup")
 def _init_db():
     Base.metadata.create_all(bind=engine)
+    add_missing_columns(engine, Base.metadata)
+    with SessionLocal() as db:
+        plan_library.index_missing(db)
+
+@app.on_event("startup")
+async def _start_job_workers():
+    jobs.pool.start()
+
+@app.on_event("shutdown")
+async def _stop_job_workers():
+    await jobs.pool.stop()
+
+@app.on_event("shutdown")
+async def _close_async_engine():
+    await async_engine.dispose()
+
+@app.on_event("shutdown")
+def _stop_hash_pool():
+    hash_pool.shutdown()
+
+@app.on_event("shutdown")
+async def _close_llm():
+    await llm.aclose()
 
 # routes
 app.include_router(auth_router)
 app.include_router(app_router)
 app.include_router(sessions_router)
+app.include_router(jobs_router)
 
 @app.get("/healthz")
 def healthz():
     provider = "tavily" if settings.TAVILY_API_KEY else ("serpapi" if settings.SERPAPI_API_KEY else "none")
+    if settings.SIMULATE_PROVIDERS:
+        provider = "simulated"
     return {
         "ok": True,
         "env": settings.APP_ENV,
@@ -49,6 +93,51 @@ def healthz():
         "sample_video_query": build_video_query("fastapi basics"),
     }
 
-@app.get("/debug/langsmith")
+# ---------- debug (APP_ENV=dev only) ----------
+
+def _dev_only() -> None:
+    # per-request ledgers are looked up by the client-settable X-Request-ID and none of
+    # these routes authenticate, so outside dev they don't exist
+    if settings.APP_ENV != "dev":
+        raise HTTPException(status_code=404, detail="Not Found")
+
+debug = APIRouter(prefix="/debug", tags=["debug"], dependencies=[Depends(_dev_only)])
+
+@debug.get("/langsmith")
 def debug_langsmith(test: bool = True):
-    return langsmith_status(test=test)
\ No newline at end of file
+    return langsmith_status(test=test)
+
+@debug.get("/accounting")
+def debug_accounting():
+    """Per-stage aggregates (agents, tools, pipeline steps) since process start."""
+    return accounting_registry.aggregates()
+
+@debug.get("/accounting/{request_id}")
+def debug_accounting_request(request_id: str):
+    ledger = accounting_registry.get(request_id)
+    if not ledger:
+        raise HTTPException(status_code=404, detail="No accounting for that request id")
+    return ledger.to_dict()
+
+@debug.get("/admission")
+def debug_admission():
+    """In-flight / queued generations, recent latency, shed and degraded counts (this process)."""
+    return admission.stats()
+
+@debug.get("/plan-cache")
+def debug_plan_cache():
+    return plan_cache.stats()
+
+@debug.get("/auth-cache")
+def debug_auth_cache():
+    return user_cache.stats()
+
+@debug.get("/db")
+def debug_db():
+    return storage_profile()
+
+@debug.get("/hashing")
+def debug_hashing():
+    return hash_pool.stats()
+
+app.include_router(debug)
@@ -0,0 +1,25 @@
+from __future__ import annotations
+from typing import List
+
+from sqlalchemy import MetaData, inspect, text
+from sqlalchemy.engine import Engine
+
+# create_all() only creates missing tables; columns added to an existing model
+# need an ALTER. Only nullable columns are added, so no backfill is needed here.
+
+def add_missing_columns(engine: Engine, metadata: MetaData) -> List[str]:
+    """ALTER TABLE .. ADD COLUMN for nullable model columns the live tables lack."""
+    insp = inspect(engine)
+    added: List[str] = []
+    with engine.begin() as conn:
+        for table in metadata.sorted_tables:
+            if not insp.has_table(table.name):
+                continue
+            have = {c["name"] for c in insp.get_columns(table.name)}
+            for col in table.columns:
+                if col.name in have or not col.nullable:
+                    continue
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {col.name} {col.type.compile(dialect=engine.dialect)}"
+                conn.execute(text(ddl))
+                added.append(f"{table.name}.{col.name}")
+    return added
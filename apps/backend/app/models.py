@@ -1,6 +1,6 @@
 from __future__ import annotations
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Index, UniqueConstraint, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Index, UniqueConstraint, Boolean, Float
 from sqlalchemy.orm import relationship
 from .database import Base
 
@@ -12,6 +12,7 @@ class User(Base):
     email = Column(String(255), nullable=False, unique=True, index=True)
     password_hash = Column(String(255), nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    token_version = Column(Integer, nullable=True, default=0)  # bump to revoke issued tokens (NULL == 0)
 
     # relationship examples (not strictly required for MVP usage)
     sessions = relationship("SessionRecord", back_populates="user", cascade="all,delete")
@@ -29,17 +30,37 @@ class SessionRecord(Base):
     preferred_time = Column(String(8), nullable=False)       # "HH:MM"
     timezone = Column(String(64), nullable=False)
 
-    plan_json = Column(Text, nullable=False)   # full structured plan (days with resources/videos/exercises)
+    plan_json = Column(Text, nullable=False)   # plan header {overview, data: {}}; days live in session_days (legacy rows: full plan)
     meta_json = Column(Text, nullable=True)
 
+    # denormalized progress counters (NULL until first computed; see session_store)
+    total_days = Column(Integer, nullable=True)
+    completed_count = Column(Integer, nullable=True)
+    progress_version = Column(Integer, nullable=True, default=0)  # bumped on every progress change (ETags); NULL == 0
+
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
     user = relationship("User", back_populates="sessions")
     progress = relationship("DayProgress", back_populates="session", cascade="all,delete")
+    days = relationship("SessionDay", back_populates="session", cascade="all,delete", passive_deletes=True)
 
 Index("ix_session_user_created", SessionRecord.user_id, SessionRecord.created_at.desc())
 
+class SessionDay(Base):
+    """One day of a saved plan (DayPlan JSON), so day reads/writes touch a single row."""
+    __tablename__ = "session_days"
+    id = Column(Integer, primary_key=True)
+    session_id = Column(Integer, ForeignKey("session_records.id", ondelete="CASCADE"), nullable=False)
+    day_index = Column(Integer, nullable=False)  # 1..N
+    topic = Column(String(120), nullable=False)
+    payload = Column(Text, nullable=False)       # DayPlan JSON, as written by plan_codec
+
+    session = relationship("SessionRecord", back_populates="days")
+    __table_args__ = (
+        UniqueConstraint("session_id", "day_index", name="uq_session_days_index"),
+    )
+
 class DayProgress(Base):
     __tablename__ = "day_progress"
     id = Column(Integer, primary_key=True)
@@ -52,3 +73,65 @@ class DayProgress(Base):
     __table_args__ = (
         UniqueConstraint("session_id", "day_index", name="uq_session_day"),
     )
+
+class PlanLibraryEntry(Base):
+    """Validated manager output + day themes for a popular topic, reused across users."""
+    __tablename__ = "plan_library"
+    id = Column(Integer, primary_key=True)
+    topic_key = Column(String(255), nullable=False, unique=True, index=True)  # sorted content tokens
+    brief = Column(Text, nullable=False)
+    goals_json = Column(Text, nullable=False)
+    roadmap_json = Column(Text, nullable=False)   # RoadmapOutput pools
+    themes_json = Column(Text, nullable=False)    # ordered day titles from the themer
+    hits = Column(Integer, default=0, nullable=False)
+
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+class PlanLibraryToken(Base):
+    """Inverted index over plan_library.topic_key: one row per (content token, entry)."""
+    __tablename__ = "plan_library_tokens"
+    token = Column(String(64), primary_key=True)
+    entry_id = Column(Integer, ForeignKey("plan_library.id", ondelete="CASCADE"), primary_key=True, index=True)
+
+class SingleFlightLease(Base):
+    """Cross-process single-flight lease (used by the SQLite SingleFlight backend)."""
+    __tablename__ = "singleflight_leases"
+    key = Column(String(255), primary_key=True)
+    owner = Column(String(80), nullable=False)
+    expires_at = Column(Float, nullable=False)  # unix seconds
+
+class RateLimitBucket(Base):
+    """GCRA state for the shared (RATE_LIMIT_BACKEND=db) request-rate limiter."""
+    __tablename__ = "rate_limit_buckets"
+    key = Column(String(255), primary_key=True)   # "<bucket>:<user:id | ip:addr>"
+    tat = Column(Float, nullable=False)           # theoretical arrival time, unix seconds
+
+class GenerationJob(Base):
+    """A queued /jobs/generate run, executed by the worker pool in app/jobs.py."""
+    __tablename__ = "generation_jobs"
+    id = Column(String(32), primary_key=True)  # uuid4 hex (not enumerable)
+    principal = Column(String(120), nullable=False, index=True)  # "user:<id>" | "ip:<addr>"
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+
+    status = Column(String(16), nullable=False, default="queued")  # queued | running | succeeded | failed
+    priority = Column(Integer, nullable=False, default=0)          # higher runs first
+    request_json = Column(Text, nullable=False)                    # GenerateScheduleIn
+    save_title = Column(String(200), nullable=True)                # set -> save result as a SessionRecord
+
+    stage = Column(String(40), nullable=True)
+    progress = Column(Integer, nullable=False, default=0)          # 0..100
+    attempts = Column(Integer, nullable=False, default=0)
+    worker = Column(String(80), nullable=True)
+
+    result_json = Column(Text, nullable=True)   # ScheduleOutput
+    meta_json = Column(Text, nullable=True)     # plan source, degradations
+    error = Column(Text, nullable=True)
+    session_id = Column(Integer, ForeignKey("session_records.id", ondelete="SET NULL"), nullable=True)
+
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+Index("ix_jobs_claim", GenerationJob.status, GenerationJob.priority.desc(), GenerationJob.created_at)
@@ -0,0 +1,93 @@
+from __future__ import annotations
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, Optional, Tuple
+
+from .config import settings
+from .schemas import ScheduleOutput
+
+# =====================================================
+# Parsed-plan cache for session reads (per-process).
+# Keyed by (session_id, updated_at): any write that bumps updated_at misses the old
+# entry, so there is nothing to invalidate explicitly. Entries are shared between
+# requests -- treat cached schedules as read-only.
+# =====================================================
+
+Key = Tuple[int, Optional[datetime]]
+
+# rough Python-object size per byte of stored JSON (dicts/strs/models)
+_OBJ_OVERHEAD = 4
+
+# Loader for a miss -> (schedule, size of the JSON it was parsed from).
+# pydantic-core's JSON validation beats json.loads + model_construct of every
+# nested item (~6ms vs ~10ms for a 365-day plan), so loaders validate directly.
+Loader = Callable[[], Tuple[ScheduleOutput, int]]
+
+class PlanCache:
+    """LRU of parsed ScheduleOutput bounded by an estimated memory budget; one entry per session."""
+    def __init__(self, max_bytes: int):
+        self._data: "OrderedDict[Key, Tuple[ScheduleOutput, int]]" = OrderedDict()
+        self._by_session: Dict[int, Key] = {}
+        self._max_bytes = max_bytes
+        self._bytes = 0
+        self._lock = threading.Lock()  # sync routes run in the threadpool
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, session_id: int, updated_at: Optional[datetime], load: Loader) -> ScheduleOutput:
+        key = (session_id, updated_at)
+        with self._lock:
+            hit = self._data.get(key)
+            if hit is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return hit[0]
+            self.misses += 1
+        sched, size = load()
+        self.put(key, sched, size * _OBJ_OVERHEAD)
+        return sched
+
+    def put(self, key: Key, sched: ScheduleOutput, cost: int) -> None:
+        if cost > self._max_bytes:
+            return
+        with self._lock:
+            old = self._by_session.get(key[0])
+            if old is not None:
+                self._drop(old)  # older version of the same session
+            self._data[key] = (sched, cost)
+            self._by_session[key[0]] = key
+            self._bytes += cost
+            while self._bytes > self._max_bytes and self._data:
+                self._drop(next(iter(self._data)))
+
+    def rekey(self, session_id: int, old: Optional[datetime], new: Optional[datetime]) -> None:
+        """Carry a parsed plan across an updated_at bump that didn't touch the plan (e.g. rename)."""
+        with self._lock:
+            hit = self._data.get((session_id, old))
+        if hit is not None:
+            self.put((session_id, new), hit[0], hit[1])
+
+    def invalidate(self, session_id: int) -> None:
+        with self._lock:
+            key = self._by_session.get(session_id)
+            if key is not None:
+                self._drop(key)
+
+    def _drop(self, key: Key) -> None:
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+        if self._by_session.get(key[0]) == key:
+            del self._by_session[key[0]]
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._data),
+            "approx_bytes": self._bytes,
+            "max_bytes": self._max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+plan_cache = PlanCache(max_bytes=settings.PLAN_CACHE_MAX_MB * 1024 * 1024)
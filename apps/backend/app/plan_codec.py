@@ -0,0 +1,64 @@
+from __future__ import annotations
+import base64
+import zlib
+
+from .config import settings
+
+# =====================================================
+# Storage codec for session_days.payload (DayPlan JSON).
+# The first character says how a payload is stored, so rows written under any
+# codec stay readable after PLAN_STORAGE_CODEC changes:
+#   "{"  plain JSON (v0; every row written before this codec existed)
+#   "1"  raw deflate of the JSON against _ZDICT_V1, base85 text (fits the Text column)
+# The preset dictionary holds the keys and URL prefixes every day repeats, so even a
+# ~1 KB day compresses well on its own. Never edit a dictionary in place: add a new
+# version (and prefix) and let `python -m app.cli_reencode_plans` move rows over.
+# =====================================================
+
+CODECS = ("json", "zlib")
+
+_V1 = "1"
+_ZDICT_V1 = (
+    b'"duration":null'
+    b'"estimate_minutes":'
+    b'"source":"YouTube"'
+    b'https://developer.mozilla.org/en-US/docs/'
+    b'https://docs.python.org/3/'
+    b'https://en.wikipedia.org/wiki/'
+    b'https://www.youtube.com/watch?v='
+    b'"exercises":[{"title":"'
+    b'"videos":[{"title":"'
+    b'"resources":[{"title":"'
+    b'","steps":["'
+    b'"},{"title":"'
+    b'","url":"https://'
+    b'","why":"'
+    b'{"topic":"'
+    b'","description":"'
+)
+
+def _deflate(data: bytes) -> bytes:
+    c = zlib.compressobj(9, zlib.DEFLATED, -15, zdict=_ZDICT_V1)  # raw deflate: no header/checksum
+    return c.compress(data) + c.flush()
+
+def _inflate(data: bytes) -> bytes:
+    d = zlib.decompressobj(-15, zdict=_ZDICT_V1)
+    return d.decompress(data) + d.flush()
+
+def encode(doc: str, codec: str | None = None) -> str:
+    """Stored form of a JSON document under codec (default PLAN_STORAGE_CODEC)."""
+    codec = codec or settings.PLAN_STORAGE_CODEC
+    if codec == "json":
+        return doc
+    if codec == "zlib":
+        return _V1 + base64.b85encode(_deflate(doc.encode("utf-8"))).decode("ascii")
+    raise ValueError(f"PLAN_STORAGE_CODEC={codec} is not one of {', '.join(CODECS)}")
+
+def decode(payload: str) -> str:
+    """JSON text of a stored payload, whichever codec wrote it."""
+    if payload[:1] == _V1:
+        return _inflate(base64.b85decode(payload[1:])).decode("utf-8")
+    return payload
+
+def is_encoded_as(payload: str, codec: str) -> bool:
+    return (payload[:1] == _V1) if codec == "zlib" else (payload[:1] != _V1)
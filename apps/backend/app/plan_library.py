@@ -0,0 +1,153 @@
+from __future__ import annotations
+import json
+import re
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .models import PlanLibraryEntry, PlanLibraryToken
+from .scheduler import compose_schedule, content_tokens
+from .schemas import GenerateScheduleIn, RoadmapOutput, ScheduleOutput
+from .utils.brief_screen import prescreen_brief
+
+# Only bank previews that can stock a reasonable plan on their own
+MIN_RESOURCES = 6
+MIN_VIDEOS = 3
+MIN_EXERCISES = 1
+
+# entries sharing the most tokens with a request; only these are scored
+MATCH_CANDIDATES = 20
+
+def _topic_tokens(brief: str, goals: List[str]) -> set[str]:
+    toks = content_tokens(brief)
+    for g in goals:
+        toks |= content_tokens(g)
+    # filler that says nothing about the subject
+    return toks - {"learn", "learning", "want", "basics", "beginner", "how", "understand", "get", "better"}
+
+def topic_key(brief: str, goals: List[str]) -> str:
+    return " ".join(sorted(_topic_tokens(brief, goals)))[:255]
+
+def _similarity(a: set[str], b: set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+def _fresh_after() -> datetime:
+    return datetime.utcnow() - timedelta(days=settings.PLAN_LIBRARY_MAX_AGE_DAYS)
+
+def _is_stale(entry: PlanLibraryEntry) -> bool:
+    return entry.updated_at < _fresh_after()
+
+def _index_tokens(tokens: Iterable[str]) -> set[str]:
+    return {t[:64] for t in tokens}
+
+def find_match(db: Session, body: GenerateScheduleIn) -> Optional[Tuple[PlanLibraryEntry, float]]:
+    """Best fresh library entry for this brief/goals (Jaccard on content tokens), if any clears the bar."""
+    want = _topic_tokens(body.brief, body.goals)
+    if not want:
+        return None
+    best: Optional[Tuple[PlanLibraryEntry, float]] = None
+    # token index -> the few fresh entries with the most overlap, instead of scanning the table
+    rows = (
+        db.query(PlanLibraryEntry.id, PlanLibraryEntry.topic_key)
+        .join(PlanLibraryToken, PlanLibraryToken.entry_id == PlanLibraryEntry.id)
+        .filter(PlanLibraryToken.token.in_(_index_tokens(want)))
+        .filter(PlanLibraryEntry.updated_at >= _fresh_after())
+        .group_by(PlanLibraryEntry.id, PlanLibraryEntry.topic_key)
+        .order_by(func.count(PlanLibraryToken.token).desc())
+        .limit(MATCH_CANDIDATES)
+        .all()
+    )
+    for row_id, key in rows:
+        score = _similarity(want, set(key.split()))
+        if score >= settings.PLAN_LIBRARY_MIN_SIMILARITY and (best is None or score > best[1]):
+            best = (row_id, score)
+    if best is None:
+        return None
+    entry = db.get(PlanLibraryEntry, best[0])
+    if entry is None or _is_stale(entry):
+        return None
+    return entry, best[1]
+
+def _themes_for(themes: List[str], days: int) -> List[str]:
+    """Stretch a stored theme sequence to the requested length (extra days revisit earlier themes)."""
+    if not themes:
+        return []
+    out = list(themes[:days])
+    i = 0
+    while len(out) < days:
+        out.append(f"Practice: {themes[i % len(themes)]}"[:120])
+        i += 1
+    return out
+
+def adapt(entry: PlanLibraryEntry, body: GenerateScheduleIn) -> Tuple[RoadmapOutput, ScheduleOutput]:
+    """Rebuild a schedule locally from the banked pools for this user's days/minutes."""
+    preview = RoadmapOutput.model_validate_json(entry.roadmap_json)
+    for ex in preview.exercises:
+        if ex.estimate_minutes > body.daily_minutes:
+            ex.estimate_minutes = max(5, body.daily_minutes)
+    themes = _themes_for(json.loads(entry.themes_json or "[]"), body.duration_days)
+    schedule = compose_schedule(body, preview, day_topics=themes)
+    return preview, schedule
+
+def record_hit(db: Session, entry: PlanLibraryEntry) -> None:
+    db.execute(update(PlanLibraryEntry).where(PlanLibraryEntry.id == entry.id).values(hits=PlanLibraryEntry.hits + 1))
+    db.commit()
+
+def canonical_overview(body: GenerateScheduleIn) -> str:
+    """User-neutral overview for a banked entry, built from the topic and goals only."""
+    wanted = _topic_tokens(body.brief, [])
+    topic = " ".join(dict.fromkeys(w for w in re.findall(r"[a-z0-9]+", body.brief.lower()) if w in wanted))
+    goals = "; ".join(g.strip() for g in body.goals if g.strip())
+    return f"A study plan on {topic or 'this subject'}." + (f" Goals covered: {goals}." if goals else "")
+
+def store(db: Session, body: GenerateScheduleIn, preview: RoadmapOutput, themes: List[str]) -> Optional[PlanLibraryEntry]:
+    """
+    Bank a freshly generated (already link-validated) preview; refreshes the entry for the same topic.
+    Entries are served to other users, so only briefs the local prescreen allows outright
+    (every word from its benign vocabulary) are banked, and the preview's own overview is
+    replaced with canonical_overview().
+    """
+    if (
+        len(preview.resources) < MIN_RESOURCES
+        or len(preview.videos) < MIN_VIDEOS
+        or len(preview.exercises) < MIN_EXERCISES
+    ):
+        return None
+    verdict = prescreen_brief(body.brief, body.goals, body.daily_minutes)
+    if verdict is None or not verdict[0]:
+        return None
+    key = topic_key(body.brief, body.goals)
+    if not key:
+        return None
+
+    now = datetime.utcnow()
+    entry = db.query(PlanLibraryEntry).filter(PlanLibraryEntry.topic_key == key).first()
+    if entry is None:
+        entry = PlanLibraryEntry(topic_key=key, created_at=now)
+        db.add(entry)
+    elif not _is_stale(entry) and len(json.loads(entry.themes_json or "[]")) >= len(themes):
+        return entry  # current entry is fresh and at least as long; keep it
+    entry.brief = body.brief
+    entry.goals_json = json.dumps(body.goals, ensure_ascii=False)
+    entry.roadmap_json = preview.model_copy(update={"overview": canonical_overview(body)}).model_dump_json()
+    entry.themes_json = json.dumps(themes, ensure_ascii=False)
+    entry.updated_at = now
+    if entry.id is None:
+        db.flush()
+        db.add_all([PlanLibraryToken(token=t, entry_id=entry.id) for t in _index_tokens(key.split())])
+    db.commit()
+    return entry
+
+def index_missing(db: Session) -> int:
+    """Add token-index rows for entries banked before the index existed -> entries indexed."""
+    indexed = select(PlanLibraryToken.entry_id).distinct()
+    rows = db.query(PlanLibraryEntry.id, PlanLibraryEntry.topic_key).filter(PlanLibraryEntry.id.not_in(indexed)).all()
+    for entry_id, key in rows:
+        db.add_all([PlanLibraryToken(token=t, entry_id=entry_id) for t in _index_tokens(key.split())])
+    db.commit()
+    return len(rows)
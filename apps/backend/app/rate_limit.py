@@ -1,48 +1,492 @@
 from __future__ import annotations
 import asyncio
+import hashlib
+import heapq
+import logging
+import os
 import time
+import math
+import uuid
 from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from jose import JWTError
+from sqlalchemy import case, delete, func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+
+from .auth import decode_token
+from .config import settings
+
+T = TypeVar("T")
+log = logging.getLogger(__name__)
 
 class AlreadyRunning(Exception):
     """Raised when an identical request is already in flight."""
     pass
 
-class SingleFlight:
+class TooManyRunning(Exception):
+    """Raised when a principal already has its limit of distinct runs in flight."""
+    pass
+
+# =====================================================
+# Lock backends: acquire(key, ttl) -> owner token | None, release(key, owner)
+# =====================================================
+
+class InMemoryBackend:
     """
-    In-memory single-flight guard (per-process).
-    Prevents concurrent runs for the same key.
+    Per-process leases. Expiry uses a min-heap of (expires_at, key, owner), so each
+    acquire only pops leases that are actually due (amortized O(log n)) instead of
+    scanning everything. No awaits inside -> atomic on the event loop, no lock needed.
     """
-    def __init__(self, ttl: float = 300.0):
-        self._inflight: dict[str, float] = {}
-        self._lock = asyncio.Lock()
-        self._ttl = ttl  # cleanup stale locks after ttl seconds
+    is_async = False
+
+    def __init__(self) -> None:
+        self._leases: Dict[str, Tuple[float, str]] = {}
+        self._heap: List[Tuple[float, str, str]] = []
+
+    def _expire(self, now: float) -> None:
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            exp, key, owner = heapq.heappop(heap)
+            cur = self._leases.get(key)
+            if cur is not None and cur[1] == owner:  # skip entries for released/re-acquired keys
+                del self._leases[key]
 
-    async def _cleanup(self) -> None:
+    def acquire(self, key: str, ttl: float) -> Optional[str]:
+        now = time.monotonic()
+        if self._heap and self._heap[0][0] <= now:
+            self._expire(now)
+        if key in self._leases:
+            return None
+        owner = uuid.uuid4().hex
+        exp = now + ttl
+        self._leases[key] = (exp, owner)
+        heapq.heappush(self._heap, (exp, key, owner))
+        return owner
+
+    def release(self, key: str, owner: str) -> None:
+        cur = self._leases.get(key)
+        if cur is not None and cur[1] == owner:
+            del self._leases[key]
+        # the heap entry is dropped lazily when it comes due
+        if len(self._heap) > 4 * max(16, len(self._leases)):
+            self._heap = [(e, k, o) for (e, k, o) in self._heap if self._leases.get(k, (None, None))[1] == o]
+            heapq.heapify(self._heap)
+
+class SQLiteLeaseBackend:
+    """
+    Cross-process leases as rows in the shared SQLite file (singleflight_leases).
+    The DELETE-expired + INSERT OR IGNORE pair runs in one write transaction,
+    so SQLite's database write lock serializes competing workers.
+    """
+    is_async = True
+
+    def __init__(self, engine: Any) -> None:
+        self._engine = engine
+
+    def _acquire(self, key: str, ttl: float) -> Optional[str]:
+        from .models import SingleFlightLease
+        owner = f"{os.getpid()}:{uuid.uuid4().hex}"
         now = time.time()
-        stale = [k for k, ts in self._inflight.items() if now - ts > self._ttl]
-        for k in stale:
-            self._inflight.pop(k, None)
-
-    async def acquire(self, key: str) -> bool:
-        async with self._lock:
-            await self._cleanup()
-            if key in self._inflight:
-                return False
-            self._inflight[key] = time.time()
-            return True
-
-    async def release(self, key: str) -> None:
-        async with self._lock:
-            self._inflight.pop(key, None)
+        with self._engine.begin() as conn:
+            conn.execute(delete(SingleFlightLease).where(
+                SingleFlightLease.key == key, SingleFlightLease.expires_at <= now
+            ))
+            res = conn.execute(
+                sqlite_insert(SingleFlightLease)
+                .values(key=key, owner=owner, expires_at=now + ttl)
+                .on_conflict_do_nothing(index_elements=["key"])
+            )
+        return owner if res.rowcount == 1 else None
+
+    def _release(self, key: str, owner: str) -> None:
+        from .models import SingleFlightLease
+        with self._engine.begin() as conn:
+            conn.execute(delete(SingleFlightLease).where(
+                SingleFlightLease.key == key, SingleFlightLease.owner == owner
+            ))
+
+    async def acquire(self, key: str, ttl: float) -> Optional[str]:
+        return await asyncio.to_thread(self._acquire, key, ttl)
+
+    async def release(self, key: str, owner: str) -> None:
+        await asyncio.to_thread(self._release, key, owner)
+
+class PostgresAdvisoryBackend:
+    """
+    Cross-process locks via pg_try_advisory_lock. The lock lives on a dedicated pooled
+    connection held for the run; if the worker dies the connection drops and Postgres
+    frees the lock, so no TTL bookkeeping is needed. Each in-flight key holds one
+    connection, so keep the pool sized for concurrent generations.
+    """
+    is_async = True
+
+    def __init__(self, engine: Any) -> None:
+        self._engine = engine
+        self._held: Dict[str, Tuple[str, Any]] = {}
+
+    @staticmethod
+    def _lock_id(key: str) -> int:
+        return int.from_bytes(hashlib.sha256(key.encode("utf-8")).digest()[:8], "big", signed=True)
+
+    def _acquire(self, key: str, ttl: float) -> Optional[str]:
+        conn = self._engine.connect()
+        try:
+            ok = conn.execute(select(func.pg_try_advisory_lock(self._lock_id(key)))).scalar()
+            conn.commit()
+        except Exception:
+            conn.invalidate()  # the lock may have been taken before the failure
+            conn.close()
+            raise
+        if not ok:
+            conn.close()
+            return None
+        owner = uuid.uuid4().hex
+        self._held[key] = (owner, conn)
+        return owner
+
+    def _release(self, key: str, owner: str) -> None:
+        held = self._held.get(key)
+        if held is None or held[0] != owner:
+            return
+        self._held.pop(key, None)
+        conn = held[1]
+        try:
+            conn.execute(select(func.pg_advisory_unlock(self._lock_id(key))))
+            conn.commit()
+        except Exception:
+            # the lock may still be held: drop the DB connection (Postgres frees its
+            # session locks) instead of returning it to the pool with the lock attached
+            conn.invalidate()
+            raise
+        finally:
+            conn.close()
+
+    async def acquire(self, key: str, ttl: float) -> Optional[str]:
+        return await asyncio.to_thread(self._acquire, key, ttl)
+
+    async def release(self, key: str, owner: str) -> None:
+        await asyncio.to_thread(self._release, key, owner)
+
+def make_backend(kind: str | None = None):
+    """memory | sqlite | postgres | auto (match DATABASE_URL; memory for other DBs)."""
+    kind = (kind or settings.SINGLEFLIGHT_BACKEND or "memory").lower()
+    if kind == "memory":
+        return InMemoryBackend()
+    from .database import engine
+    dialect = engine.dialect.name
+    if kind == "auto":
+        kind = dialect if dialect in ("sqlite", "postgresql") else "memory"
+        if kind == "memory":
+            return InMemoryBackend()
+    if kind == "sqlite" and dialect == "sqlite":
+        return SQLiteLeaseBackend(engine)
+    if kind in ("postgres", "postgresql") and dialect == "postgresql":
+        return PostgresAdvisoryBackend(engine)
+    raise RuntimeError(f"SINGLEFLIGHT_BACKEND={kind} does not match database dialect {dialect}")
+
+# =====================================================
+# SingleFlight
+# =====================================================
+
+class SingleFlight:
+    """
+    Single-flight guard over a pluggable lock backend (in-memory, SQLite, Postgres).
+    Prevents concurrent runs for the same key; with a DB backend this holds across
+    uvicorn workers / serverless instances sharing the database.
+    """
+    def __init__(self, ttl: float = 300.0, backend: Any = None):
+        self._backend = backend or InMemoryBackend()
+        self._shared: Dict[str, asyncio.Future] = {}
+        self._ttl = ttl  # stale locks expire after ttl seconds
+
+    async def acquire(self, key: str) -> Optional[str]:
+        """-> owner token for this hold (pass it to release), or None if the key is taken."""
+        b = self._backend
+        return (await b.acquire(key, self._ttl)) if b.is_async else b.acquire(key, self._ttl)
+
+    async def release(self, key: str, owner: str) -> None:
+        # the token, not the key, identifies the hold: a late release after the lease
+        # expired and was re-acquired must not free the new holder's lock
+        b = self._backend
+        if b.is_async:
+            await b.release(key, owner)
+        else:
+            b.release(key, owner)
 
     @asynccontextmanager
     async def guard(self, key: str):
-        ok = await self.acquire(key)
-        if not ok:
+        owner = await self.acquire(key)
+        if owner is None:
             raise AlreadyRunning(f"in-flight: {key}")
         try:
             yield
         finally:
-            await self.release(key)
+            try:
+                await self.release(key, owner)
+            except Exception:
+                # the work already finished; a stuck lease expires after ttl
+                log.warning("singleflight release failed for %s", key, exc_info=True)
+
+    async def coalesce(self, key: str, fn: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """
+        Result-sharing mode: the first caller for `key` starts fn() as its own task;
+        identical concurrent callers in this process await that same task instead of
+        being rejected. The leader also takes the backend lock, so an identical run
+        in another worker is refused with AlreadyRunning.
+        Returns (result, shared) where shared=True for callers that piggy-backed.
+        The task outlives a disconnecting leader so followers still get the result.
+        """
+        task = self._shared.get(key)
+        leader = task is None
+        if leader:
+            async def _locked() -> T:
+                async with self.guard(key):
+                    return await fn()
+
+            task = asyncio.ensure_future(_locked())
+            self._shared[key] = task
+
+            def _done(t: asyncio.Future, k: str = key) -> None:
+                if self._shared.get(k) is t:
+                    self._shared.pop(k, None)
+                if not t.cancelled():
+                    t.exception()  # mark retrieved even if every waiter went away
+            task.add_done_callback(_done)
+        return await asyncio.shield(task), not leader
+
+class ConcurrencyLimiter:
+    """
+    Per-principal (user or IP) cap on concurrent distinct runs (per-process).
+    """
+    def __init__(self, limit: int = 2):
+        self._counts: dict[str, int] = {}
+        self._limit = limit
+
+    def acquire(self, principal: str) -> bool:
+        # no await between check and increment -> atomic on the event loop
+        if self._counts.get(principal, 0) >= self._limit:
+            return False
+        self._counts[principal] = self._counts.get(principal, 0) + 1
+        return True
+
+    def release(self, principal: str) -> None:
+        n = self._counts.get(principal, 0) - 1
+        if n <= 0:
+            self._counts.pop(principal, None)
+        else:
+            self._counts[principal] = n
+
+    @asynccontextmanager
+    async def slot(self, principal: str):
+        if not self.acquire(principal):
+            raise TooManyRunning(f"concurrency limit reached: {principal}")
+        try:
+            yield
+        finally:
+            self.release(principal)
+
+# =====================================================
+# Request-rate limiting: GCRA token buckets per route, keyed by user / IP
+# =====================================================
+
+def principal_of(authorization: Optional[str], client_host: Optional[str]) -> str:
+    """
+    Authenticated user if a validly signed bearer token is present, else client IP.
+    Signature-only (no revocation check): fine for rate and concurrency keys, not for
+    deciding whose data a request may touch (see auth.get_optional_user).
+    """
+    auth = authorization or ""
+    if auth.lower().startswith("bearer "):
+        try:
+            sub = decode_token(auth[7:].strip()).get("sub")
+            if sub:
+                return f"user:{sub}"
+        except JWTError:
+            pass
+    return f"ip:{client_host or 'unknown'}"
+
+_PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+@dataclass(frozen=True)
+class Rate:
+    limit: int      # requests per period (sustained)
+    period: float   # seconds
+    burst: int      # bucket size: back-to-back requests allowed from a full bucket
+
+    @classmethod
+    def parse(cls, spec: str, burst: Optional[int] = None) -> "Rate":
+        """'20/hour' -> Rate(20, 3600, burst or 20)."""
+        n, _, unit = spec.partition("/")
+        unit = unit.strip().lower().rstrip("s")
+        if unit not in _PERIODS or not n.strip().isdigit() or int(n) <= 0:
+            raise ValueError(f"bad rate spec: {spec!r} (want e.g. '20/hour')")
+        limit = int(n)
+        return cls(limit=limit, period=float(_PERIODS[unit]), burst=max(1, burst or limit))
+
+    @property
+    def interval(self) -> float:
+        """Emission interval: one token refills every interval seconds."""
+        return self.period / self.limit
+
+@dataclass
+class RateDecision:
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_s: float             # until the bucket is full again
+    retry_after_s: float = 0.0
+
+    def headers(self, rate: Rate) -> Dict[str, str]:
+        h = {
+            "RateLimit-Limit": str(self.limit),
+            "RateLimit-Remaining": str(self.remaining),
+            "RateLimit-Reset": str(math.ceil(self.reset_s)),
+            "RateLimit-Policy": f"{rate.limit};w={int(rate.period)};burst={rate.burst}",
+        }
+        if not self.allowed:
+            h["Retry-After"] = str(max(1, math.ceil(self.retry_after_s)))
+        return h
+
+def _allowed(rate: Rate, now: float, new_tat: float) -> RateDecision:
+    t = rate.interval
+    used = new_tat - now
+    return RateDecision(True, rate.burst, max(0, int((rate.burst * t - used) / t + 1e-9)), used)
+
+def _denied(rate: Rate, now: float, tat: float) -> RateDecision:
+    # the next request would push tat to max(tat, now) + T; it fits once that is within burst*T of now
+    wait = max(tat, now) + rate.interval - now - rate.burst * rate.interval
+    return RateDecision(False, rate.burst, 0, max(0.0, tat - now), retry_after_s=wait)
+
+class GCRALimiter:
+    """
+    In-memory GCRA (per-process). State is one float per key, the theoretical arrival
+    time (TAT); a hit is a dict lookup + compare, O(1). Keys whose TAT has passed are
+    equivalent to a full bucket and get swept when the table doubles (amortized O(1)).
+    """
+    is_async = False
+
+    def __init__(self) -> None:
+        self._tat: Dict[str, float] = {}
+        self._next_sweep = 1024
+
+    def hit(self, key: str, rate: Rate) -> RateDecision:
+        now = time.monotonic()
+        tat = self._tat.get(key, now)
+        new_tat = max(tat, now) + rate.interval
+        if new_tat - now > rate.burst * rate.interval:
+            return _denied(rate, now, tat)
+        self._tat[key] = new_tat
+        if len(self._tat) > self._next_sweep:
+            self._tat = {k: t for k, t in self._tat.items() if t > now}
+            self._next_sweep = max(1024, 2 * len(self._tat))
+        return _allowed(rate, now, new_tat)
+
+class DBGCRALimiter:
+    """
+    Shared GCRA for multi-worker deployments: one row per key in rate_limit_buckets.
+    A hit is a single conditional upsert (INSERT .. ON CONFLICT DO UPDATE .. WHERE
+    RETURNING tat), so the check-and-set is atomic in SQLite and Postgres alike.
+    """
+    is_async = True
+
+    def __init__(self, engine: Any) -> None:
+        self._engine = engine
+        self._insert = pg_insert if engine.dialect.name == "postgresql" else sqlite_insert
+        self._hits = 0
+
+    def _hit(self, key: str, rate: Rate) -> RateDecision:
+        from .models import RateLimitBucket as B
+        now = time.time()
+        t = rate.interval
+        new_tat = case((B.tat > now, B.tat), else_=now) + t
+        stmt = (
+            self._insert(B).values(key=key, tat=now + t)
+            .on_conflict_do_update(index_elements=["key"], set_={"tat": new_tat}, where=new_tat - now <= rate.burst * t)
+            .returning(B.tat)
+        )
+        with self._engine.begin() as conn:
+            tat = conn.execute(stmt).scalar()
+            if tat is None:
+                cur = conn.execute(select(B.tat).where(B.key == key)).scalar()
+            self._hits += 1
+            if self._hits % 1000 == 0:  # drop rows whose bucket has refilled
+                conn.execute(delete(B).where(B.tat <= now))
+        if tat is not None:
+            return _allowed(rate, now, tat)
+        return _denied(rate, now, cur if cur is not None else now)
+
+    async def hit(self, key: str, rate: Rate) -> RateDecision:
+        return await asyncio.to_thread(self._hit, key, rate)
+
+def make_rate_limiter(kind: str | None = None):
+    """memory | db (shared rate_limit_buckets table on DATABASE_URL)."""
+    kind = (kind or settings.RATE_LIMIT_BACKEND or "memory").lower()
+    if kind == "memory":
+        return GCRALimiter()
+    if kind == "db":
+        from .database import engine
+        return DBGCRALimiter(engine)
+    raise RuntimeError(f"RATE_LIMIT_BACKEND={kind} is not one of memory | db")
+
+def default_rules() -> Dict[Tuple[str, str], Tuple[str, Rate]]:
+    """(method, path) -> (bucket, rate). Routes sharing a bucket share one budget."""
+    gen = Rate.parse(settings.RATE_LIMIT_GENERATE, settings.RATE_LIMIT_GENERATE_BURST)
+    return {
+        ("POST", "/generate-roadmap"): ("generate", gen),
+        ("POST", "/generate-roadmap/stream"): ("generate", gen),
+        ("POST", "/jobs/generate"): ("generate", gen),
+    }
+
+class RateLimitMiddleware:
+    """
+    Pure ASGI middleware (no body buffering). Requests to rate-limited routes cost one
+    bucket update; everything else passes straight through. Allowed responses carry
+    RateLimit-* headers, rejected ones are 429 with Retry-After.
+    If the shared backend errors we fail open: the limiter must not take generation down.
+    """
+    def __init__(self, app: Any, limiter: Any = None, rules: Optional[Dict[Tuple[str, str], Tuple[str, Rate]]] = None):
+        self.app = app
+        self.limiter = limiter if limiter is not None else make_rate_limiter()
+        self.rules = rules if rules is not None else default_rules()
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        rule = self.rules.get((scope["method"], scope["path"].rstrip("/") or "/"))
+        if rule is None:
+            return await self.app(scope, receive, send)
+
+        bucket, rate = rule
+        client = scope.get("client")
+        key = f"{bucket}:{principal_of(Headers(scope=scope).get('authorization'), client[0] if client else None)}"
+        lim = self.limiter
+        try:
+            decision = (await lim.hit(key, rate)) if lim.is_async else lim.hit(key, rate)
+        except Exception:
+            return await self.app(scope, receive, send)
+
+        extra = decision.headers(rate)
+        if not decision.allowed:
+            resp = JSONResponse(
+                {"detail": "Too many generation requests. Please try again later."},
+                status_code=429,
+                headers=extra,
+            )
+            return await resp(scope, receive, send)
+
+        async def _send(message: dict) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                for k, v in extra.items():
+                    headers[k] = v
+            await send(message)
+
+        await self.app(scope, receive, _send)
 
-singleflight = SingleFlight(ttl=300.0)
+singleflight = SingleFlight(ttl=300.0, backend=make_backend())
+principal_limiter = ConcurrencyLimiter(limit=settings.GENERATION_MAX_PER_PRINCIPAL)
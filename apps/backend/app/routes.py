@@ -121,17 +121,32 @@
 
 # apps/backend/app/routes.py
 from __future__ import annotations
-from fastapi import APIRouter, HTTPException, Request
+import asyncio
+import hashlib
+import json
+import time
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+import anyio
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 
 from agents import InputGuardrailTripwireTriggered, OutputGuardrailTripwireTriggered
 
-from .schemas import GenerateScheduleIn, ScheduleOutput, RoadmapOutput, ExerciseItem
+from .schemas import GenerateScheduleIn, ScheduleOutput, RoadmapOutput, ExerciseItem, DayPlan
 from .scheduler import compose_schedule
-from .rate_limit import singleflight, AlreadyRunning
+from .rate_limit import singleflight, principal_limiter, principal_of, AlreadyRunning, TooManyRunning
+from .admission import admission, Overloaded, retry_after_header
 from .observability import root_trace
+from .accounting import stage, track_request
+from .deadline import current_deadline, deadline_scope
+from .config import settings
+from .database import SessionLocal
+from . import plan_library
 
 from .agents_oa import run_manager as run_manager_preview
 from .agents_oa import make_exercise_for_topic, run_day_themer  # NEW
+from .agents_oa import screen_brief_local
 from .utils.linkcheck import filter_valid_resources, filter_valid_videos
 from .utils.backfill import backfill_resources, backfill_videos
 
@@ -142,121 +157,506 @@ RES_MIN, RES_MAX = 2, 2
 VID_MIN, VID_MAX = 1, 1
 EX_MIN, EX_MAX = 1, 1
 
-async def _ensure_day_minimums(schedule: ScheduleOutput, brief: str, goals: list[str], daily_minutes: int) -> ScheduleOutput:
+# days filled concurrently (each does searches + link checks + maybe an agent call)
+DAY_CONCURRENCY = 4
+
+# Deadline budgeting (seconds left on the request deadline). Each optional stage keeps a
+# reserve for the stages after it and is skipped unless NEED_FOR_* is left on top of that.
+MANAGER_TIMEOUT_S = 90.0
+MANAGER_RESERVE_S = 12.0        # kept back for compose + per-day fill
+NEED_FOR_LINKCHECK_S = 4.0
+NEED_FOR_BACKFILL_S = 6.0
+NEED_FOR_THEMER_S = 6.0
+NEED_FOR_DAY_BACKFILL_S = 3.0
+NEED_FOR_EXERCISE_AGENT_S = 5.0
+EXERCISE_RESERVE_S = 1.0
+DAY_RESERVE_S = NEED_FOR_EXERCISE_AGENT_S + EXERCISE_RESERVE_S   # per-day backfill keeps this for the exercise
+THEMER_RESERVE_S = NEED_FOR_DAY_BACKFILL_S + DAY_RESERVE_S       # themer keeps this for the day fill
+
+def _template_exercise(topic: str, daily_minutes: int) -> ExerciseItem:
+    return ExerciseItem(
+        title=f"Practice: {topic}",
+        steps=["Study the resource", "Apply to one example", "Write two takeaways"],
+        estimate_minutes=min(daily_minutes, 30),
+    )
+
+async def _ensure_day(day: DayPlan, brief: str, goals: list[str], daily_minutes: int) -> DayPlan:
     """
-    Ensure each day has at least:
+    Ensure one day has at least:
       - 2 resources
       - 1 video
       - 1 exercise
-    Validate/backfill links and generate exercises as needed.
+    Validate/backfill links and generate exercises as needed, within the request deadline.
     """
-    for key, day in schedule.data.items():
-        topic = day.topic
-
-        # ---- RESOURCES ----
-        if len(day.resources) < RES_MIN:
+    topic = day.topic
+    dl = current_deadline()
+
+    # ---- RESOURCES ----
+    if len(day.resources) < RES_MIN:
+        if not dl.allows(NEED_FOR_DAY_BACKFILL_S, reserve_s=DAY_RESERVE_S):
+            dl.degrade("day_backfill_skipped")
+        else:
             try:
                 need = RES_MIN
-                filled = await backfill_resources(f"{topic} {brief}", [topic] + goals, day.resources, need_at_least=need)
-                good = await filter_valid_resources(filled[:RES_MAX])
+                filled = await dl.run(
+                    backfill_resources(f"{topic} {brief}", [topic] + goals, day.resources, need_at_least=need),
+                    reserve_s=DAY_RESERVE_S,
+                )
+                good = await dl.run(filter_valid_resources(filled[:RES_MAX]), reserve_s=DAY_RESERVE_S)
                 day.resources = (good or day.resources)[:RES_MAX]
+            except asyncio.TimeoutError:
+                dl.degrade("day_backfill_timeout")
+                day.resources = day.resources[:RES_MAX]
             except Exception:
                 day.resources = day.resources[:RES_MAX]
 
-        # ---- VIDEOS ----
-        if len(day.videos) < VID_MIN:
+    # ---- VIDEOS ----
+    if len(day.videos) < VID_MIN:
+        if not dl.allows(NEED_FOR_DAY_BACKFILL_S, reserve_s=DAY_RESERVE_S):
+            dl.degrade("day_backfill_skipped")
+        else:
             try:
                 need = VID_MIN
-                filled = await backfill_videos(f"{topic} {brief}", [topic] + goals, day.videos, need_at_least=need)
-                good = await filter_valid_videos(filled[:VID_MAX])
+                filled = await dl.run(
+                    backfill_videos(f"{topic} {brief}", [topic] + goals, day.videos, need_at_least=need),
+                    reserve_s=DAY_RESERVE_S,
+                )
+                good = await dl.run(filter_valid_videos(filled[:VID_MAX]), reserve_s=DAY_RESERVE_S)
                 day.videos = (good or day.videos)[:VID_MAX]
+            except asyncio.TimeoutError:
+                dl.degrade("day_backfill_timeout")
+                day.videos = day.videos[:VID_MAX]
             except Exception:
                 day.videos = day.videos[:VID_MAX]
 
-        # ---- EXERCISES ----
-        if len(day.exercises) < EX_MIN:
+    # ---- EXERCISES ----
+    if len(day.exercises) < EX_MIN:
+        if not dl.allows(NEED_FOR_EXERCISE_AGENT_S, reserve_s=EXERCISE_RESERVE_S):
+            dl.degrade("exercise_template")
+            day.exercises = [_template_exercise(topic, daily_minutes)]
+        else:
             try:
-                ex = await make_exercise_for_topic(topic, daily_minutes)
+                ex = await dl.run(make_exercise_for_topic(topic, daily_minutes), reserve_s=EXERCISE_RESERVE_S)
                 if ex.estimate_minutes > daily_minutes:
                     ex.estimate_minutes = daily_minutes
                 day.exercises = [ex]
+            except asyncio.TimeoutError:
+                dl.degrade("exercise_template")
+                day.exercises = [_template_exercise(topic, daily_minutes)]
             except Exception:
-                day.exercises = [
-                    ExerciseItem(
-                        title=f"Practice: {topic}",
-                        steps=["Study the resource", "Apply to one example", "Write two takeaways"],
-                        estimate_minutes=min(daily_minutes, 30),
-                    )
-                ]
-
-        # final trim to caps (UI simplicity)
-        day.resources = (day.resources or [])[:RES_MAX]
-        day.videos = (day.videos or [])[:VID_MAX]
-        day.exercises = (day.exercises or [])[:EX_MAX]
+                day.exercises = [_template_exercise(topic, daily_minutes)]
 
-    return schedule
+    # final trim to caps (UI simplicity)
+    day.resources = (day.resources or [])[:RES_MAX]
+    day.videos = (day.videos or [])[:VID_MAX]
+    day.exercises = (day.exercises or [])[:EX_MAX]
+    return day
 
-@router.post("/generate-roadmap", response_model=ScheduleOutput)
-async def generate_roadmap(req: Request, body: GenerateScheduleIn):
-    client_ip = getattr(req.client, "host", "unknown")
-    key = f"gen:{client_ip}"
+async def _ensured_days(
+    schedule: ScheduleOutput, brief: str, goals: list[str], daily_minutes: int
+) -> AsyncIterator[Tuple[str, DayPlan]]:
+    """Fill days concurrently (bounded) and yield (day_key, day) as each one finishes."""
+    sem = asyncio.Semaphore(DAY_CONCURRENCY)
+
+    async def _one(key: str, day: DayPlan) -> Tuple[str, DayPlan]:
+        async with sem:
+            return key, await _ensure_day(day, brief, goals, daily_minutes)
 
+    tasks = [asyncio.create_task(_one(k, d)) for k, d in schedule.data.items()]
     try:
-        with root_trace("generate-roadmap", inputs=body.model_dump()):
-            async with singleflight.guard(key):
-                # 1) run agent (SDK guardrails raise typed errors)
-                try:
-                    preview: RoadmapOutput = await run_manager_preview(body)
-                except InputGuardrailTripwireTriggered as e:
-                    raise HTTPException(status_code=400, detail=f"Input guardrail: {e}") from e
-                except OutputGuardrailTripwireTriggered as e:
-                    raise HTTPException(status_code=502, detail=f"Output guardrail: {e}") from e
+        for fut in asyncio.as_completed(tasks):
+            yield await fut
+    finally:
+        for t in tasks:
+            t.cancel()
+
+async def _ensure_day_minimums(
+    schedule: ScheduleOutput, brief: str, goals: list[str], daily_minutes: int,
+    on_day: Optional[Callable[[int, int], None]] = None,
+) -> ScheduleOutput:
+    """Guarantee per-day minimums for every day of the schedule; on_day(done, total) after each."""
+    total = len(schedule.data)
+    with stage("day_minimums"):
+        done = 0
+        async for key, day in _ensured_days(schedule, brief, goals, daily_minutes):
+            schedule.data[key] = day
+            done += 1
+            if on_day is not None:
+                on_day(done, total)
+    return schedule
 
-                # 2) validate links at preview level
-                try:
-                    good_res = await filter_valid_resources(preview.resources)
-                    good_vids = await filter_valid_videos(preview.videos)
-                except Exception:
-                    good_res, good_vids = preview.resources, preview.videos
+async def _build_preview(body: GenerateScheduleIn) -> RoadmapOutput:
+    """Manager run + preview-level link validation and backfill."""
+    dl = current_deadline()
 
-                # 3) backfill preview to reach at least "days * per-day" totals
-                try:
-                    days = min(max(1, body.duration_days), 12)
-                    need_r_total = min(24, days * RES_MIN)
-                    need_v_total = min(24, days * VID_MIN)
-                    good_res = await backfill_resources(body.brief, body.goals, good_res, need_at_least=need_r_total)
-                    good_vids = await backfill_videos(body.brief, body.goals, good_vids, need_at_least=need_v_total)
-                except Exception:
-                    pass
-
-                preview = RoadmapOutput(
-                    overview=preview.overview,
-                    resources=good_res[:24],
-                    videos=good_vids[:24],
-                    exercises=preview.exercises[:24],
+    # 1) run agent (SDK guardrails raise typed errors)
+    try:
+        with stage("manager"):
+            preview: RoadmapOutput = await run_manager_preview(
+                body, timeout=dl.cap(MANAGER_TIMEOUT_S, reserve_s=MANAGER_RESERVE_S)
+            )
+    except InputGuardrailTripwireTriggered as e:
+        raise HTTPException(status_code=400, detail=f"Input guardrail: {e}") from e
+    except OutputGuardrailTripwireTriggered as e:
+        raise HTTPException(status_code=502, detail=f"Output guardrail: {e}") from e
+
+    # 2) validate links at preview level
+    good_res, good_vids = list(preview.resources), list(preview.videos)
+    if not dl.allows(NEED_FOR_LINKCHECK_S, reserve_s=MANAGER_RESERVE_S):
+        dl.degrade("preview_linkcheck_skipped")
+    else:
+        try:
+            with stage("preview_linkcheck"):
+                good_res, good_vids = await dl.run(
+                    asyncio.gather(filter_valid_resources(preview.resources), filter_valid_videos(preview.videos)),
+                    reserve_s=MANAGER_RESERVE_S,
                 )
+        except asyncio.TimeoutError:
+            dl.degrade("preview_linkcheck_timeout")
+        except Exception:
+            pass
+
+    # 3) backfill preview to reach at least "days * per-day" totals
+    if not dl.allows(NEED_FOR_BACKFILL_S, reserve_s=MANAGER_RESERVE_S):
+        dl.degrade("preview_backfill_skipped")
+    else:
+        try:
+            days = min(max(1, body.duration_days), 12)
+            need_r_total = min(24, days * RES_MIN)
+            need_v_total = min(24, days * VID_MIN)
+            with stage("preview_backfill"):
+                good_res = await dl.run(
+                    backfill_resources(body.brief, body.goals, good_res, need_at_least=need_r_total),
+                    reserve_s=MANAGER_RESERVE_S,
+                )
+                good_vids = await dl.run(
+                    backfill_videos(body.brief, body.goals, good_vids, need_at_least=need_v_total),
+                    reserve_s=MANAGER_RESERVE_S,
+                )
+        except asyncio.TimeoutError:
+            dl.degrade("preview_backfill_timeout")
+        except Exception:
+            pass
+
+    return RoadmapOutput(
+        overview=preview.overview,
+        resources=good_res[:24],
+        videos=good_vids[:24],
+        exercises=preview.exercises[:24],
+    )
+
+async def _day_topics(body: GenerateScheduleIn) -> List[str]:
+    # 4) NEW: generate dynamic day titles (not just echo goals)
+    dl = current_deadline()
+    if not dl.allows(NEED_FOR_THEMER_S, reserve_s=THEMER_RESERVE_S):
+        dl.degrade("themer_skipped")
+        return []
+    try:
+        with stage("themer"):
+            return await dl.run(run_day_themer(body), reserve_s=THEMER_RESERVE_S)
+    except asyncio.TimeoutError:
+        dl.degrade("themer_timeout")
+        return []
+    except Exception:
+        return []
+
+def _library_lookup(body: GenerateScheduleIn) -> Optional[Tuple[str, ScheduleOutput]]:
+    # sync DB work; runs on a worker thread (see _from_library)
+    db = SessionLocal()
+    try:
+        match = plan_library.find_match(db, body)
+        if match is None:
+            return None
+        entry, _score = match
+        preview, schedule = plan_library.adapt(entry, body)
+        plan_library.record_hit(db, entry)
+        return preview.overview, schedule
+    except Exception:
+        db.rollback()
+        return None
+    finally:
+        db.close()
+
+async def _from_library(body: GenerateScheduleIn) -> Optional[Tuple[str, ScheduleOutput]]:
+    """
+    Plan-library hit -> (overview, locally adapted schedule), else None.
+    The library path skips the manager (and its input guardrail), so only requests whose
+    brief and goals the local guardrail tier can clear are served from it.
+    """
+    if not settings.PLAN_LIBRARY_ENABLED:
+        return None
+    verdict = screen_brief_local(body.brief, body.goals, body.daily_minutes)
+    if verdict is None:
+        return None
+    if not verdict.allowed:
+        raise HTTPException(status_code=400, detail=f"Input guardrail: {verdict.reason}")
+    with stage("library_lookup"):
+        return await asyncio.to_thread(_library_lookup, body)
+
+def _store_in_library(body: GenerateScheduleIn, preview: RoadmapOutput, themes: List[str]) -> None:
+    db = SessionLocal()
+    try:
+        plan_library.store(db, body, preview, themes)
+    except Exception:
+        db.rollback()
+    finally:
+        db.close()
+
+async def _bank(body: GenerateScheduleIn, preview: RoadmapOutput, themes: List[str]) -> None:
+    if not settings.PLAN_LIBRARY_ENABLED:
+        return
+    await asyncio.to_thread(_store_in_library, body, preview, themes)
+
+def _principal(req: Request) -> str:
+    """Authenticated user if a valid bearer token is present, else client IP."""
+    return principal_of(req.headers.get("authorization"), getattr(req.client, "host", None))
+
+def _body_hash(body: GenerateScheduleIn) -> str:
+    return hashlib.sha256(body.model_dump_json().encode("utf-8")).hexdigest()[:16]
+
+def _overloaded(e: Overloaded) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="The planner is busy right now. Please try again shortly.",
+        headers={"Retry-After": retry_after_header(e), "X-Load-Shed": e.reason},
+    )
+
+async def _degraded(body: GenerateScheduleIn) -> Optional[Tuple[ScheduleOutput, Dict[str, str]]]:
+    """
+    Shed path: a plan-library plan filled with local fallbacks only (a short deadline
+    makes every per-day stage take its template / skip branch), or None if no match.
+    """
+    if not settings.ADMISSION_DEGRADED_FALLBACK:
+        return None
+    with track_request("generate-roadmap-shed"), deadline_scope(settings.ADMISSION_DEGRADED_BUDGET_S) as dl:
+        hit = await _from_library(body)
+        if hit is None:
+            return None
+        _overview, schedule = hit
+        schedule = await _ensure_day_minimums(schedule, body.brief, body.goals, body.daily_minutes)
+        dl.degrade("load_shed")
+        headers = {"X-Plan-Source": "library", "X-Degradations": ",".join(dl.degradations)}
+    admission.degraded += 1
+    return schedule, headers
+
+def _too_many() -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail="Too many generations in progress for your account. Please wait for one to finish.",
+        headers={"Retry-After": "5"},
+    )
+
+def _in_progress() -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail="This generation is already in progress. Please wait for it to finish.",
+        headers={"Retry-After": "5"},
+    )
+
+ProgressFn = Callable[[str, int], None]  # (stage, percent)
+
+async def run_generation(
+    body: GenerateScheduleIn,
+    budget_s: Optional[float] = None,
+    on_progress: Optional[ProgressFn] = None,
+    route: str = "generate-roadmap",
+) -> Tuple[ScheduleOutput, Dict[str, str]]:
+    """One full pipeline run -> (schedule, response headers). Shared by /generate-roadmap and jobs."""
+    def _progress(name: str, pct: int) -> None:
+        if on_progress is not None:
+            on_progress(name, pct)
+
+    headers: Dict[str, str] = {}
+    with track_request(route), deadline_scope(budget_s or settings.GENERATION_BUDGET_S) as dl:
+        _progress("library_lookup", 2)
+        hit = await _from_library(body)
+        if hit is not None:
+            headers["X-Plan-Source"] = "library"
+            _overview, schedule = hit
+        else:
+            headers["X-Plan-Source"] = "generated"
+            _progress("manager", 5)
+            preview = await _build_preview(body)
+            _progress("themer", 45)
+            themed_topics = await _day_topics(body)
+            await _bank(body, preview, themed_topics)
+
+            # 5) compose day_1..N using themed topics + alignment scoring
+            schedule = compose_schedule(body, preview, day_topics=themed_topics)
+
+        # 6) guarantee per-day minimums (validated + generated as needed)
+        _progress("days", 60)
+        schedule = await _ensure_day_minimums(
+            schedule, body.brief, body.goals, body.daily_minutes,
+            on_day=lambda done, total: _progress("days", 60 + int(35 * done / max(1, total))),
+        )
 
-                # 4) NEW: generate dynamic day titles (not just echo goals)
-                try:
-                    themed_topics = await run_day_themer(body)
-                except Exception:
-                    themed_topics = []
-
-                # 5) compose day_1..N using themed topics + alignment scoring
-                schedule = compose_schedule(body, preview, day_topics=themed_topics)
+        if dl.degradations:
+            headers["X-Degradations"] = ",".join(dl.degradations)
+    return schedule, headers
 
-                # 6) guarantee per-day minimums (validated + generated as needed)
-                schedule = await _ensure_day_minimums(schedule, body.brief, body.goals, body.daily_minutes)
+@router.post("/generate-roadmap", response_model=ScheduleOutput)
+async def generate_roadmap(req: Request, response: Response, body: GenerateScheduleIn):
+    """
+    Identical concurrent requests from the same user/IP (double-click, retry) share one
+    run's result; different bodies run side by side up to GENERATION_MAX_PER_PRINCIPAL.
+    """
+    principal = _principal(req)
+    key = f"gen:{principal}:{_body_hash(body)}"
 
-                return schedule
+    async def _run() -> Tuple[ScheduleOutput, Dict[str, str]]:
+        async with principal_limiter.slot(principal):
+            try:
+                async with admission.admit():
+                    return await run_generation(body)
+            except Overloaded as e:
+                shed = await _degraded(body)
+                if shed is None:
+                    raise _overloaded(e)
+                return shed
 
+    try:
+        with root_trace("generate-roadmap", inputs=body.model_dump()):
+            (schedule, headers), shared = await singleflight.coalesce(key, _run)
+        for k, v in headers.items():
+            response.headers[k] = v
+        if shared:
+            response.headers["X-Coalesced"] = "1"
+        return schedule
+
+    except TooManyRunning:
+        raise _too_many()
     except AlreadyRunning:
-        raise HTTPException(
-            status_code=429,
-            detail="A generation is already in progress for your client. Please wait for it to finish.",
-            headers={"Retry-After": "5"},
-        )
+        # the identical body is running in another worker; its result isn't shared here
+        raise _in_progress()
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate roadmap: {e}")
+
+# ---------- Streaming variant (SSE) ----------
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+class _StreamHold:
+    """
+    What a stream holds past its handler, released exactly once: by the body's finally
+    when it ran, or by the response wrapper when the client left before it started.
+    """
+    def __init__(self) -> None:
+        self.key: Optional[str] = None        # singleflight lease
+        self.owner: Optional[str] = None      # ... and the token it was taken with
+        self.principal: Optional[str] = None  # per-principal concurrency slot
+        self.admitted = False
+        self.run_s: Optional[float] = None   # set when the run completed normally
+        self._released = False
+
+    async def release(self) -> None:
+        if self._released:
+            return
+        self._released = True
+        if self.admitted:
+            admission.release(self.run_s)
+        if self.principal is not None:
+            principal_limiter.release(self.principal)
+        if self.key is not None:
+            await singleflight.release(self.key, self.owner)
+
+class _HeldStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that always frees its hold. An async generator that never got
+    its first __anext__ (disconnect, failed http.response.start) never runs its
+    finally, and Starlette skips background tasks on errors, so close it here.
+    """
+    def __init__(self, content: AsyncIterator[str], hold: _StreamHold, **kwargs) -> None:
+        super().__init__(content, **kwargs)
+        self._hold = hold
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            with anyio.CancelScope(shield=True):
+                try:
+                    await self.body_iterator.aclose()
+                finally:
+                    await self._hold.release()
+
+@router.post("/generate-roadmap/stream")
+async def generate_roadmap_stream(req: Request, body: GenerateScheduleIn):
+    """
+    Same pipeline as /generate-roadmap, streamed as Server-Sent Events:
+      event: overview  {overview, days, source}
+      event: day       {key, index, day: DayPlan}   (in completion order)
+      event: summary   {elapsed_ms, degradations, schedule: ScheduleOutput}
+      event: error     {status, detail}
+    A stream can't be shared, so an identical in-flight stream is rejected with 429.
+    """
+    principal = _principal(req)
+    key = f"gen-stream:{principal}:{_body_hash(body)}"
+
+    # reject before the stream starts so clients still get a real 429
+    hold = _StreamHold()
+    owner = await singleflight.acquire(key)
+    if owner is None:
+        raise _in_progress()
+    hold.key, hold.owner = key, owner
+    if not principal_limiter.acquire(principal):
+        await hold.release()
+        raise _too_many()
+    hold.principal = principal
+    try:
+        await admission.acquire()
+        hold.admitted = True
+    except BaseException as e:
+        # shed, or cancelled while queued (client gone): give back what was taken
+        await hold.release()
+        if isinstance(e, Overloaded):
+            raise _overloaded(e)
+        raise
+
+    async def _events() -> AsyncIterator[str]:
+        started = time.monotonic()
+        try:
+            with root_trace("generate-roadmap-stream", inputs=body.model_dump()), track_request("generate-roadmap-stream"), \
+                    deadline_scope(settings.GENERATION_BUDGET_S) as dl:
+                hit = await _from_library(body)
+                if hit is not None:
+                    overview, schedule = hit
+                    yield _sse("overview", {"overview": overview, "days": body.duration_days, "source": "library"})
+                else:
+                    preview = await _build_preview(body)
+                    yield _sse("overview", {"overview": preview.overview, "days": body.duration_days, "source": "generated"})
+
+                    themed_topics = await _day_topics(body)
+                    await _bank(body, preview, themed_topics)
+                    schedule = compose_schedule(body, preview, day_topics=themed_topics)
+
+                async for day_key, day in _ensured_days(schedule, body.brief, body.goals, body.daily_minutes):
+                    schedule.data[day_key] = day
+                    yield _sse("day", {
+                        "key": day_key,
+                        "index": int(day_key.split("_", 1)[1]),
+                        "day": day.model_dump(),
+                    })
+
+                yield _sse("summary", {
+                    "elapsed_ms": int((time.monotonic() - started) * 1000),
+                    "degradations": dl.degradations,
+                    "schedule": schedule.model_dump(),
+                })
+                hold.run_s = time.monotonic() - started
+        except HTTPException as e:
+            yield _sse("error", {"status": e.status_code, "detail": e.detail})
+        except Exception as e:
+            yield _sse("error", {"status": 500, "detail": f"Failed to generate roadmap: {e}"})
+        finally:
+            await hold.release()
+
+    return _HeldStreamingResponse(
+        _events(),
+        hold,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
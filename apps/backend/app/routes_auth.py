@@ -1,15 +1,19 @@
 from __future__ import annotations
+import math
+
 from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel, EmailStr, constr
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from .database import get_db
+from .database import get_async_db
+from .hashing import HashPoolBusy, hash_pool
 from .models import User
 from .auth import (
-    hash_password,
-    verify_password,
-    create_access_token,
+    AuthUser,
+    token_for,
     get_current_user,
+    revoke_tokens,
 )
 
 router = APIRouter(prefix="/auth", tags=["auth"])
@@ -36,43 +40,78 @@ class TokenResponse(BaseModel):
     token_type: str = "bearer"
     user: UserPublic
 
-def _to_public(u: User) -> UserPublic:
+def _to_public(u: User | AuthUser) -> UserPublic:
     return UserPublic(id=u.id, name=u.name, username=u.username, email=u.email)
 
+async def _find_user(db: AsyncSession, username_or_email: str) -> User | None:
+    ident = username_or_email.lower()
+    return (await db.execute(select(User).where((User.username == ident) | (User.email == ident)))).scalars().first()
+
+def _busy(e: HashPoolBusy) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Too many sign-ins in progress. Please retry shortly.",
+        headers={"Retry-After": str(int(math.ceil(e.retry_after)))},
+    )
+
 # ===== Endpoints =====
+# bcrypt runs on hash_pool; DB access goes through the async engine.
 @router.post("/register", response_model=TokenResponse, status_code=201)
 @router.post("/register/")
-def register(body: UserCreate, db: Session = Depends(get_db)):
-    if db.query(User).filter((User.username == body.username.lower()) | (User.email == body.email.lower())).first():
+async def register(body: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    taken = (
+        await db.execute(
+            select(User.id).where((User.username == body.username.lower()) | (User.email == body.email.lower()))
+        )
+    ).first()
+    if taken:
         raise HTTPException(status_code=400, detail="Username or email already taken")
+    try:
+        password_hash = await hash_pool.hash(body.password)
+    except HashPoolBusy as e:
+        raise _busy(e)
     u = User(
         name=body.name,
         username=body.username.lower(),
         email=body.email.lower(),
-        password_hash=hash_password(body.password),
+        password_hash=password_hash,
     )
     db.add(u)
-    db.commit()
-    db.refresh(u)
-    token = create_access_token(sub=str(u.id))
+    await db.commit()
+    await db.refresh(u)
+    token = token_for(u)
     return TokenResponse(access_token=token, user=_to_public(u))
 
 @router.post("/login", response_model=TokenResponse)
 @router.post("/login/")
-def login(body: LoginRequest, db: Session = Depends(get_db)):
-    u = db.query(User).filter(
-        (User.username == body.username_or_email.lower()) | (User.email == body.username_or_email.lower())
-    ).first()
-    if not u or not verify_password(body.password, u.password_hash):
+async def login(body: LoginRequest, db: AsyncSession = Depends(get_async_db)):
+    u = await _find_user(db, body.username_or_email)
+    if not u:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    try:
+        ok, new_hash = await hash_pool.verify(body.password, u.password_hash)
+    except HashPoolBusy as e:
+        raise _busy(e)
+    if not ok:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
-    token = create_access_token(sub=str(u.id))
+    if new_hash:
+        # stored hash predates the current bcrypt cost: upgrade it while we have the password
+        u.password_hash = new_hash
+        await db.commit()
+    token = token_for(u)
     return TokenResponse(access_token=token, user=_to_public(u))
 
 @router.get("/me", response_model=UserPublic)
-def me(current_user: User = Depends(get_current_user)):
+def me(current_user: AuthUser = Depends(get_current_user)):
     return _to_public(current_user)
 
 @router.post("/logout")
-def logout(current_user: User = Depends(get_current_user)):
+def logout(current_user: AuthUser = Depends(get_current_user)):
     # JWT is stateless; client deletes the token. This just verifies auth.
     return {"ok": True}
+
+@router.post("/logout-all")
+async def logout_all(current_user: AuthUser = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    # Revokes every token issued so far, this one included.
+    await revoke_tokens(db, current_user.id)
+    return {"ok": True}
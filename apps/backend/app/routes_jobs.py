@@ -0,0 +1,124 @@
+from __future__ import annotations
+import json
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from pydantic import BaseModel, Field, conint, constr
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .database import get_db
+from .models import GenerationJob
+from .auth import AuthUser, get_optional_user
+from .schemas import GenerateScheduleIn, ScheduleOutput
+from . import jobs
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+# ---------- Schemas ----------
+
+class GenerateJobIn(GenerateScheduleIn):
+    priority: conint(ge=-10, le=10) = 0   # higher runs first; clamped server-side (see _priority)
+    save_as_session: bool = False         # needs a bearer token
+    title: Optional[constr(strip_whitespace=True, min_length=3, max_length=200)] = None
+
+class JobAccepted(BaseModel):
+    id: str
+    status: str
+    status_url: str
+
+class JobStatus(BaseModel):
+    id: str
+    status: str
+    stage: Optional[str] = None
+    progress: int = 0
+    priority: int = 0
+    position: Optional[int] = None   # queued jobs ahead (approximate)
+    attempts: int = 0
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+    plan_source: Optional[str] = None
+    degradations: List[str] = Field(default_factory=list)
+    session_id: Optional[int] = None
+    result: Optional[ScheduleOutput] = None
+
+# ---------- helpers ----------
+
+def _principal(req: Request, user: Optional[AuthUser]) -> str:
+    """Verified user (token version checked) if a bearer token was sent, else client IP."""
+    if user is not None:
+        return f"user:{user.id}"
+    return f"ip:{getattr(req.client, 'host', None) or 'unknown'}"
+
+def _priority(requested: int, user_id: Optional[int]) -> int:
+    """Callers may lower their job's priority; raising it is capped by JOBS_MAX_REQUEST_PRIORITY."""
+    cap = settings.JOBS_MAX_REQUEST_PRIORITY
+    if user_id is None:
+        cap = min(0, cap)
+    return min(requested, cap)
+
+# ---------- Endpoints ----------
+
+@router.post("/generate", response_model=JobAccepted, status_code=202)
+def create_generate_job(
+    req: Request,
+    response: Response,
+    body: GenerateJobIn,
+    db: Session = Depends(get_db),
+    current_user: Optional[AuthUser] = Depends(get_optional_user),
+):
+    """
+    Queue a roadmap generation and return immediately; poll GET /jobs/{id}.
+    With save_as_session the finished plan is also saved to the caller's sessions.
+    """
+    principal = _principal(req, current_user)
+    user_id = current_user.id if current_user is not None else None
+    if body.save_as_session and user_id is None:
+        raise HTTPException(status_code=401, detail="save_as_session requires a bearer token")
+
+    gen = GenerateScheduleIn(**body.model_dump(include=set(GenerateScheduleIn.model_fields)))
+    title = (body.title or body.brief[:80]) if body.save_as_session else None
+    priority = _priority(body.priority, user_id)
+    try:
+        job = jobs.enqueue(db, gen, principal, user_id=user_id, priority=priority, save_title=title)
+    except jobs.QueueFull:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many queued generations for your account. Please wait for one to finish.",
+            headers={"Retry-After": "10"},
+        )
+    url = f"/jobs/{job.id}"
+    response.headers["Location"] = url
+    return JobAccepted(id=job.id, status=job.status, status_url=url)
+
+@router.get("/{job_id}", response_model=JobStatus)
+def get_job(
+    job_id: str,
+    req: Request,
+    db: Session = Depends(get_db),
+    current_user: Optional[AuthUser] = Depends(get_optional_user),
+):
+    job = db.get(GenerationJob, job_id)
+    if not job or job.principal != _principal(req, current_user):
+        raise HTTPException(status_code=404, detail="Job not found")
+    meta = json.loads(job.meta_json) if job.meta_json else {}
+    return JobStatus(
+        id=job.id,
+        status=job.status,
+        stage=job.stage,
+        progress=job.progress,
+        priority=job.priority,
+        position=jobs.queue_position(db, job),
+        attempts=job.attempts,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+        error=job.error,
+        plan_source=meta.get("plan_source"),
+        degradations=meta.get("degradations") or [],
+        session_id=job.session_id,
+        result=ScheduleOutput.model_validate_json(job.result_json) if job.result_json else None,
+    )
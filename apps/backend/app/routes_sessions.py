@@ -1,17 +1,26 @@
 from __future__ import annotations
+import base64
+import binascii
+import hashlib
 import json
+from collections import defaultdict
 from datetime import datetime
-from typing import List
+from typing import AsyncIterator, List
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel, Field, conint, constr
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError, conint, conlist, constr
+from sqlalchemy import func, insert, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from .auth import get_current_user
-from .database import get_db
-from .models import SessionRecord, DayProgress, User
-from .schemas import ScheduleOutput
+from .auth import AuthUser, get_current_user
+from .config import settings
+from .database import AsyncSessionLocal, get_async_db
+from .models import SessionRecord, SessionDay, DayProgress
+from .plan_cache import plan_cache
+from .schemas import DayPlan, ScheduleOutput
+from . import session_store
 
 router = APIRouter(prefix="/sessions", tags=["sessions"])
 
@@ -40,6 +49,11 @@ class DayProgressState(BaseModel):
     completed: bool
     completed_at: datetime | None = None
 
+class SessionImport(SaveSessionRequest):
+    """One line of GET /sessions/export, and of POST /sessions/import."""
+    created_at: datetime | None = None
+    progress: dict[constr(pattern=r"^day_\d+$"), DayProgressState] = Field(default_factory=dict)
+
 class SessionSaved(BaseModel):
     id: int
     user: UserPublic
@@ -68,37 +82,124 @@ class ProgressSummary(BaseModel):
     progress_in_percent: str
     breakdown: dict[str, DayProgressState]
     
+class ProgressUpdate(BaseModel):
+    day_index: conint(ge=1)   # upper bound is the session's day count (checked in batch_progress)
+    completed: bool
+    completed_at: datetime | None = None   # when it was ticked on the client; default: now
+
 class TitleUpdate(BaseModel):
     title: constr(strip_whitespace=True, min_length=3, max_length=200)
 
 
 # ---------- helpers ----------
 
-def _user_public(u: User) -> UserPublic:
+def _user_public(u: AuthUser) -> UserPublic:
     return UserPublic(id=u.id, name=u.name, username=u.username, email=u.email)
 
 def _progress_map(db: Session, session_id: int) -> dict[str, DayProgressState]:
-    rows = db.query(DayProgress).filter(DayProgress.session_id == session_id).all()
+    rows = (
+        db.query(DayProgress.day_index, DayProgress.completed, DayProgress.completed_at)
+        .filter(DayProgress.session_id == session_id)
+        .all()
+    )
     return {
-        f"day_{r.day_index}": DayProgressState(completed=r.completed, completed_at=r.completed_at)
-        for r in rows
+        f"day_{i}": DayProgressState(completed=completed, completed_at=at)
+        for i, completed, at in rows
     }
 
-def _saved(rec: SessionRecord, user: User, db: Session) -> SessionSaved:
+def _encode_cursor(created_at: datetime, session_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{session_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def _decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """-> (created_at, id) of the last row already seen; ValueError if malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    except (binascii.Error, UnicodeDecodeError) as e:
+        raise ValueError(str(e))
+    created_at, _, session_id = raw.partition("|")
+    return datetime.fromisoformat(created_at), int(session_id)
+
+def _summary(db: Session, rec: SessionRecord, breakdown: bool) -> ProgressSummary:
+    total_days, completed = session_store.progress_counters(db, rec)
+    total_days = max(total_days, 1)  # safety
+
+    not_completed = max(0, total_days - completed)
+    pct = int(round((completed / total_days) * 100))
+
+    return ProgressSummary(
+        total_days=total_days,
+        completed=completed,
+        not_completed=not_completed,
+        progress_in_percent=f"{pct}%",
+        breakdown=_progress_map(db, rec.id) if breakdown else {},
+    )
+
+def _saved(rec: SessionRecord, user: AuthUser, db: Session) -> SessionSaved:
     return SessionSaved(
         id=rec.id,
         user=_user_public(user),
-        data=ScheduleOutput.model_validate_json(rec.plan_json),
+        data=session_store.load_plan(db, rec),
         progress=_progress_map(db, rec.id),
     )
 
+async def _owned(db: AsyncSession, session_id: int, user: AuthUser) -> SessionRecord:
+    rec = (
+        await db.execute(
+            select(SessionRecord).where(SessionRecord.id == session_id, SessionRecord.user_id == user.id)
+        )
+    ).scalar_one_or_none()
+    if not rec:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return rec
+
+# ---------- conditional GET ----------
+# Strong ETags from (updated_at, progress_version): plan edits and renames bump
+# updated_at, day ticks bump progress_version. _version is one indexed lookup that
+# skips the plan, so a matching If-None-Match is answered 304 without loading it.
+
+_REVALIDATE = "private, no-cache"
+_IMMUTABLE = "private, max-age=31536000, immutable"
+
+async def _version(db: AsyncSession, session_id: int, user: AuthUser) -> tuple[datetime, int]:
+    row = (
+        await db.execute(
+            select(SessionRecord.updated_at, SessionRecord.progress_version)
+            .where(SessionRecord.id == session_id, SessionRecord.user_id == user.id)
+        )
+    ).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return row.updated_at, row.progress_version or 0
+
+def _etag(*parts) -> str:
+    digest = hashlib.blake2b("|".join(str(p) for p in parts).encode(), digest_size=12).hexdigest()
+    return f'"{digest}"'
+
+def _matches(if_none_match: str | None, tag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(t.strip().removeprefix("W/") == tag for t in if_none_match.split(","))
+
+def _set_cache_headers(response: Response, tag: str, cache_control: str) -> None:
+    response.headers["ETag"] = tag
+    response.headers["Cache-Control"] = cache_control
+
+def _not_modified(tag: str, cache_control: str) -> Response:
+    return Response(status_code=304, headers={"ETag": tag, "Cache-Control": cache_control})
+
 # ---------- Endpoints: save / list / get ----------
+# Async on the async engine. Plan/progress logic is shared with the sync job worker
+# through session_store, so it runs via AsyncSession.run_sync (same connection, no
+# threadpool hop).
 
 @router.post("", response_model=SessionSaved, status_code=201)
-def save_session(
+async def save_session(
     body: SaveSessionRequest,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: AuthUser = Depends(get_current_user),
 ):
     rec = SessionRecord(
         user_id=current_user.id,
@@ -109,27 +210,53 @@ def save_session(
         duration_days=body.duration_days,
         preferred_time=body.preferred_time,
         timezone=body.timezone,
-        plan_json=body.plan.model_dump_json(),
         meta_json=json.dumps({"days": len(body.plan.data)}, ensure_ascii=False),
     )
-    db.add(rec)
-    db.commit()
-    db.refresh(rec)
-    return _saved(rec, current_user, db)
+    await db.run_sync(lambda s: session_store.write_plan(s, rec, body.plan))
+    await db.commit()
+    await db.refresh(rec)
+    return await db.run_sync(lambda s: _saved(rec, current_user, s))
 
 @router.get("", response_model=list[SessionSummary])
-def list_sessions(
+async def list_sessions(
+    response: Response,
     limit: int = Query(10, ge=1, le=50),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    cursor: str | None = Query(None, description="X-Next-Cursor from the previous page"),
+    title_prefix: str | None = Query(None, min_length=1, max_length=200, description="Case-insensitive title prefix"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: AuthUser = Depends(get_current_user),
 ):
-    rows = (
-        db.query(SessionRecord)
-        .filter(SessionRecord.user_id == current_user.id)
-        .order_by(SessionRecord.created_at.desc())
-        .limit(limit)
-        .all()
+    """
+    Newest first, keyset-paginated on (created_at, id) along ix_session_user_created.
+    When more rows exist, the X-Next-Cursor header holds the cursor for the next page.
+    """
+    q = (
+        select(
+            SessionRecord.id,
+            SessionRecord.title,
+            SessionRecord.created_at,
+            SessionRecord.duration_days,
+            SessionRecord.daily_minutes,
+        )
+        .where(SessionRecord.user_id == current_user.id)
     )
+    if cursor:
+        try:
+            after_created, after_id = _decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        q = q.where(
+            SessionRecord.created_at <= after_created,
+            or_(SessionRecord.created_at < after_created, SessionRecord.id < after_id),
+        )
+    if title_prefix:
+        q = q.where(func.lower(SessionRecord.title).startswith(title_prefix.lower(), autoescape=True))
+    q = q.order_by(SessionRecord.created_at.desc(), SessionRecord.id.desc()).limit(limit + 1)
+    rows = (await db.execute(q)).all()
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = _encode_cursor(rows[-1].created_at, rows[-1].id)
     return [
         SessionSummary(
             id=r.id,
@@ -141,196 +268,348 @@ def list_sessions(
         for r in rows
     ]
 
+# ---------- Export / import (NDJSON) ----------
+# One SessionImport object per line. Export streams straight from a server-side
+# cursor, splicing stored day payloads without parsing them; import inserts each
+# batch with executemany in its own transaction. Neither holds more than a batch.
+
+_EXPORT_COLUMNS = (
+    SessionRecord.id,
+    SessionRecord.title,
+    SessionRecord.brief,
+    SessionRecord.goals_json,
+    SessionRecord.daily_minutes,
+    SessionRecord.duration_days,
+    SessionRecord.preferred_time,
+    SessionRecord.timezone,
+    SessionRecord.plan_json,
+    SessionRecord.created_at,
+)
+
+def _export_line(r, days: list[tuple[int, str]], progress: dict) -> str:
+    head = json.dumps({
+        "title": r.title,
+        "brief": r.brief,
+        "goals": json.loads(r.goals_json),
+        "daily_minutes": r.daily_minutes,
+        "duration_days": r.duration_days,
+        "preferred_time": r.preferred_time,
+        "timezone": r.timezone,
+        "created_at": r.created_at.isoformat(),
+        "progress": progress,
+    }, ensure_ascii=False)
+    return f'{head[:-1]},"plan":{session_store.plan_doc(r.plan_json, days)}}}\n'
+
+async def _export_batch(db: AsyncSession, batch) -> str:
+    ids = [r.id for r in batch]
+    days: dict[int, list] = defaultdict(list)
+    for sid, i, payload in await db.execute(
+        select(SessionDay.session_id, SessionDay.day_index, SessionDay.payload)
+        .where(SessionDay.session_id.in_(ids))
+        .order_by(SessionDay.session_id, SessionDay.day_index)
+    ):
+        days[sid].append((i, payload))
+    progress: dict[int, dict] = defaultdict(dict)
+    for sid, i, completed, at in await db.execute(
+        select(DayProgress.session_id, DayProgress.day_index, DayProgress.completed, DayProgress.completed_at)
+        .where(DayProgress.session_id.in_(ids))
+    ):
+        progress[sid][f"day_{i}"] = {"completed": completed, "completed_at": at.isoformat() if at else None}
+    return "".join(_export_line(r, days[r.id], progress[r.id]) for r in batch)
+
+async def _ndjson_lines(request: Request) -> AsyncIterator[tuple[int, bytes]]:
+    max_line = settings.SESSION_IMPORT_MAX_LINE_KB * 1024
+    buf, line_no = b"", 0
+    async for chunk in request.stream():
+        buf += chunk
+        *lines, buf = buf.split(b"\n")
+        for line in lines:
+            line_no += 1
+            yield line_no, line
+        if len(buf) > max_line:
+            raise HTTPException(status_code=413, detail=f"Line {line_no + 1} exceeds {settings.SESSION_IMPORT_MAX_LINE_KB} KB")
+    if buf:
+        yield line_no + 1, buf
+
+async def _import_batch(db: AsyncSession, user_id: int, items: list[SessionImport]) -> int:
+    now = datetime.utcnow()
+    rows = []
+    for it in items:
+        total = max(it.duration_days, len(it.plan.data))
+        rows.append({
+            "user_id": user_id,
+            "title": it.title,
+            "brief": it.brief,
+            "goals_json": json.dumps(it.goals, ensure_ascii=False),
+            "daily_minutes": it.daily_minutes,
+            "duration_days": it.duration_days,
+            "preferred_time": it.preferred_time,
+            "timezone": it.timezone,
+            "plan_json": session_store.header_json(it.plan),
+            "meta_json": json.dumps({"days": len(it.plan.data)}, ensure_ascii=False),
+            "total_days": total,
+            "completed_count": sum(
+                1 for k, p in it.progress.items() if p.completed and 1 <= int(k[4:]) <= total
+            ),
+            "progress_version": 0,
+            "created_at": session_store.naive_utc(it.created_at) or now,
+            "updated_at": now,
+        })
+    ids = (
+        await db.execute(insert(SessionRecord).returning(SessionRecord.id, sort_by_parameter_order=True), rows)
+    ).scalars().all()
+    days = [{"session_id": sid, **v} for sid, it in zip(ids, items) for v in session_store.day_values(it.plan)]
+    if days:
+        await db.execute(insert(SessionDay), days)
+    progress = [
+        {
+            "session_id": sid,
+            "day_index": int(k[4:]),
+            "completed": p.completed,
+            "completed_at": session_store.naive_utc(p.completed_at) if p.completed else None,
+        }
+        for sid, it in zip(ids, items)
+        for k, p in it.progress.items()
+    ]
+    if progress:
+        await db.execute(insert(DayProgress), progress)
+    await db.commit()
+    return len(ids)
+
+@router.get("/export")
+async def export_sessions(current_user: AuthUser = Depends(get_current_user)):
+    """Every session of the caller, oldest first, with plan and progress, as NDJSON."""
+    user_id = current_user.id
+
+    async def _lines():
+        # own session: the response body outlives the request's dependencies
+        async with AsyncSessionLocal() as db:
+            result = await db.stream(
+                select(*_EXPORT_COLUMNS)
+                .where(SessionRecord.user_id == user_id)
+                .order_by(SessionRecord.id)
+                .execution_options(yield_per=settings.SESSION_EXPORT_BATCH)
+            )
+            async for batch in result.partitions():
+                yield await _export_batch(db, batch)
+
+    return StreamingResponse(
+        _lines(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="sessions.ndjson"'},
+    )
+
+@router.post("/import")
+async def import_sessions(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: AuthUser = Depends(get_current_user),
+):
+    """
+    Add sessions from NDJSON (the export format) to the caller's account, committing
+    every SESSION_IMPORT_BATCH rows. Invalid lines are skipped and reported.
+    """
+    imported, skipped, errors = 0, 0, []
+    batch: list[SessionImport] = []
+    async for line_no, line in _ndjson_lines(request):
+        if not line.strip():
+            continue
+        try:
+            batch.append(SessionImport.model_validate_json(line))
+        except ValidationError as e:
+            skipped += 1
+            if len(errors) < 50:
+                err = e.errors()[0]
+                loc = ".".join(str(x) for x in err["loc"])
+                errors.append({"line": line_no, "error": f"{loc}: {err['msg']}" if loc else err["msg"]})
+            continue
+        if len(batch) >= settings.SESSION_IMPORT_BATCH:
+            imported += await _import_batch(db, current_user.id, batch)
+            batch = []
+    if batch:
+        imported += await _import_batch(db, current_user.id, batch)
+    return {"ok": True, "imported": imported, "skipped": skipped, "errors": errors}
+
 @router.get("/{session_id}", response_model=SessionSaved)
-def get_session(
+async def get_session(
     session_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    response: Response,
+    if_none_match: str | None = Header(None),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: AuthUser = Depends(get_current_user),
 ):
-    rec = (
-        db.query(SessionRecord)
-        .filter(SessionRecord.id == session_id, SessionRecord.user_id == current_user.id)
-        .first()
-    )
-    if not rec:
-        raise HTTPException(status_code=404, detail="Session not found")
-    return _saved(rec, current_user, db)
+    updated_at, progress_version = await _version(db, session_id, current_user)
+    tag = _etag("session", session_id, updated_at, progress_version)
+    if _matches(if_none_match, tag):
+        return _not_modified(tag, _REVALIDATE)
+    rec = await _owned(db, session_id, current_user)
+    _set_cache_headers(response, tag, _REVALIDATE)
+    return await db.run_sync(lambda s: _saved(rec, current_user, s))
 
 # ---------- Day access & progress ----------
 
 @router.get("/{session_id}/day/{day_index}", response_model=DayDetail)
-def get_day(
+async def get_day(
     session_id: int,
     day_index: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    response: Response,
+    v: str | None = Query(None, description="ETag value (unquoted) this URL is pinned to; a match is cacheable for good"),
+    if_none_match: str | None = Header(None),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: AuthUser = Depends(get_current_user),
 ):
-    rec = (
-        db.query(SessionRecord)
-        .filter(SessionRecord.id == session_id, SessionRecord.user_id == current_user.id)
-        .first()
-    )
-    if not rec:
-        raise HTTPException(status_code=404, detail="Session not found")
-
-    sched = ScheduleOutput.model_validate_json(rec.plan_json)
+    updated_at, progress_version = await _version(db, session_id, current_user)
+    tag = _etag("day", session_id, day_index, updated_at, progress_version)
+    # a URL carrying the current version never changes: any later edit moves the tag
+    cache_control = _IMMUTABLE if v is not None and f'"{v}"' == tag else _REVALIDATE
+    if _matches(if_none_match, tag):
+        return _not_modified(tag, cache_control)
+    rec = await _owned(db, session_id, current_user)
+
+    overview, day = await db.run_sync(lambda s: session_store.load_day(s, rec, day_index))
     key = f"day_{day_index}"
-    if key not in sched.data:
+    if day is None:
         raise HTTPException(status_code=404, detail="Day not found")
 
-    prog = (
-        db.query(DayProgress)
-        .filter(DayProgress.session_id == rec.id, DayProgress.day_index == day_index)
-        .first()
-    )
-    completed = bool(prog and prog.completed)
+    completed = (
+        await db.execute(
+            select(DayProgress.completed)
+            .where(DayProgress.session_id == rec.id, DayProgress.day_index == day_index)
+        )
+    ).scalar()
 
     # return only that one day inside data{}
+    _set_cache_headers(response, tag, cache_control)
     return DayDetail(
         session_id=rec.id,
         day_key=key,
         day_index=day_index,
         title=rec.title,
-        completed=completed,
-        data=ScheduleOutput(overview=sched.overview, data={key: sched.data[key]}),
+        completed=bool(completed),
+        data=ScheduleOutput(overview=overview, data={key: day}),
     )
 
-@router.post("/{session_id}/day/{day_index}/complete")
-def mark_day_complete(
+@router.put("/{session_id}/day/{day_index}", response_model=DayDetail)
+async def update_day(
     session_id: int,
     day_index: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    body: DayPlan,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: AuthUser = Depends(get_current_user),
 ):
-    rec = (
-        db.query(SessionRecord)
-        .filter(SessionRecord.id == session_id, SessionRecord.user_id == current_user.id)
-        .first()
+    """Replace one day of the plan (rewrites only that day's row)."""
+    rec = await _owned(db, session_id, current_user)
+    if not await db.run_sync(lambda s: session_store.update_day(s, rec, day_index, body)):
+        raise HTTPException(status_code=404, detail="Day not found")
+    await db.commit()
+    return await get_day(
+        session_id, day_index, response, v=None, if_none_match=None, db=db, current_user=current_user
     )
-    if not rec:
-        raise HTTPException(status_code=404, detail="Session not found")
 
-    prog = (
-        db.query(DayProgress)
-        .filter(DayProgress.session_id == rec.id, DayProgress.day_index == day_index)
-        .first()
-    )
-    if not prog:
-        prog = DayProgress(session_id=rec.id, day_index=day_index, completed=True, completed_at=datetime.utcnow())
-        db.add(prog)
-    else:
-        prog.completed = True
-        prog.completed_at = datetime.utcnow()
-    db.commit()
+@router.post("/{session_id}/day/{day_index}/complete")
+async def mark_day_complete(
+    session_id: int,
+    day_index: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: AuthUser = Depends(get_current_user),
+):
+    rec = await _owned(db, session_id, current_user)
+
+    await db.run_sync(lambda s: session_store.mark_day(s, rec, day_index, completed=True))
+    await db.commit()
     return JSONResponse({"ok": True, "session_id": rec.id, "day_index": day_index, "completed": True})
 
 @router.post("/{session_id}/day/{day_index}/undo")
-def uncomplete_day(
+async def uncomplete_day(
     session_id: int,
     day_index: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: AuthUser = Depends(get_current_user),
 ):
-    rec = (
-        db.query(SessionRecord)
-        .filter(SessionRecord.id == session_id, SessionRecord.user_id == current_user.id)
-        .first()
-    )
-    if not rec:
-        raise HTTPException(status_code=404, detail="Session not found")
+    rec = await _owned(db, session_id, current_user)
 
-    prog = (
-        db.query(DayProgress)
-        .filter(DayProgress.session_id == rec.id, DayProgress.day_index == day_index)
-        .first()
-    )
-    if prog:
-        prog.completed = False
-        prog.completed_at = None
-        db.commit()
+    if await db.run_sync(lambda s: session_store.mark_day(s, rec, day_index, completed=False)):
+        await db.commit()
     return JSONResponse({"ok": True, "session_id": rec.id, "day_index": day_index, "completed": True})
 
 @router.get("/{session_id}/progress", response_model=ProgressSummary)
-def get_progress(
+async def get_progress(
     session_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    response: Response,
+    breakdown: bool = Query(True, description="Include per-day states (false -> counters only, O(1))"),
+    if_none_match: str | None = Header(None),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: AuthUser = Depends(get_current_user),
 ):
-    rec = (
-        db.query(SessionRecord)
-        .filter(SessionRecord.id == session_id, SessionRecord.user_id == current_user.id)
-        .first()
-    )
-    if not rec:
-        raise HTTPException(status_code=404, detail="Session not found")
-
-    sched = ScheduleOutput.model_validate_json(rec.plan_json)
-    total_days = max(rec.duration_days or 0, len(sched.data) or 0)
-    if total_days <= 0:
-        total_days = 1  # safety
-
-    breakdown = _progress_map(db, rec.id)
-
-    completed = 0
-    for i in range(1, total_days + 1):
-        key = f"day_{i}"
-        state = breakdown.get(key)
-        if state and state.completed:
-            completed += 1
-
-    not_completed = max(0, total_days - completed)
-    pct = int(round((completed / total_days) * 100))
+    updated_at, progress_version = await _version(db, session_id, current_user)
+    tag = _etag("progress", session_id, breakdown, updated_at, progress_version)
+    if _matches(if_none_match, tag):
+        return _not_modified(tag, _REVALIDATE)
+    rec = await _owned(db, session_id, current_user)
+    _set_cache_headers(response, tag, _REVALIDATE)
+
+    backfilled = rec.total_days is None or rec.completed_count is None
+    summary = await db.run_sync(lambda s: _summary(s, rec, breakdown))
+    if backfilled:
+        await db.commit()
+    return summary
+
+@router.post("/{session_id}/progress:batch", response_model=ProgressSummary)
+async def batch_progress(
+    session_id: int,
+    body: conlist(ProgressUpdate, min_length=1, max_length=500),
+    breakdown: bool = Query(True, description="Include per-day states in the returned summary"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: AuthUser = Depends(get_current_user),
+):
+    """Apply many day ticks/unticks (e.g. an offline client syncing) in one transaction."""
+    rec = await _owned(db, session_id, current_user)
+    total_days, _ = await db.run_sync(lambda s: session_store.progress_counters(s, rec))
+    beyond = sorted({u.day_index for u in body if u.day_index > total_days})
+    if beyond:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Day index out of range (session has {total_days} days): {', '.join(map(str, beyond[:10]))}",
+        )
 
-    return ProgressSummary(
-        total_days=total_days,
-        completed=completed,
-        not_completed=not_completed,
-        progress_in_percent=f"{pct}%",
-        breakdown=breakdown,
-    )
+    updates = [(u.day_index, u.completed, u.completed_at) for u in body]
+    await db.run_sync(lambda s: session_store.apply_progress(s, rec, updates))
+    summary = await db.run_sync(lambda s: _summary(s, rec, breakdown))
+    await db.commit()
+    return summary
 
 @router.patch("/{session_id}/title", response_model=SessionSaved)
-def rename_session(
+async def rename_session(
     session_id: int,
     body: TitleUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: AuthUser = Depends(get_current_user),
 ):
-    rec = (
-        db.query(SessionRecord)
-        .filter(SessionRecord.id == session_id, SessionRecord.user_id == current_user.id)
-        .first()
-    )
-    if not rec:
-        raise HTTPException(status_code=404, detail="Session not found")
+    rec = await _owned(db, session_id, current_user)
+    old_version = rec.updated_at
     rec.title = body.title
     rec.updated_at = datetime.utcnow()
-    db.commit()
-    db.refresh(rec)
-    return _saved(rec, current_user, db)
+    await db.commit()
+    await db.refresh(rec)
+    plan_cache.rekey(rec.id, old_version, rec.updated_at)  # plan unchanged
+    return await db.run_sync(lambda s: _saved(rec, current_user, s))
 
 @router.delete("/{session_id}")
-def delete_session(
+async def delete_session(
     session_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: AuthUser = Depends(get_current_user),
 ):
-    rec = (
-        db.query(SessionRecord)
-        .filter(SessionRecord.id == session_id, SessionRecord.user_id == current_user.id)
-        .first()
-    )
-    if not rec:
-        raise HTTPException(status_code=404, detail="Session not found")
+    rec = await _owned(db, session_id, current_user)
 
     # Count progress rows (for a friendly response)
     removed_progress = (
-        db.query(DayProgress)
-        .filter(DayProgress.session_id == rec.id)
-        .count()
-    )
+        await db.execute(select(func.count(DayProgress.id)).where(DayProgress.session_id == rec.id))
+    ).scalar()
 
-    db.delete(rec)        # ORM delete; with PRAGMA + FK cascade this wipes DayProgress
-    db.commit()
+    await db.delete(rec)  # ORM delete; with PRAGMA + FK cascade this wipes DayProgress
+    await db.commit()
+    plan_cache.invalidate(session_id)
 
     return {"ok": True, "deleted_id": session_id, "removed_progress": removed_progress}
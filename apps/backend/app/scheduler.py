@@ -75,13 +75,14 @@ EX_CAP = 1
 
 _STOP = {"the","and","for","with","your","from","into","over","then","that","this","you","our","in","of","to","a","an","on","at","by","as","up"}
 
-def _tokens(s: str) -> set[str]:
+def content_tokens(s: str) -> set[str]:
+    """Lower-cased words of 3+ chars minus stopwords (also keys the plan library)."""
     parts = re.findall(r"[a-zA-Z0-9]+", (s or "").lower())
     return {p for p in parts if len(p) >= 3 and p not in _STOP}
 
 def _score(theme: str, title: str, extra: str = "") -> int:
-    t = _tokens(theme)
-    c = _tokens(title) | _tokens(extra)
+    t = content_tokens(theme)
+    c = content_tokens(title) | content_tokens(extra)
     return len(t & c)
 
 def _pick_best_items(theme: str, pool: List, k: int, kind: str) -> Tuple[List, List]:
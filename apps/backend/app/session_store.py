@@ -0,0 +1,298 @@
+from __future__ import annotations
+import json
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import case, exists, func, insert, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import plan_codec
+from .models import DayProgress, SessionDay, SessionRecord
+from .plan_cache import plan_cache
+from .schemas import DayPlan, ScheduleOutput
+
+# =====================================================
+# Per-day plan storage.
+# SessionRecord.plan_json holds the plan header ({overview, data: {}}); each day is
+# its own session_days row. Rows saved before session_days existed still carry the
+# whole plan in plan_json and are read from there until backfilled
+# (python -m app.cli_migrate_session_days). Day payloads go through plan_codec, so
+# they may be plain or compressed JSON; only this module reads them.
+# =====================================================
+
+def _day_key(index: int) -> str:
+    return f"day_{index}"
+
+def _day_index(key: str) -> int:
+    return int(key.split("_", 1)[1])
+
+def header_json(sched: ScheduleOutput) -> str:
+    return ScheduleOutput(overview=sched.overview, data={}).model_dump_json()
+
+def day_values(sched: ScheduleOutput) -> List[dict]:
+    """session_days column values (minus session_id) for each day of sched."""
+    return [
+        {"day_index": _day_index(k), "topic": d.topic, "payload": plan_codec.encode(d.model_dump_json())}
+        for k, d in sched.data.items()
+    ]
+
+def _day_rows(session_id: int, sched: ScheduleOutput) -> List[SessionDay]:
+    return [SessionDay(session_id=session_id, **v) for v in day_values(sched)]
+
+# ---------- writes (caller commits) ----------
+
+def write_plan(db: Session, rec: SessionRecord, sched: ScheduleOutput) -> None:
+    """Store sched as rec's plan (header + one row per day), replacing any existing days."""
+    rec.plan_json = header_json(sched)
+    rec.total_days = max(rec.duration_days or 0, len(sched.data))
+    if rec.id is None:
+        rec.completed_count = 0
+        db.add(rec)
+        db.flush()
+    else:
+        rec.completed_count = None  # day range may have changed; recounted on next progress read
+        db.query(SessionDay).filter(SessionDay.session_id == rec.id).delete(synchronize_session=False)
+    db.add_all(_day_rows(rec.id, sched))
+
+def update_day(db: Session, rec: SessionRecord, day_index: int, day: DayPlan) -> bool:
+    """Replace one existing day in place; False if the plan has no such day."""
+    values = {"topic": day.topic, "payload": plan_codec.encode(day.model_dump_json())}
+    q = db.query(SessionDay).filter(SessionDay.session_id == rec.id, SessionDay.day_index == day_index)
+    n = q.update(values, synchronize_session=False)
+    if n == 0 and backfill_session(db, rec):
+        n = q.update(values, synchronize_session=False)
+    if n == 0:
+        return False
+    rec.updated_at = datetime.utcnow()
+    return True
+
+# ---------- reads ----------
+
+def _assemble(db: Session, rec: SessionRecord) -> Tuple[ScheduleOutput, int]:
+    rows = (
+        db.query(SessionDay.day_index, SessionDay.payload)
+        .filter(SessionDay.session_id == rec.id)
+        .order_by(SessionDay.day_index)
+        .all()
+    )
+    doc = plan_doc(rec.plan_json, rows)
+    return ScheduleOutput.model_validate_json(doc), len(doc)
+
+def plan_doc(plan_json: str, rows: List[Tuple[int, str]]) -> str:
+    """Full plan JSON from the header and (day_index, payload) rows, without parsing the days."""
+    if not rows:
+        return plan_json  # legacy row: the whole plan is in plan_json
+    # splice the stored JSON so it is validated once, in pydantic-core
+    overview = json.loads(plan_json)["overview"]
+    return '{"overview":%s,"data":{%s}}' % (
+        json.dumps(overview, ensure_ascii=False),
+        ",".join(f'"{_day_key(i)}":{plan_codec.decode(payload)}' for i, payload in rows),
+    )
+
+def load_plan(db: Session, rec: SessionRecord) -> ScheduleOutput:
+    """Full plan for this row version (cached; read-only)."""
+    return plan_cache.get(rec.id, rec.updated_at, lambda: _assemble(db, rec))
+
+def load_day(db: Session, rec: SessionRecord, day_index: int) -> Tuple[str, Optional[DayPlan]]:
+    """(overview, day) reading only that day's row; legacy rows fall back to the cached full plan."""
+    payload = (
+        db.query(SessionDay.payload)
+        .filter(SessionDay.session_id == rec.id, SessionDay.day_index == day_index)
+        .scalar()
+    )
+    if payload is None:
+        sched = load_plan(db, rec)
+        return sched.overview, sched.data.get(_day_key(day_index))
+    return json.loads(rec.plan_json)["overview"], DayPlan.model_validate_json(plan_codec.decode(payload))
+
+# ---------- progress ----------
+# SessionRecord.total_days / completed_count are denormalized counters: set on save,
+# moved by mark_day in the same transaction as the day_progress change, and
+# recomputed with one aggregate query when NULL (rows saved before the columns existed).
+# progress_version is bumped with every change, so (updated_at, progress_version)
+# versions everything the session endpoints return.
+
+def count_progress(db: Session, rec: SessionRecord) -> Tuple[int, int]:
+    """(total_days, completed) in one aggregate query; only days 1..total count."""
+    n_days = (
+        select(func.count(SessionDay.id)).where(SessionDay.session_id == rec.id).scalar_subquery()
+    )
+    duration = rec.duration_days or 0
+    total = case((n_days > duration, n_days), else_=duration)
+    done = (
+        select(func.count(DayProgress.id))
+        .where(
+            DayProgress.session_id == rec.id,
+            DayProgress.completed.is_(True),
+            DayProgress.day_index >= 1,
+            DayProgress.day_index <= total,
+        )
+        .scalar_subquery()
+    )
+    total_days, completed = db.execute(select(total, done)).one()
+    if total_days == duration and not db.query(exists().where(SessionDay.session_id == rec.id)).scalar():
+        # legacy row without day rows: the plan itself says how many days there are
+        total_days = max(duration, len(load_plan(db, rec).data))
+        completed = (
+            db.query(func.count(DayProgress.id))
+            .filter(
+                DayProgress.session_id == rec.id,
+                DayProgress.completed.is_(True),
+                DayProgress.day_index.between(1, total_days),
+            )
+            .scalar()
+        )
+    return total_days, completed
+
+def progress_counters(db: Session, rec: SessionRecord) -> Tuple[int, int]:
+    """(total_days, completed) from the counters, filling them in first if missing (caller commits)."""
+    if rec.total_days is None or rec.completed_count is None:
+        rec.total_days, rec.completed_count = count_progress(db, rec)
+    return rec.total_days, rec.completed_count
+
+def mark_day(
+    db: Session, rec: SessionRecord, day_index: int, completed: bool, at: Optional[datetime] = None
+) -> bool:
+    """
+    Set a day's completion and move completed_count with it (caller commits).
+    The state change is a conditional UPDATE (or INSERT), so concurrent toggles of the
+    same day can't count twice. Returns True if the state changed. Re-completing a
+    completed day re-stamps completed_at (to `at`, default now), which still bumps
+    progress_version.
+    """
+    now = (naive_utc(at) or datetime.utcnow()) if completed else None
+    restamped = False
+    changed = db.execute(
+        update(DayProgress)
+        .where(
+            DayProgress.session_id == rec.id,
+            DayProgress.day_index == day_index,
+            DayProgress.completed == (not completed),
+        )
+        .values(completed=completed, completed_at=now)
+    ).rowcount == 1
+    if not changed and completed:
+        try:
+            with db.begin_nested():
+                db.execute(insert(DayProgress).values(
+                    session_id=rec.id, day_index=day_index, completed=True, completed_at=now,
+                ))
+            changed = True
+        except IntegrityError:
+            # already completed: just re-stamp, the count doesn't move
+            db.execute(
+                update(DayProgress)
+                .where(DayProgress.session_id == rec.id, DayProgress.day_index == day_index)
+                .values(completed_at=now)
+            )
+            restamped = True
+    if changed or restamped:
+        values = {"progress_version": func.coalesce(SessionRecord.progress_version, 0) + 1}
+        if changed and 1 <= day_index <= (rec.total_days or 0):
+            values["completed_count"] = SessionRecord.completed_count + (1 if completed else -1)  # NULL stays NULL
+        db.execute(update(SessionRecord).where(SessionRecord.id == rec.id).values(**values))
+    return changed
+
+def naive_utc(at: Optional[datetime]) -> Optional[datetime]:
+    if at is not None and at.tzinfo is not None:
+        return at.astimezone(timezone.utc).replace(tzinfo=None)
+    return at
+
+def apply_progress(db: Session, rec: SessionRecord, updates: Iterable[Tuple[int, bool, Optional[datetime]]]) -> int:
+    """
+    Apply (day_index, completed, completed_at) updates with one multi-row
+    INSERT .. ON CONFLICT (session_id, day_index) DO UPDATE, then recount the
+    counters with one aggregate (caller commits). Later entries for the same day win.
+    Returns the number of days written.
+    """
+    now = datetime.utcnow()
+    by_day = {}
+    for day_index, completed, at in updates:
+        by_day[day_index] = {
+            "session_id": rec.id,
+            "day_index": day_index,
+            "completed": completed,
+            "completed_at": (naive_utc(at) or now) if completed else None,
+        }
+    if not by_day:
+        return 0
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        ins = (pg_insert if dialect == "postgresql" else sqlite_insert)(DayProgress).values(list(by_day.values()))
+        db.execute(ins.on_conflict_do_update(
+            index_elements=["session_id", "day_index"],
+            set_={"completed": ins.excluded.completed, "completed_at": ins.excluded.completed_at},
+        ))
+    else:
+        for row in by_day.values():  # no portable upsert: one toggle per day
+            mark_day(db, rec, row["day_index"], row["completed"], at=row["completed_at"])
+    rec.total_days, rec.completed_count = count_progress(db, rec)
+    db.execute(
+        update(SessionRecord)
+        .where(SessionRecord.id == rec.id)
+        .values(progress_version=func.coalesce(SessionRecord.progress_version, 0) + 1)
+    )
+    return len(by_day)
+
+# ---------- migration ----------
+
+def backfill_session(db: Session, rec: SessionRecord) -> bool:
+    """Split a legacy full-plan row into session_days; False if already split (or empty)."""
+    has_days = db.query(exists().where(SessionDay.session_id == rec.id)).scalar()
+    if has_days:
+        return False
+    sched = ScheduleOutput.model_validate_json(rec.plan_json)
+    if not sched.data:
+        return False
+    write_plan(db, rec, sched)  # same content, so updated_at (and cached copies) stay valid
+    return True
+
+def backfill_all(db: Session, batch_size: int = 200) -> int:
+    """Backfill every legacy session, committing per batch. Returns sessions migrated."""
+    migrated, last_id = 0, 0
+    while True:
+        batch = (
+            db.query(SessionRecord)
+            .filter(SessionRecord.id > last_id, ~exists().where(SessionDay.session_id == SessionRecord.id))
+            .order_by(SessionRecord.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not batch:
+            return migrated
+        for rec in batch:
+            migrated += int(backfill_session(db, rec))
+            last_id = rec.id
+        db.commit()
+
+def reencode_days(db: Session, codec: str, batch_size: int = 500) -> int:
+    """
+    Rewrite day payloads not yet stored under codec, committing per batch. Returns rows
+    rewritten. Each UPDATE is a compare-and-swap on the payload it read, so a day written
+    concurrently (PUT day, plan replace) is left alone rather than overwritten.
+    """
+    plan_codec.encode("{}", codec)  # reject an unknown codec before touching anything
+    rewritten, last_id = 0, 0
+    while True:
+        batch = (
+            db.query(SessionDay.id, SessionDay.payload)
+            .filter(SessionDay.id > last_id)
+            .order_by(SessionDay.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not batch:
+            return rewritten
+        for day_id, payload in batch:
+            if not plan_codec.is_encoded_as(payload, codec):
+                # same document, so updated_at (and cached plans) stay valid
+                rewritten += db.execute(
+                    update(SessionDay)
+                    .where(SessionDay.id == day_id, SessionDay.payload == payload)
+                    .values(payload=plan_codec.encode(plan_codec.decode(payload), codec))
+                ).rowcount
+            last_id = day_id
+        db.commit()
@@ -0,0 +1,220 @@
+from __future__ import annotations
+import asyncio
+import hashlib
+import json
+import random
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+import httpx
+from agents import RunContextWrapper
+from agents.usage import Usage
+from pydantic import BaseModel
+
+from .config import settings
+from .schemas import DayThemesOut, ExerciseItem, ResourceItem, RoadmapOutput, VideoItem
+
+# =====================================================
+# Simulated providers (SIMULATE_PROVIDERS=true)
+# Deterministic stand-ins for the Agents SDK runner, OpenAI completions,
+# Tavily/SerpApi search and link checks, for local load tests / benchmarks.
+# Outputs depend only on the input text; latencies come from a seeded RNG.
+# =====================================================
+
+_rng = random.Random(settings.SIM_SEED)
+
+def sample_latency(mean_ms: float) -> float:
+    """Seconds to sleep, drawn from SIM_LATENCY_DIST around mean_ms."""
+    if mean_ms <= 0:
+        return 0.0
+    dist = settings.SIM_LATENCY_DIST
+    if dist == "fixed":
+        ms = mean_ms
+    elif dist == "uniform":
+        ms = _rng.uniform(0.5 * mean_ms, 1.5 * mean_ms)
+    else:  # lognormal, median ~= mean_ms, long right tail like real providers
+        ms = mean_ms * _rng.lognormvariate(0.0, settings.SIM_LATENCY_SIGMA)
+    return ms / 1000.0
+
+async def _sleep(mean_ms: float) -> None:
+    delay = sample_latency(mean_ms)
+    if delay:
+        await asyncio.sleep(delay)
+
+def _seed_of(text: str) -> int:
+    return int(hashlib.sha256((text or "").encode("utf-8")).hexdigest()[:12], 16)
+
+def _subject_words(text: str, k: int = 3) -> List[str]:
+    seen: List[str] = []
+    for w in re.findall(r"[A-Za-z0-9+#]+", text or ""):
+        lw = w.lower()
+        if len(lw) < 3 or lw in {"learn", "brief", "goals", "the", "and", "for", "with", "want", "how"}:
+            continue
+        if lw not in seen:
+            seen.append(lw)
+        if len(seen) >= k:
+            break
+    return seen or ["topic"]
+
+def _slug(words: List[str]) -> str:
+    return "-".join(words)
+
+def _field(prompt: str, label: str) -> Optional[str]:
+    m = re.search(rf"^{label}: (.*)$", prompt, re.MULTILINE)
+    return m.group(1).strip() if m else None
+
+def _int_after(prompt: str, pattern: str, default: int) -> int:
+    m = re.search(pattern, prompt)
+    return int(m.group(1)) if m else default
+
+# ---------------- fake structured outputs ----------------
+
+_ANGLES = [
+    "Fundamentals", "Core Concepts", "Hands-on Basics", "Common Patterns", "Working with Data",
+    "Debugging and Pitfalls", "Small Project", "Testing Your Work", "Performance Basics",
+    "Best Practices", "Real-world Example", "Review and Next Steps", "Deeper Dive", "Capstone",
+]
+
+def fake_roadmap(prompt: str) -> RoadmapOutput:
+    brief = _field(prompt, "Brief") or prompt
+    words = _subject_words(brief)
+    subject = " ".join(w.capitalize() for w in words)
+    slug = _slug(words)
+    n_r = min(24, _int_after(prompt, r"AT LEAST (\d+) resources", 6))
+    n_v = min(24, _int_after(prompt, r"(\d+) videos", 3))
+    n_e = min(24, _int_after(prompt, r"(\d+) exercises", 3))
+    mins = _int_after(prompt, r"Daily minutes: (\d+)", 30)
+    h = _seed_of(brief)
+    return RoadmapOutput(
+        overview=f"A step-by-step path through {subject}: short reads, focused videos and daily practice.",
+        resources=[
+            ResourceItem(
+                title=f"{subject}: {_ANGLES[i % len(_ANGLES)]}",
+                url=f"https://docs.sim.example/{slug}/{h % 997}-{i}",
+                why=f"Concise reference on {subject.lower()} {_ANGLES[i % len(_ANGLES)].lower()}.",
+            )
+            for i in range(n_r)
+        ],
+        videos=[
+            VideoItem(
+                title=f"{subject} in 10 minutes, part {i + 1}",
+                url=f"https://www.youtube.com/watch?v=sim{h % 100000:05d}{i:02d}",
+                source="youtube.com",
+                why=f"Short walkthrough of {subject.lower()} {_ANGLES[i % len(_ANGLES)].lower()}.",
+                duration=f"{8 + i % 3}m",
+            )
+            for i in range(n_v)
+        ],
+        exercises=[fake_exercise(f"{subject} {_ANGLES[i % len(_ANGLES)]}", min(mins, 30)) for i in range(n_e)],
+    )
+
+def fake_themes(prompt: str) -> DayThemesOut:
+    brief = _field(prompt, "Brief") or prompt
+    subject = " ".join(w.capitalize() for w in _subject_words(brief))
+    days = _int_after(prompt, r"Duration: (\d+) days", 5)
+    return DayThemesOut(topics=[f"{subject} {_ANGLES[i % len(_ANGLES)]}"[:120] for i in range(days)])
+
+def fake_exercise(topic: str, minutes: int) -> ExerciseItem:
+    return ExerciseItem(
+        title=f"Practice: {topic}"[:120],
+        steps=[
+            f"Read today's notes on {topic}"[:160],
+            "Write a small example in a new file practice.md",
+            "Change one thing and record what happens",
+            "Summarize two takeaways",
+        ],
+        estimate_minutes=max(5, min(180, minutes)),
+    )
+
+def fake_output(output_type: Any, prompt: str) -> Any:
+    name = getattr(output_type, "__name__", "")
+    if output_type is RoadmapOutput:
+        return fake_roadmap(prompt)
+    if output_type is DayThemesOut:
+        return fake_themes(prompt)
+    if output_type is ExerciseItem:
+        topic = _field(prompt, "Topic") or "today's topic"
+        return fake_exercise(topic, _int_after(prompt, r"Time budget: (\d+)", 20))
+    if name == "BriefCheckOutput":
+        return output_type(allowed=True, reason="ok (simulated)")
+    if isinstance(output_type, type) and issubclass(output_type, BaseModel):
+        return output_type.model_construct()
+    return f"simulated output for: {prompt[:80]}"
+
+# ---------------- fake agent runner ----------------
+
+@dataclass
+class SimRunResult:
+    final_output: Any
+    context_wrapper: RunContextWrapper
+
+class SimulatedRunner:
+    """Drop-in for agents.Runner.run that returns schema-valid outputs without calling a model."""
+    @staticmethod
+    async def run(agent: Any, input: Any, *, context: Any = None, **_: Any) -> SimRunResult:
+        prompt = input if isinstance(input, str) else json.dumps(input, default=str)
+        await _sleep(settings.SIM_AGENT_LATENCY_MS)
+        out = fake_output(getattr(agent, "output_type", None), prompt)
+        out_text = out.model_dump_json() if isinstance(out, BaseModel) else str(out)
+        in_tok, out_tok = len(prompt) // 4 + 200, len(out_text) // 4
+        usage = Usage(requests=1, input_tokens=in_tok, output_tokens=out_tok, total_tokens=in_tok + out_tok)
+        return SimRunResult(final_output=out, context_wrapper=RunContextWrapper(context=context, usage=usage))
+
+async def chat_completion(messages: List[Dict[str, Any]]) -> tuple[str, Dict[str, int]]:
+    """Stand-in for app.llm completions: echoes a small JSON object."""
+    await _sleep(settings.SIM_AGENT_LATENCY_MS)
+    text = " ".join(str(m.get("content", "")) for m in messages)
+    content = json.dumps({"ok": True, "subject": " ".join(_subject_words(text))})
+    p, c = len(text) // 4, len(content) // 4
+    return content, {"prompt_tokens": p, "completion_tokens": c, "total_tokens": p + c}
+
+# ---------------- fake HTTP transports ----------------
+
+def _search_rows(query: str, n: int) -> List[Dict[str, str]]:
+    words = _subject_words(query)
+    slug, subject = _slug(words), " ".join(w.capitalize() for w in words)
+    h = _seed_of(query)
+    rows = []
+    is_video = " OR " in query or "video" in query.lower()  # see build_video_query
+    for i in range(n):
+        if is_video:
+            url = f"https://www.youtube.com/watch?v=q{h % 100000:05d}{i:02d}"
+        else:
+            url = f"https://site{(h + i) % 7}.sim.example/{slug}/{i}"
+        rows.append({"title": f"{subject} guide #{i + 1}", "url": url, "content": f"About {subject.lower()}."})
+    return rows
+
+async def _search_handler(request: httpx.Request) -> httpx.Response:
+    await _sleep(settings.SIM_SEARCH_LATENCY_MS)
+    if request.url.host == "api.tavily.com":
+        body = json.loads(request.content or b"{}")
+        rows = _search_rows(body.get("query", ""), int(body.get("max_results", 10)))
+        return httpx.Response(200, json={"results": rows})
+    if request.url.host == "serpapi.com":
+        q = request.url.params.get("q", "")
+        rows = _search_rows(q, int(request.url.params.get("num", 10)))
+        return httpx.Response(200, json={"organic_results": [
+            {"title": r["title"], "link": r["url"], "snippet": r["content"]} for r in rows
+        ]})
+    return httpx.Response(404)
+
+async def _linkcheck_handler(request: httpx.Request) -> httpx.Response:
+    await _sleep(settings.SIM_LINKCHECK_LATENCY_MS)
+    url = str(request.url)
+    if request.url.path.endswith("/oembed") or request.url.path.endswith("/oembed.json"):
+        url = parse_qs(urlparse(url).query).get("url", [url])[0]
+    # deterministic share of dead links so backfill paths get exercised
+    dead = (_seed_of(url) % 10_000) / 10_000 < settings.SIM_DEAD_LINK_RATE
+    if dead:
+        return httpx.Response(404)
+    if request.method == "HEAD":
+        return httpx.Response(200)
+    return httpx.Response(200, json={"title": "Simulated", "html": "<div/>"})
+
+def search_transport() -> httpx.MockTransport:
+    return httpx.MockTransport(_search_handler)
+
+def linkcheck_transport() -> httpx.MockTransport:
+    return httpx.MockTransport(_linkcheck_handler)
@@ -0,0 +1,62 @@
+from __future__ import annotations
+import asyncio
+import re
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+_STOP = {"the", "a", "an", "of", "for", "to", "in", "on", "and", "with", "how", "what", "is"}
+
+def normalize_query(q: str) -> str:
+    """Order/case/punctuation-insensitive form so near-identical queries share a slot."""
+    toks = {t for t in re.findall(r"[a-z0-9+#]+", (q or "").lower()) if t not in _STOP}
+    return " ".join(sorted(toks))
+
+class ToolMemo:
+    """
+    Run-scoped memo table for function tools (lives on the run context).
+    Concurrent identical calls share one in-flight lookup.
+    """
+    def __init__(self) -> None:
+        self._done: Dict[Tuple[str, str], Tuple[int, List[dict]]] = {}
+        self._inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+        self.hits: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+
+    async def get_or_call(
+        self,
+        tool: str,
+        query: str,
+        max_results: int,
+        call: Callable[[], Awaitable[List[dict]]],
+    ) -> Tuple[List[dict], bool]:
+        """Returns (items[:max_results], was_hit). Failed calls are not memoized."""
+        key = (tool, normalize_query(query))
+        cached = self._done.get(key)
+        if cached and cached[0] >= max_results:
+            self.hits[tool] = self.hits.get(tool, 0) + 1
+            return cached[1][:max_results], True
+
+        fut = self._inflight.get(key)
+        if fut is not None:
+            items, n = await asyncio.shield(fut)
+            if n >= max_results:
+                self.hits[tool] = self.hits.get(tool, 0) + 1
+                return items[:max_results], True
+
+        self.misses[tool] = self.misses.get(tool, 0) + 1
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        try:
+            items = await call()
+        except BaseException as e:
+            fut.set_exception(e)
+            fut.exception()  # mark retrieved; waiters re-raise on await
+            raise
+        else:
+            self._done[key] = (max_results, items)
+            fut.set_result((items, max_results))
+            return items, False
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"hits": dict(self.hits), "misses": dict(self.misses)}
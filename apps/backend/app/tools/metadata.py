@@ -41,7 +41,11 @@ async def fetch_video_metadata(url: str) -> Dict[str, Any]:
       { title, source, duration? }
     """
     headers = {"User-Agent": UA, "Accept": "text/html,application/xhtml+xml"}
-    async with httpx.AsyncClient(timeout=DEFAULT_TIMEOUT, headers=headers, follow_redirects=True) as client:
+    transport = None
+    if settings.SIMULATE_PROVIDERS:
+        from ..simulate import linkcheck_transport
+        transport = linkcheck_transport()
+    async with httpx.AsyncClient(timeout=DEFAULT_TIMEOUT, headers=headers, follow_redirects=True, transport=transport) as client:
         r = await client.get(url)
         r.raise_for_status()
         html = r.text
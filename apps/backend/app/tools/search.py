@@ -8,6 +8,12 @@ from ..config import settings
 
 DEFAULT_TIMEOUT = httpx.Timeout(10.0, connect=10.0)
 
+def _client(**kwargs: Any) -> httpx.AsyncClient:
+    if settings.SIMULATE_PROVIDERS:
+        from ..simulate import search_transport
+        kwargs["transport"] = search_transport()
+    return httpx.AsyncClient(timeout=DEFAULT_TIMEOUT, **kwargs)
+
 def _norm_source_from_url(url: str) -> str:
     try:
         host = urlparse(url).netloc.lower()
@@ -19,7 +25,7 @@ def _norm_source_from_url(url: str) -> str:
         return "unknown"
 
 async def _tavily_search(query: str, max_results: int = 10) -> List[Dict[str, Any]]:
-    if not settings.TAVILY_API_KEY:
+    if not settings.TAVILY_API_KEY and not settings.SIMULATE_PROVIDERS:
         raise RuntimeError("Tavily API key not configured")
     payload = {
         "api_key": settings.TAVILY_API_KEY,
@@ -28,7 +34,7 @@ async def _tavily_search(query: str, max_results: int = 10) -> List[Dict[str, An
         "search_depth": "basic",
         # You can add domain filters later if desired
     }
-    async with httpx.AsyncClient(timeout=DEFAULT_TIMEOUT) as client:
+    async with _client() as client:
         r = await client.post("https://api.tavily.com/search", json=payload)
         r.raise_for_status()
         data = r.json()
@@ -51,7 +57,7 @@ async def _serpapi_search(query: str, max_results: int = 10) -> List[Dict[str, A
         "num": max_results,
         "api_key": settings.SERPAPI_API_KEY,
     }
-    async with httpx.AsyncClient(timeout=DEFAULT_TIMEOUT) as client:
+    async with _client() as client:
         r = await client.get("https://serpapi.com/search.json", params=params)
         r.raise_for_status()
         data = r.json()
@@ -70,7 +76,7 @@ async def search_web(query: str, max_results: int = 10) -> List[Dict[str, Any]]:
     Provider-agnostic search. Uses Tavily if configured, else SerpApi.
     Returns: [{title, url, snippet, source}]
     """
-    if settings.TAVILY_API_KEY:
+    if settings.TAVILY_API_KEY or settings.SIMULATE_PROVIDERS:
         return await _tavily_search(query, max_results=max_results)
     if settings.SERPAPI_API_KEY:
         return await _serpapi_search(query, max_results=max_results)
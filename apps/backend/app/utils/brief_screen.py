@@ -0,0 +1,150 @@
+from __future__ import annotations
+import re
+import time
+from collections import OrderedDict
+from typing import List, Optional, Sequence, Tuple
+
+# (allowed, reason) — None means "ambiguous, ask the LLM guardrail"
+Verdict = Tuple[bool, str]
+
+MIN_WORDS = 2
+MIN_MINUTES_ADVANCED = 20  # below this, advanced topics go to the LLM for a pace check
+
+# Clear-cut out-of-scope requests -> block without a model call
+_BLOCK_PATTERNS = [
+    re.compile(p, re.IGNORECASE)
+    for p in (
+        r"\b(make|build|assemble)\s+(a\s+)?(bomb|explosive|pipe\s*bomb)s?\b",
+        r"\b(synthesi[sz]e|cook|make)\s+(meth|fentanyl|heroin|cocaine)\b",
+        r"\b(porn|nsfw|explicit\s+sex)\w*\b",
+        r"\b(credit\s*card|identity)\s+(fraud|theft)\b",
+        r"\bhack\s+into\s+(someone|somebody|my\s+ex|a\s+person)",
+        r"\b(stalk|dox+)\s+(someone|somebody|a\s+person)\b",
+    )
+]
+
+# Words that aren't disqualifying on their own but need judgement (e.g. "ethical hacking")
+_WATCH_WORDS = {
+    "hack", "hacking", "exploit", "exploits", "malware", "weapon", "weapons", "gun", "guns",
+    "drug", "drugs", "kill", "poison", "gambling", "bet", "betting", "crypto", "steal", "bypass",
+    "crack", "cracking", "phishing", "surveillance", "spy",
+}
+
+# Signals that the brief is about learning something
+_LEARNING_HINTS = re.compile(
+    r"\b(learn\w*|stud(y|ying)|understand\w*|master\w*|basics?|fundamentals?|intro\w*|beginner\w*|"
+    r"tutorials?|course|practi[cs]e\w*|improve|get\s+better|how\s+to|prepare|prep|exam|interview|"
+    r"skills?|concepts?|build(ing)?\s+(a|an|my)|teach\s+me|refresh\w*|review)\b",
+    re.IGNORECASE,
+)
+
+_ADVANCED_HINTS = re.compile(
+    r"\b(advanced|expert|mastery|master|phd|research[- ]level|in[- ]depth|deep\s+dive|professional)\b",
+    re.IGNORECASE,
+)
+
+# A learning hint only says *how* someone wants to learn, not *what*. The fast allow
+# needs every word of brief + goals to come from this vocabulary; anything it doesn't
+# recognise goes to the LLM guardrail.
+_BENIGN_WORDS = frozenset("""
+a an the and or but to of in on at for with from into about by as is are be can so
+i me my we our you your it this that these those some more most new up out than then
+want wanna would like need needs hope trying try get getting got going plan start started
+how what why when where which who well better good really also just only very enough
+day days daily week weeks weekly month months minute minutes min mins hour hours per each
+every first next one two three few quick quickly fast slowly simple easy hard step steps
+time own self work job career role project projects side hobby fun real world everyday
+learn learning learned study studying understand understanding master mastering basic basics
+fundamental fundamentals intro introduction introductory beginner beginners tutorial tutorials
+course practice practise practicing improve improving prepare preparing prep exam exams test
+tests interview interviews skill skills concept concepts build building teach refresh review
+advanced intermediate expert level levels deep dive professional confident confidence
+fluent fluency conversational speak speaking read reading write writing listen listening
+python javascript typescript java c c++ c# go golang rust ruby php swift kotlin scala r
+sql html css react vue angular svelte node node.js nodejs django flask fastapi spring rails
+api apis rest graphql http git github docker kubernetes linux unix bash shell terminal
+cloud aws azure gcp devops data database databases postgres postgresql mysql sqlite mongodb
+redis joins join queries query indexes index indexing window functions function
+algorithms algorithm structures structure recursion sorting web website websites app apps
+mobile ios android frontend backend fullstack full stack development developer programming
+coding code software engineering testing debugging design patterns system systems
+object oriented functional async concurrency types typing classes class
+machine deep ml ai neural networks network models model statistics stats probability
+math maths mathematics algebra calculus geometry trigonometry linear discrete
+physics chemistry biology science sciences computer history geography economics
+finance personal budgeting investing accounting marketing sales management leadership
+product business communication presentation public english spanish french german
+italian portuguese japanese chinese mandarin korean arabic hindi russian language
+languages grammar vocabulary pronunciation guitar piano violin drums singing music theory
+drawing sketching painting art photography video editing cooking baking
+chess yoga fitness running swimming nutrition meditation excel spreadsheets spreadsheet
+analysis analytics visualization dashboards pandas numpy matplotlib jupyter notebooks
+scraping automation scripts scripting tableau power bi
+""".split())
+
+def normalize_brief(text: str) -> str:
+    return " ".join(re.findall(r"[a-z0-9+#.]+", (text or "").lower()))
+
+def _all_benign(words: List[str]) -> bool:
+    for w in words:
+        w = w.strip(".")
+        if w and not w.isdigit() and w not in _BENIGN_WORDS:
+            return False
+    return True
+
+def prescreen_brief(
+    brief: str, goals: Sequence[str] = (), daily_minutes: Optional[int] = None
+) -> Optional[Verdict]:
+    """
+    Deterministic first tier of the brief guardrail, over the brief and goals together.
+    Returns (allowed, reason) for clear cases, or None when the LLM should decide.
+    """
+    text = " ".join([brief or ""] + [g for g in goals if g]).strip()
+    norm = normalize_brief(text)
+    words = norm.split()
+
+    for pat in _BLOCK_PATTERNS:
+        if pat.search(text):
+            return False, "Brief requests unsafe or out-of-scope content."
+
+    if len(words) < MIN_WORDS:
+        return None
+    if _WATCH_WORDS & set(words):
+        return None
+    if daily_minutes is not None and daily_minutes < MIN_MINUTES_ADVANCED and _ADVANCED_HINTS.search(text):
+        return None
+    if _LEARNING_HINTS.search(text) and _all_benign(words):
+        return True, "ok (prescreen)"
+    return None
+
+
+class VerdictCache:
+    """
+    In-memory TTL + LRU cache of guardrail verdicts (per-process).
+    Keyed on the normalized brief, goals and daily pace.
+    """
+    def __init__(self, ttl: float = 3600.0, maxsize: int = 2048):
+        self._data: "OrderedDict[str, tuple[float, Verdict]]" = OrderedDict()
+        self._ttl = ttl
+        self._maxsize = maxsize
+
+    @staticmethod
+    def key(brief: str, goals: Sequence[str], daily_minutes: Optional[int]) -> str:
+        return f"{normalize_brief(brief)}|{normalize_brief(' '.join(goals))}|{daily_minutes if daily_minutes is not None else '-'}"
+
+    def get(self, key: str) -> Optional[Verdict]:
+        hit = self._data.get(key)
+        if hit is None:
+            return None
+        ts, verdict = hit
+        if time.time() - ts > self._ttl:
+            self._data.pop(key, None)
+            return None
+        self._data.move_to_end(key)
+        return verdict
+
+    def set(self, key: str, verdict: Verdict) -> None:
+        self._data[key] = (time.time(), verdict)
+        self._data.move_to_end(key)
+        while len(self._data) > self._maxsize:
+            self._data.popitem(last=False)
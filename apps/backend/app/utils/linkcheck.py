@@ -5,6 +5,8 @@ from urllib.parse import urlparse, urlencode
 
 import httpx
 
+from ..config import settings
+
 # Treat these as definitely dead
 _DEAD_STATUS = {404, 410, 451}
 # Some sites block HEAD or anon; we still allow these (likely gated but alive)
@@ -52,7 +54,11 @@ async def check_url_alive(url: str, is_video: bool = False) -> Tuple[bool, int]:
     and not in the dead list (404/410/451/5xx).
     """
     parsed = urlparse(url)
-    async with httpx.AsyncClient(limits=_CLIENT_LIMITS, timeout=_TIMEOUT, follow_redirects=True) as client:
+    transport = None
+    if settings.SIMULATE_PROVIDERS:
+        from ..simulate import linkcheck_transport
+        transport = linkcheck_transport()
+    async with httpx.AsyncClient(limits=_CLIENT_LIMITS, timeout=_TIMEOUT, follow_redirects=True, transport=transport) as client:
         # Prefer oEmbed for known video hosts
         if is_video:
             ok, code = await _check_oembed(client, url)
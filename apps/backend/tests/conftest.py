@@ -0,0 +1,62 @@
+import os
+import sys
+import tempfile
+
+# Settings are read at import time, so point the app at a throwaway database and the
+# simulated providers before anything under app/ is imported.
+_DB = os.path.join(tempfile.mkdtemp(prefix="tracktive-tests-"), "test.db")
+os.environ.update(
+    DATABASE_URL=f"sqlite:///{_DB}",
+    OPENAI_API_KEY="sk-test",
+    SIMULATE_PROVIDERS="true",
+    SIM_AGENT_LATENCY_MS="1",
+    SIM_SEARCH_LATENCY_MS="1",
+    SIM_LINKCHECK_LATENCY_MS="1",
+    JOBS_WORKERS="0",
+    RATE_LIMIT_ENABLED="false",
+    PLAN_LIBRARY_ENABLED="false",
+)
+os.environ.update(LANGSMITH_API_KEY="", LANGSMITH_TRACING="false")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+
+@pytest.fixture(scope="session")
+def app():
+    from app.main import app as _app, _init_db
+    _init_db()
+    return _app
+
+@pytest.fixture()
+def db(app):
+    from app.database import SessionLocal
+    s = SessionLocal()
+    try:
+        yield s
+    finally:
+        s.rollback()
+        s.close()
+
+@pytest.fixture()
+def saved_session(db):
+    """A committed 3-day session (header + day rows) for a fresh user."""
+    import uuid
+    from app import session_store
+    from app.models import SessionRecord, User
+    from app.schemas import DayPlan, ScheduleOutput
+
+    tag = uuid.uuid4().hex[:10]
+    user = User(name="Test", username=f"u{tag}", email=f"{tag}@example.com", password_hash="x")
+    db.add(user)
+    db.flush()
+    sched = ScheduleOutput(
+        overview="Three days of practice.",
+        data={f"day_{i}": DayPlan(topic=f"Topic {i}", description="Something to work through.") for i in (1, 2, 3)},
+    )
+    rec = SessionRecord(
+        user_id=user.id, title="Learn X", brief="Learn X properly", goals_json="[]",
+        daily_minutes=30, duration_days=3, preferred_time="18:00", timezone="UTC", plan_json="{}",
+    )
+    session_store.write_plan(db, rec, sched)
+    db.commit()
+    return rec
@@ -0,0 +1,22 @@
+from app.agents_oa import _brief_goals_and_pace
+from app.utils.brief_screen import VerdictCache, prescreen_brief
+
+def test_benign_learning_brief_is_fast_allowed():
+    assert prescreen_brief("Learn SQL joins quickly", ["joins", "indexes"], 30) == (True, "ok (prescreen)")
+
+def test_learning_word_alone_does_not_allow_unknown_subjects():
+    assert prescreen_brief("Learn the basics of synthesizing sarin", [], 30) is None
+
+def test_goals_are_screened_with_the_brief():
+    assert prescreen_brief("Learn python basics", ["make a pipe bomb"], 30)[0] is False
+    assert prescreen_brief("Learn python basics", ["lockpicking"], 30) is None
+
+def test_cache_key_covers_goals_and_pace():
+    k = VerdictCache.key("Learn Python", ["decorators"], 30)
+    assert k != VerdictCache.key("Learn Python", ["something else"], 30)
+    assert k != VerdictCache.key("Learn Python", ["decorators"], 15)
+    assert k == VerdictCache.key("learn  python", ["Decorators"], 30)
+
+def test_prompt_parsing_reads_brief_goals_and_pace():
+    prompt = "Brief: Learn Rust\nGoals: ownership, lifetimes\nDaily minutes: 25\nTimezone: UTC\n"
+    assert _brief_goals_and_pace(prompt) == ("Learn Rust", ["ownership", "lifetimes"], 25)
@@ -0,0 +1,45 @@
+import asyncio
+
+import pytest
+
+from app.deadline import Deadline
+
+def test_allows_counts_the_reserve():
+    dl = Deadline(budget_s=10.0)
+    assert dl.allows(4.0, reserve_s=5.0)
+    assert not dl.allows(6.0, reserve_s=5.0)
+
+def test_run_with_no_budget_cancels_started_futures():
+    async def main():
+        started, cancelled = [], []
+
+        async def work():
+            started.append(True)
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        fut = asyncio.gather(work(), work())
+        await asyncio.sleep(0)
+        assert len(started) == 2
+        with pytest.raises(asyncio.TimeoutError):
+            await Deadline(budget_s=1.0).run(fut, reserve_s=5.0)
+        for _ in range(3):
+            await asyncio.sleep(0)
+        assert len(cancelled) == 2 and fut.done()
+
+    asyncio.run(main())
+
+def test_run_with_no_budget_closes_coroutines():
+    async def work():
+        return 1
+
+    async def main():
+        coro = work()
+        with pytest.raises(asyncio.TimeoutError):
+            await Deadline(budget_s=1.0).run(coro, reserve_s=5.0)
+        assert coro.cr_frame is None  # closed, so no "never awaited" warning
+
+    asyncio.run(main())
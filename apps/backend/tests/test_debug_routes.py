@@ -0,0 +1,13 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import settings
+
+@pytest.mark.parametrize("path", ["/debug/accounting", "/debug/accounting/some-request", "/debug/db"])
+def test_debug_routes_are_hidden_outside_dev(app, monkeypatch, path):
+    monkeypatch.setattr(settings, "APP_ENV", "prod")
+    assert TestClient(app).get(path).status_code == 404
+
+def test_debug_routes_are_served_in_dev(app, monkeypatch):
+    monkeypatch.setattr(settings, "APP_ENV", "dev")
+    assert TestClient(app).get("/debug/accounting").status_code == 200
@@ -0,0 +1,37 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.rate_limit import principal_limiter, singleflight
+from app.routes import _body_hash, router
+from app.schemas import GenerateScheduleIn
+
+BODY = {"brief": "Learn SQL window functions", "goals": ["window functions"], "duration_days": 2, "daily_minutes": 30}
+
+def _client(app) -> TestClient:
+    bare = FastAPI()
+    bare.include_router(router)
+    return TestClient(bare)
+
+def test_identical_run_in_another_worker_is_in_progress(app):
+    key = f"gen:ip:testclient:{_body_hash(GenerateScheduleIn(**BODY))}"
+    # a lease taken straight on the backend, as another worker sharing the lock store would
+    owner = singleflight._backend.acquire(key, 60)
+    try:
+        r = _client(app).post("/generate-roadmap", json=BODY)
+    finally:
+        singleflight._backend.release(key, owner)
+    assert r.status_code == 429
+    assert "already in progress" in r.json()["detail"]
+
+def test_principal_at_its_limit_is_too_many(app):
+    principal = "ip:testclient"
+    taken = 0
+    while principal_limiter.acquire(principal):
+        taken += 1
+    try:
+        r = _client(app).post("/generate-roadmap", json={**BODY, "daily_minutes": 45})
+    finally:
+        for _ in range(taken):
+            principal_limiter.release(principal)
+    assert r.status_code == 429
+    assert "for your account" in r.json()["detail"]
@@ -0,0 +1,96 @@
+import asyncio
+import uuid
+
+from fastapi.testclient import TestClient
+from sqlalchemy import func, update
+
+from app import jobs
+from app.models import GenerationJob, SessionRecord, User
+from app.routes_jobs import _priority
+from app.schemas import DayPlan, GenerateScheduleIn, ScheduleOutput
+
+BODY = GenerateScheduleIn(brief="Learn Go concurrency", goals=["channels"], duration_days=1, daily_minutes=30)
+RESULT = (
+    ScheduleOutput(overview="One day with channels.", data={"day_1": DayPlan(topic="Channels", description="Send and receive.")}),
+    {"X-Plan-Source": "generated"},
+)
+
+def test_client_priority_is_capped_server_side():
+    assert _priority(10, user_id=7) == 0
+    assert _priority(10, user_id=None) == 0
+    assert _priority(-5, user_id=None) == -5
+
+def test_finish_by_a_worker_that_lost_its_claim_is_a_no_op(db, saved_session):
+    user_id = saved_session.user_id
+    job = jobs.enqueue(db, BODY, f"user:{user_id}", user_id=user_id, save_title="Go concurrency")
+    assert jobs._claim("old-worker", reap=False) == job.id
+
+    # reaped while old-worker was stuck, then picked up again elsewhere
+    db.execute(update(GenerationJob).where(GenerationJob.id == job.id).values(status=jobs.QUEUED, worker=None))
+    db.commit()
+    assert jobs._claim("new-worker", reap=False) == job.id
+
+    jobs._finish(job.id, "old-worker", BODY, RESULT, None)
+    db.expire_all()
+    assert db.get(GenerationJob, job.id).status == jobs.RUNNING
+
+    jobs._finish(job.id, "new-worker", BODY, RESULT, None)
+    jobs._finish(job.id, "new-worker", BODY, RESULT, None)
+    db.expire_all()
+    done = db.get(GenerationJob, job.id)
+    assert done.status == jobs.SUCCEEDED and done.session_id is not None
+    saved = db.query(func.count(SessionRecord.id)).filter(SessionRecord.title == "Go concurrency").scalar()
+    assert saved == 1
+
+def test_finish_does_not_save_for_a_principal_that_is_not_the_owner(db, saved_session):
+    user_id = saved_session.user_id
+    job = jobs.enqueue(db, BODY, "ip:10.0.0.1", user_id=user_id, save_title="Not mine")
+    assert jobs._claim("w", reap=False) == job.id
+    jobs._finish(job.id, "w", BODY, RESULT, None)
+    db.expire_all()
+    done = db.get(GenerationJob, job.id)
+    assert done.status == jobs.FAILED and done.session_id is None
+    assert db.query(SessionRecord.id).filter(SessionRecord.title == "Not mine").first() is None
+
+def test_finish_does_not_save_for_a_deleted_user(db):
+    user = User(name="Gone", username=f"g{uuid.uuid4().hex[:10]}", email=f"{uuid.uuid4().hex[:10]}@example.com", password_hash="x")
+    db.add(user)
+    db.commit()
+    job = jobs.enqueue(db, BODY, f"user:{user.id}", user_id=user.id, save_title="Orphan")
+    db.delete(user)
+    db.commit()
+    assert jobs._claim("w", reap=False) == job.id
+    jobs._finish(job.id, "w", BODY, RESULT, None)
+    db.expire_all()
+    assert db.get(GenerationJob, job.id).status == jobs.FAILED
+    assert db.query(SessionRecord.id).filter(SessionRecord.title == "Orphan").first() is None
+
+def test_unloadable_request_fails_the_job(db):
+    job = jobs.enqueue(db, BODY, "ip:10.0.0.2")
+    db.execute(update(GenerationJob).where(GenerationJob.id == job.id).values(request_json="{}"))
+    db.commit()
+    assert jobs._claim("w", reap=False) == job.id
+    asyncio.run(jobs.JobWorkerPool()._run(job.id, "w"))
+    db.expire_all()
+    failed = db.get(GenerationJob, job.id)
+    assert failed.status == jobs.FAILED and failed.error == "Job request could not be loaded."
+
+def test_job_routes_reject_revoked_tokens(app):
+    client = TestClient(app)
+    tag = uuid.uuid4().hex[:10]
+    r = client.post("/auth/register", json={
+        "name": "Jobs", "username": f"j{tag}", "email": f"j{tag}@example.com", "password": "password1",
+    })
+    headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+    body = BODY.model_dump(mode="json")
+
+    r = client.post("/jobs/generate", json=body, headers=headers)
+    assert r.status_code == 202
+    job_id = r.json()["id"]
+    assert client.get(f"/jobs/{job_id}", headers=headers).status_code == 200
+    assert client.get(f"/jobs/{job_id}").status_code == 404      # anonymous -> ip principal
+
+    assert client.post("/auth/logout-all", headers=headers).status_code == 200
+    assert client.post("/jobs/generate", json={**body, "save_as_session": True}, headers=headers).status_code == 401
+    assert client.get(f"/jobs/{job_id}", headers=headers).status_code == 401
+    assert client.get(f"/jobs/{job_id}", headers={"Authorization": "Basic abc"}).status_code == 401
@@ -0,0 +1,22 @@
+import asyncio
+import time
+
+import pytest
+
+from app import llm
+from app.config import settings
+
+def test_waiting_for_a_slot_counts_against_the_deadline(monkeypatch):
+    monkeypatch.setattr(settings, "SIMULATE_PROVIDERS", False)
+
+    async def main():
+        monkeypatch.setattr(llm, "_limiter", asyncio.Semaphore(1))
+        await llm._limiter.acquire()   # every slot busy
+        started = time.monotonic()
+        with pytest.raises(TimeoutError):
+            await llm.chat_completion([{"role": "user", "content": "hi"}], deadline_s=0.05)
+        assert time.monotonic() - started < 1.0
+        llm._limiter.release()
+        assert not llm._limiter.locked()   # the timed-out waiter took no slot
+
+    asyncio.run(main())
@@ -0,0 +1,73 @@
+import json
+
+import pytest
+from sqlalchemy import update
+
+from app import plan_codec, session_store
+from app.models import SessionDay
+
+DOC = json.dumps({"topic": "Joins", "description": "Inner and outer joins.", "resources": [
+    {"title": "Docs", "url": "https://docs.python.org/3/library/sqlite3.html", "why": "Reference"},
+]})
+
+@pytest.mark.parametrize("codec", plan_codec.CODECS)
+def test_round_trip(codec):
+    stored = plan_codec.encode(DOC, codec)
+    assert plan_codec.is_encoded_as(stored, codec)
+    assert plan_codec.decode(stored) == DOC
+
+def test_zlib_is_smaller_and_text_safe():
+    stored = plan_codec.encode(DOC, "zlib")
+    assert len(stored) < len(DOC)
+    stored.encode("ascii")
+
+def test_unknown_codec_is_rejected():
+    with pytest.raises(ValueError):
+        plan_codec.encode(DOC, "lz4")
+
+def _rows(db, rec):
+    return db.query(SessionDay.day_index, SessionDay.payload).filter(SessionDay.session_id == rec.id).order_by(SessionDay.day_index).all()
+
+def _payloads(db, rec):
+    return [p for _, p in _rows(db, rec)]
+
+def _plan(db, rec):
+    return json.loads(session_store.plan_doc(rec.plan_json, _rows(db, rec)))
+
+def test_mixed_rows_read_back_and_reencode(db, saved_session):
+    rec = saved_session
+    before = _plan(db, rec)
+    first = db.query(SessionDay).filter(SessionDay.session_id == rec.id, SessionDay.day_index == 1).one()
+    first.payload = plan_codec.encode(plan_codec.decode(first.payload), "zlib")
+    db.commit()
+    assert {plan_codec.is_encoded_as(p, "zlib") for p in _payloads(db, rec)} == {True, False}
+
+    assert _plan(db, rec) == before
+
+    session_store.reencode_days(db, "zlib")
+    assert all(plan_codec.is_encoded_as(p, "zlib") for p in _payloads(db, rec))
+    session_store.reencode_days(db, "json")
+    assert all(plan_codec.is_encoded_as(p, "json") for p in _payloads(db, rec))
+    assert _plan(db, rec) == before
+
+def test_reencode_skips_a_day_written_concurrently(db, saved_session, monkeypatch):
+    rec = saved_session
+    day_2 = db.query(SessionDay.id).filter(SessionDay.session_id == rec.id, SessionDay.day_index == 2).scalar()
+    edited = json.dumps({"topic": "Edited", "description": "Written while re-encoding."})
+    decode = plan_codec.decode
+
+    original = db.query(SessionDay.payload).filter(SessionDay.id == day_2).scalar()
+
+    def racing_decode(payload):
+        # a PUT day lands between the batch read and day 2's rewrite
+        if payload == original:
+            db.execute(update(SessionDay).where(SessionDay.id == day_2).values(payload=edited))
+        return decode(payload)
+
+    monkeypatch.setattr(plan_codec, "decode", racing_decode)
+    session_store.reencode_days(db, "zlib")
+    monkeypatch.setattr(plan_codec, "decode", decode)
+
+    assert db.query(SessionDay.payload).filter(SessionDay.id == day_2).scalar() == edited
+    others = [p for i, p in _rows(db, rec) if i != 2]
+    assert all(plan_codec.is_encoded_as(p, "zlib") for p in others)
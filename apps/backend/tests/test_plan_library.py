@@ -0,0 +1,61 @@
+from datetime import datetime, timedelta
+
+from app import plan_library
+from app.models import PlanLibraryEntry, PlanLibraryToken
+from app.schemas import ExerciseItem, GenerateScheduleIn, ResourceItem, RoadmapOutput, VideoItem
+
+def _preview() -> RoadmapOutput:
+    return RoadmapOutput(
+        overview="A short tour of the subject.",
+        resources=[ResourceItem(title=f"Read {i}", url=f"https://ex.com/r{i}", why="worth reading") for i in range(6)],
+        videos=[VideoItem(title=f"Watch {i}", url=f"https://ex.com/v{i}", source="YouTube", why="worth watching") for i in range(3)],
+        exercises=[ExerciseItem(title="Try it out", steps=["do", "check"], estimate_minutes=10)],
+    )
+
+def _body(brief: str, goals) -> GenerateScheduleIn:
+    return GenerateScheduleIn(brief=brief, goals=goals, duration_days=3, daily_minutes=30)
+
+def test_stored_entry_is_found_through_the_token_index(db):
+    body = _body("Learn kotlin concurrency", ["async", "testing"])
+    entry = plan_library.store(db, body, _preview(), ["Intro", "Flows", "Testing"])
+    assert {t for (t,) in db.query(PlanLibraryToken.token).filter(PlanLibraryToken.entry_id == entry.id)} == set(entry.topic_key.split())
+
+    match = plan_library.find_match(db, _body("Learn kotlin concurrency and async", ["testing"]))
+    assert match is not None and match[0].id == entry.id
+    assert plan_library.find_match(db, _body("Learn watercolor painting", ["brushes"])) is None
+
+def test_stale_entries_are_not_served(db):
+    body = _body("Learn swift concurrency", ["async", "debugging"])
+    entry = plan_library.store(db, body, _preview(), ["Intro"])
+    entry.updated_at = datetime.utcnow() - timedelta(days=365)
+    db.commit()
+    assert plan_library.find_match(db, body) is None
+
+def test_index_missing_covers_entries_banked_before_the_index(db):
+    entry = PlanLibraryEntry(
+        topic_key="haskell monads typeclasses", brief="Learn haskell", goals_json="[]",
+        roadmap_json=_preview().model_dump_json(), themes_json="[]",
+        created_at=datetime.utcnow(), updated_at=datetime.utcnow(),
+    )
+    db.add(entry)
+    db.commit()
+    assert plan_library.index_missing(db) == 1
+    assert plan_library.index_missing(db) == 0
+    match = plan_library.find_match(db, _body("Learn haskell monads", ["typeclasses"]))
+    assert match is not None and match[0].id == entry.id
+
+def test_briefs_the_prescreen_does_not_clear_are_not_banked(db):
+    assert plan_library.store(db, _body("Learn scala for my job at Initech with Bob", ["spark"]), _preview(), ["Intro"]) is None
+    assert plan_library.find_match(db, _body("Learn scala", ["spark"])) is None
+
+def test_banked_entry_does_not_carry_the_first_callers_overview(db):
+    preview = _preview().model_copy(update={"overview": "Since you mentioned your trip to Lisbon in May..."})
+    entry = plan_library.store(db, _body("Learn portuguese grammar and vocabulary", ["speaking"]), preview, ["Intro", "Verbs"])
+    assert entry is not None
+
+    other = _body("Learn portuguese vocabulary and grammar", ["reading"])
+    match = plan_library.find_match(db, other)
+    assert match is not None and match[0].id == entry.id
+    served, _schedule = plan_library.adapt(match[0], other)
+    assert "Lisbon" not in served.overview
+    assert served.overview == "A study plan on portuguese grammar vocabulary. Goals covered: speaking."
@@ -0,0 +1,155 @@
+import asyncio
+import uuid
+
+import pytest
+
+from app import rate_limit
+from app.rate_limit import DBGCRALimiter, GCRALimiter, InMemoryBackend, PostgresAdvisoryBackend, Rate, SingleFlight
+
+class _Clock:
+    """Replaces the time module inside app.rate_limit."""
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def time(self) -> float:
+        return self.now
+
+@pytest.fixture()
+def clock(monkeypatch):
+    c = _Clock()
+    monkeypatch.setattr(rate_limit, "time", c)
+    return c
+
+@pytest.fixture(params=["memory", "db"])
+def hit(request, app):
+    if request.param == "memory":
+        return GCRALimiter().hit
+    from app.database import engine
+    return DBGCRALimiter(engine)._hit
+
+# ---------- GCRA ----------
+
+def test_rate_parse():
+    rate = Rate.parse("10/minute", burst=3)
+    assert (rate.limit, rate.period, rate.burst, rate.interval) == (10, 60.0, 3, 6.0)
+    assert Rate.parse("20/hours").burst == 20
+    with pytest.raises(ValueError):
+        Rate.parse("ten/minute")
+
+def test_burst_then_denied(clock, hit):
+    rate, key = Rate.parse("10/minute", burst=3), uuid.uuid4().hex
+    decisions = [hit(key, rate) for _ in range(4)]
+    assert [d.allowed for d in decisions] == [True, True, True, False]
+    assert [d.remaining for d in decisions[:3]] == [2, 1, 0]
+    assert decisions[3].retry_after_s == pytest.approx(6.0)
+
+def test_refills_one_token_per_interval(clock, hit):
+    rate, key = Rate.parse("10/minute", burst=3), uuid.uuid4().hex
+    for _ in range(3):
+        assert hit(key, rate).allowed
+    clock.now += 5.9
+    assert not hit(key, rate).allowed
+    clock.now += 0.2
+    assert hit(key, rate).allowed
+    assert not hit(key, rate).allowed
+
+    clock.now += 3 * rate.interval  # idle long enough: full burst again
+    assert [hit(key, rate).allowed for _ in range(4)] == [True, True, True, False]
+
+def test_keys_have_separate_buckets(clock, hit):
+    rate = Rate.parse("1/minute", burst=1)
+    a, b = uuid.uuid4().hex, uuid.uuid4().hex
+    assert hit(a, rate).allowed and not hit(a, rate).allowed
+    assert hit(b, rate).allowed
+
+# ---------- advisory locks ----------
+
+class _Conn:
+    """Stands in for a pooled SQLAlchemy connection."""
+    def __init__(self, fail_on: str = ""):
+        self.fail_on = fail_on
+        self.calls = []
+
+    def execute(self, stmt):
+        self.calls.append("execute")
+        if self.fail_on == "execute":
+            raise RuntimeError("connection lost")
+        return self
+
+    def scalar(self):
+        return True
+
+    def commit(self):
+        self.calls.append("commit")
+        if self.fail_on == "commit":
+            raise RuntimeError("connection lost")
+
+    def invalidate(self):
+        self.calls.append("invalidate")
+
+    def close(self):
+        self.calls.append("close")
+
+class _Engine:
+    def __init__(self, conn: _Conn):
+        self.conn = conn
+
+    def connect(self) -> _Conn:
+        return self.conn
+
+@pytest.mark.parametrize("fail_on", ["execute", "commit"])
+def test_failed_unlock_invalidates_instead_of_pooling_the_lock(fail_on):
+    conn = _Conn()
+    backend = PostgresAdvisoryBackend(_Engine(conn))
+    owner = backend._acquire("k", 60)
+    assert owner is not None
+
+    conn.fail_on = fail_on
+    with pytest.raises(RuntimeError):
+        backend._release("k", owner)
+    assert conn.calls[-2:] == ["invalidate", "close"]
+
+def test_clean_unlock_returns_the_connection():
+    conn = _Conn()
+    backend = PostgresAdvisoryBackend(_Engine(conn))
+    backend._release("k", backend._acquire("k", 60))
+    assert "invalidate" not in conn.calls and conn.calls[-1] == "close"
+
+def test_failed_lock_attempt_invalidates():
+    conn = _Conn(fail_on="commit")
+    with pytest.raises(RuntimeError):
+        PostgresAdvisoryBackend(_Engine(conn))._acquire("k", 60)
+    assert conn.calls[-2:] == ["invalidate", "close"]
+
+# ---------- single-flight ----------
+
+def test_late_release_does_not_free_the_next_holder(clock):
+    sf = SingleFlight(ttl=10)
+
+    async def main():
+        first = await sf.acquire("k")
+        clock.now += 11                  # first holder stalls past the ttl
+        second = await sf.acquire("k")
+        assert first and second and second != first
+        await sf.release("k", first)     # late release from the first holder
+        assert await sf.acquire("k") is None
+        await sf.release("k", second)
+        assert await sf.acquire("k") is not None
+
+    asyncio.run(main())
+
+def test_guard_swallows_release_failures():
+    class _Flaky(InMemoryBackend):
+        def release(self, key, owner):
+            raise RuntimeError("lock store unreachable")
+
+    sf = SingleFlight(backend=_Flaky())
+
+    async def main():
+        async with sf.guard("k"):
+            return "done"
+
+    assert asyncio.run(main()) == "done"
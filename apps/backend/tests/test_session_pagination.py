@@ -0,0 +1,68 @@
+import uuid
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.models import SessionRecord, User
+from app.routes_sessions import _decode_cursor, _encode_cursor
+
+def test_cursor_round_trip():
+    at = datetime(2026, 3, 1, 12, 30, 45, 123456)
+    cursor = _encode_cursor(at, 42)
+    assert "=" not in cursor
+    assert _decode_cursor(cursor) == (at, 42)
+
+@pytest.mark.parametrize("bad", ["%%%", "bm90LWEtY3Vyc29y", _encode_cursor(datetime(2026, 1, 1), 1)[:-3]])
+def test_malformed_cursor_is_a_value_error(bad):
+    with pytest.raises(ValueError):
+        _decode_cursor(bad)
+
+def test_pages_cover_every_session_once_in_order(app, db):
+    client = TestClient(app)
+    tag = uuid.uuid4().hex[:10]
+    r = client.post("/auth/register", json={
+        "name": "Pager", "username": f"p{tag}", "email": f"p{tag}@example.com", "password": "password1",
+    })
+    headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+    user_id = db.query(User.id).filter(User.username == f"p{tag}").scalar()
+
+    same = datetime(2026, 5, 1, 9, 0, 0)   # ties on created_at are broken by id
+    stamps = [same, same, same, datetime(2026, 5, 2), datetime(2026, 4, 30)]
+    for i, at in enumerate(stamps):
+        db.add(SessionRecord(
+            user_id=user_id, title=f"Plan {i}", brief="Learn X properly", goals_json="[]",
+            daily_minutes=30, duration_days=3, preferred_time="18:00", timezone="UTC",
+            plan_json="{}", created_at=at, updated_at=at,
+        ))
+    db.commit()
+    expected = [
+        rid for rid, _ in sorted(
+            db.query(SessionRecord.id, SessionRecord.created_at).filter(SessionRecord.user_id == user_id),
+            key=lambda r: (r[1], r[0]), reverse=True,
+        )
+    ]
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        page = client.get("/sessions", params=params, headers=headers)
+        assert page.status_code == 200
+        seen += [s["id"] for s in page.json()]
+        cursor = page.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert seen == expected
+
+    assert client.get("/sessions", params={"cursor": "%%%"}, headers=headers).status_code == 400
+
+def test_batch_progress_rejects_days_past_the_end_of_the_session(app, db, saved_session):
+    from app.auth import create_access_token
+
+    client = TestClient(app)
+    headers = {"Authorization": f"Bearer {create_access_token(str(saved_session.user_id))}"}
+    url = f"/sessions/{saved_session.id}/progress:batch"
+    r = client.post(url, json=[{"day_index": 2, "completed": True}, {"day_index": 4, "completed": True}], headers=headers)
+    assert r.status_code == 422 and "4" in r.json()["detail"]
+    r = client.post(url, json=[{"day_index": 3, "completed": True}], headers=headers)
+    assert r.status_code == 200 and r.json()["completed"] == 1
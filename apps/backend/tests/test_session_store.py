@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta
+
+from app import session_store
+from app.models import DayProgress
+
+def _counters(db, rec):
+    db.commit()
+    db.refresh(rec)
+    return rec.completed_count, rec.progress_version or 0
+
+def test_mark_day_moves_count_and_version(db, saved_session):
+    rec = saved_session
+    assert _counters(db, rec) == (0, 0)
+
+    assert session_store.mark_day(db, rec, 2, completed=True) is True
+    assert _counters(db, rec) == (1, 1)
+
+    assert session_store.mark_day(db, rec, 2, completed=False) is True
+    assert _counters(db, rec) == (0, 2)
+
+    # undoing a day that isn't completed changes nothing
+    assert session_store.mark_day(db, rec, 3, completed=False) is False
+    assert _counters(db, rec) == (0, 2)
+
+def test_recompleting_a_day_restamps_and_bumps_version(db, saved_session):
+    rec = saved_session
+    session_store.mark_day(db, rec, 1, completed=True)
+    _counters(db, rec)
+    first = db.query(DayProgress.completed_at).filter(DayProgress.session_id == rec.id).scalar()
+
+    assert session_store.mark_day(db, rec, 1, completed=True) is False
+    count, version = _counters(db, rec)
+    assert count == 1
+    assert version == 2  # completed_at moved, so cached progress must not 304
+    again = db.query(DayProgress.completed_at).filter(DayProgress.session_id == rec.id).scalar()
+    assert again >= first
+
+def test_days_outside_the_plan_do_not_count(db, saved_session):
+    rec = saved_session
+    assert session_store.mark_day(db, rec, 7, completed=True) is True
+    assert _counters(db, rec) == (0, 1)
+    assert session_store.count_progress(db, rec) == (3, 0)
+
+def test_apply_progress_recounts_and_bumps_version_once(db, saved_session):
+    rec = saved_session
+    at = datetime.utcnow() - timedelta(days=1)
+    n = session_store.apply_progress(db, rec, [(1, True, at), (2, True, None), (2, False, None), (3, True, None)])
+    assert n == 3
+    assert _counters(db, rec) == (2, 1)
+    assert session_store.count_progress(db, rec) == (3, 2)
+    stamped = db.query(DayProgress.completed_at).filter(DayProgress.session_id == rec.id, DayProgress.day_index == 1).scalar()
+    assert stamped == at
+
+def test_mark_day_keeps_the_client_timestamp(db, saved_session):
+    rec = saved_session
+    at = datetime.utcnow() - timedelta(hours=5)
+    session_store.mark_day(db, rec, 2, completed=True, at=at)
+    stamped = db.query(DayProgress.completed_at).filter(DayProgress.session_id == rec.id, DayProgress.day_index == 2).scalar()
+    assert stamped == at
+
+def test_counters_match_a_recount_after_mixed_writes(db, saved_session):
+    rec = saved_session
+    session_store.mark_day(db, rec, 1, completed=True)
+    session_store.apply_progress(db, rec, [(2, True, None), (1, False, None)])
+    session_store.mark_day(db, rec, 3, completed=True)
+    session_store.mark_day(db, rec, 3, completed=True)
+    count, _ = _counters(db, rec)
+    assert (rec.total_days, count) == session_store.count_progress(db, rec) == (3, 2)
@@ -0,0 +1,101 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import FastAPI
+
+from app.admission import admission
+from app.rate_limit import principal_limiter
+
+BODY = {"brief": "Learn SQL joins quickly", "goals": ["joins"], "duration_days": 2, "daily_minutes": 30}
+
+def _scope(path: str = "/generate-roadmap/stream") -> dict:
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"content-type", b"application/json"), (b"host", b"test")],
+        "client": ("127.0.0.1", 5000),
+        "server": ("test", 80),
+    }
+
+def _receive(disconnect: bool, body: dict = BODY):
+    sent = False
+
+    async def receive() -> dict:
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": json.dumps(body).encode(), "more_body": False}
+        if not disconnect:
+            await asyncio.Event().wait()
+        return {"type": "http.disconnect"}
+    return receive
+
+@pytest.fixture()
+def stream_app(app):
+    # the bare router: app-level middleware would drain the body in its own task and
+    # hide what happens when the server can't deliver the response
+    from app.routes import router
+    bare = FastAPI()
+    bare.include_router(router)
+    return bare
+
+def _call(app, receive, send) -> None:
+    async def main() -> None:
+        try:
+            await app(_scope(), receive, send)
+        except Exception:
+            pass  # the server would log and drop the connection
+    asyncio.run(main())
+
+def test_slot_released_when_response_start_fails(stream_app):
+    async def send(message: dict) -> None:
+        if message["type"] == "http.response.start":
+            raise OSError("client went away")
+
+    _call(stream_app, _receive(disconnect=False), send)
+    assert admission.inflight == 0
+    assert principal_limiter._counts == {}
+
+def test_slot_released_when_client_disconnects_before_body(stream_app):
+    async def send(message: dict) -> None:
+        pass
+
+    _call(stream_app, _receive(disconnect=True, body={**BODY, "duration_days": 3}), send)
+    assert admission.inflight == 0
+    assert principal_limiter._counts == {}
+
+def test_identical_retry_after_aborted_stream_is_not_rejected(stream_app):
+    async def send_fail(message: dict) -> None:
+        raise OSError("client went away")
+
+    _call(stream_app, _receive(disconnect=False), send_fail)
+
+    statuses = []
+
+    async def send(message: dict) -> None:
+        if message["type"] == "http.response.start":
+            statuses.append(message["status"])
+
+    _call(stream_app, _receive(disconnect=False), send)
+    assert statuses == [200]
+    assert admission.inflight == 0
+
+def test_completed_stream_releases_once(stream_app):
+    chunks = []
+
+    async def send(message: dict) -> None:
+        if message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    _call(stream_app, _receive(disconnect=False, body={**BODY, "goals": ["joins", "indexes"]}), send)
+    assert admission.inflight == 0
+    assert admission._sem._value == admission.max_inflight
+    assert b"event: summary" in b"".join(chunks)